@@ -0,0 +1,137 @@
+import numpy as np
+
+# Columns are binned once at this resolution; every coarser histogram is a
+# sum of adjacent fine bins. 2520 is divisible by all the offered bin counts.
+BASE_BINS = 2520
+HISTOGRAM_BIN_OPTIONS = [10, 15, 20, 30, 40, 60, 90, 120]
+
+# Rows converted to float64 at a time while binning
+HISTOGRAM_CHUNK_ROWS = 4_000_000
+
+
+class HistogramAggregate:
+    """Fine-grained histogram of one column, re-binnable without the raw data"""
+
+    def __init__(self, edges, counts):
+        self.edges = edges
+        self.counts = counts
+
+    @property
+    def total(self):
+        return float(self.counts.sum())
+
+    def rebin(self, bins):
+        """Return (edges, counts) for `bins` equal-width bins (must divide BASE_BINS)"""
+        if len(self.counts) % bins:
+            raise ValueError(f"{bins} bins does not divide the base resolution of {len(self.counts)}")
+        factor = len(self.counts) // bins
+        counts = self.counts.reshape(bins, factor).sum(axis=1)
+        return self.edges[::factor], counts
+
+
+def _float_chunks(values, chunk_rows):
+    """Yield float64 NumPy chunks (NaN for missing) of a Series or array"""
+    for start in range(0, len(values), chunk_rows):
+        if hasattr(values, "iloc"):
+            chunk = values.iloc[start:start + chunk_rows].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            chunk = np.asarray(values[start:start + chunk_rows], dtype=np.float64)
+        yield chunk[~np.isnan(chunk)]
+
+
+def compute_histogram(values, value_range, scale=1.0, base_bins=BASE_BINS, chunk_rows=HISTOGRAM_CHUNK_ROWS):
+    """Bin a column's values with vectorized NumPy binning, chunk by chunk
+
+    value_range is the column's (min, max), which the profile already knows;
+    scale weights every value (used to blow a reservoir sample up to full size).
+    Chunking keeps the float64 copy small on very long columns.
+    """
+    low, high = float(value_range[0]), float(value_range[1])
+    if not np.isfinite(low) or not np.isfinite(high):
+        low, high = 0.0, 1.0
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+
+    counts = np.zeros(base_bins, dtype=np.int64)
+    edges = np.linspace(low, high, base_bins + 1)
+    for chunk in _float_chunks(values, chunk_rows):
+        chunk_counts, _ = np.histogram(chunk, bins=base_bins, range=(low, high))
+        counts += chunk_counts
+    return HistogramAggregate(edges, counts * scale if scale != 1.0 else counts)
+
+
+def _pair_chunks(x, y, chunk_rows):
+    """Yield float64 (x, y) chunks with rows missing either value removed"""
+    for start in range(0, len(x), chunk_rows):
+        xs = x.iloc[start:start + chunk_rows].to_numpy(dtype=np.float64, na_value=np.nan)
+        ys = y.iloc[start:start + chunk_rows].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        yield xs[valid], ys[valid]
+
+
+def _padded(value_range):
+    # Same fallbacks as compute_histogram: an all-NaN/inf column has no finite range
+    low, high = float(value_range[0]), float(value_range[1])
+    if not np.isfinite(low) or not np.isfinite(high):
+        low, high = 0.0, 1.0
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+def density_grid(x, y, x_range, y_range, shape=(400, 250), chunk_rows=HISTOGRAM_CHUNK_ROWS):
+    """2D histogram raster of two columns; drawing it costs pixels, not rows
+
+    Returns (counts, extent) with counts shaped (y_bins, x_bins) for imshow;
+    counts are all zero when no row has finite values in both columns.
+    """
+    x_range, y_range = _padded(x_range), _padded(y_range)
+    counts = np.zeros(shape, dtype=np.int64)
+    for xs, ys in _pair_chunks(x, y, chunk_rows):
+        chunk_counts, _, _ = np.histogram2d(xs, ys, bins=shape, range=(x_range, y_range))
+        counts += chunk_counts.astype(np.int64)
+    return counts.T, (x_range[0], x_range[1], y_range[0], y_range[1])
+
+
+def stratified_sample(x, y, x_range, y_range, target_points=20_000, grid=64, seed=0,
+                      chunk_rows=HISTOGRAM_CHUNK_ROWS):
+    """Density-stratified sample of (x, y) points
+
+    Every cell of a grid x grid lattice keeps roughly the same number of
+    points, so dense regions are thinned while sparse regions and outliers
+    survive. Returns (xs, ys) NumPy arrays.
+    """
+    x_range, y_range = _padded(x_range), _padded(y_range)
+    cells = grid * grid
+
+    def cell_ids(xs, ys):
+        cx = np.clip(((xs - x_range[0]) / (x_range[1] - x_range[0]) * grid).astype(np.int64), 0, grid - 1)
+        cy = np.clip(((ys - y_range[0]) / (y_range[1] - y_range[0]) * grid).astype(np.int64), 0, grid - 1)
+        return cx * grid + cy
+
+    # First pass: points per cell
+    cell_counts = np.zeros(cells, dtype=np.int64)
+    for xs, ys in _pair_chunks(x, y, chunk_rows):
+        cell_counts += np.bincount(cell_ids(xs, ys), minlength=cells)
+
+    # Per-cell cap chosen so the expected total is close to target_points
+    occupied = np.sort(cell_counts[cell_counts > 0])
+    cap = float(target_points)
+    if occupied.sum() > target_points:
+        # Largest cap c with sum(min(count, c)) <= target_points
+        remaining = target_points
+        for position, count in enumerate(occupied):
+            share = remaining / (len(occupied) - position)
+            if count > share:
+                cap = share
+                break
+            remaining -= count
+
+    rng = np.random.default_rng(seed)
+    sampled_x, sampled_y = [], []
+    for xs, ys in _pair_chunks(x, y, chunk_rows):
+        keep_probability = np.minimum(1.0, cap / np.maximum(cell_counts[cell_ids(xs, ys)], 1))
+        keep = rng.random(len(xs)) < keep_probability
+        sampled_x.append(xs[keep])
+        sampled_y.append(ys[keep])
+    return np.concatenate(sampled_x), np.concatenate(sampled_y)
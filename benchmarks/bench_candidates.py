@@ -0,0 +1,94 @@
+"""Time to a correct answer: serial retries vs racing N candidates concurrently.
+
+The stub server answers every request after a random think time, and a
+random share of answers reference a column that doesn't exist (they fail
+validation). Serial mode retries one request at a time until an answer
+passes, as a user rephrasing would; race mode starts N candidates at once
+and keeps the first that passes, starting a new race if none does.
+
+Usage:
+    python benchmarks/bench_candidates.py
+    python benchmarks/bench_candidates.py --questions 100 --candidates 4 --failure-rate 0.4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generation import candidate_options, race_candidates, stream_code  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+
+GOOD = 'df["math score"].mean()\nThis is the average math score.'
+BAD = 'df["maths_score"].mean()\nThis is the average math score.'
+
+
+def make_answer(failure_rate, rng):
+    def answer(prompt, options):
+        # Think time: a random number of preamble lines streamed before the code
+        preamble = "Let me look at the columns.\n" * int(rng.expovariate(1 / 3))
+        return preamble + (BAD if rng.random() < failure_rate else GOOD)
+    return answer
+
+
+def check(text, cancelled, df):
+    code = next((line.strip() for line in text.split("\n") if line.strip().startswith("df")), "")
+    if cancelled():
+        return None
+    try:
+        result = eval(code, {"df": df, "pd": pd, "__builtins__": {}})
+    except Exception as e:
+        return False, code, str(e), None
+    return True, code, "ok", result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11504)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--budget", type=float, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    stub = StubOllama(load_seconds=0, token_seconds=0.01, answer=make_answer(args.failure_rate, rng))
+    server = stub.serve(port=args.port)
+    client = LLMClient(f"http://127.0.0.1:{args.port}", "mistral", pool_size=args.candidates)
+    df = pd.DataFrame({"math score": np.arange(100.0)})
+
+    serial, race = [], []
+    for _ in range(args.questions):
+        start = time.perf_counter()
+        for attempt in range(args.candidates * 4):
+            generation = stream_code(client, "QUESTION", options=candidate_options(attempt))
+            if check(generation.text, lambda: False, df)[0]:
+                break
+        serial.append(time.perf_counter() - start)
+
+        # A race where every candidate fails is asked again, like a serial retry
+        start = time.perf_counter()
+        for attempt in range(4):
+            winner, _, _ = race_candidates(client, "QUESTION", args.candidates, args.budget,
+                                           lambda text, cancelled: check(text, cancelled, df))
+            if winner is not None:
+                break
+        race.append(time.perf_counter() - start)
+
+    print(f"{args.questions} questions, {args.failure_rate:.0%} of answers fail validation")
+    for name, times in [("serial retries", serial), (f"race of {args.candidates}", race)]:
+        times = np.array(times)
+        print(f"{name:>15}: p50 {np.percentile(times, 50):.3f}s  p95 {np.percentile(times, 95):.3f}s  "
+              f"max {times.max():.3f}s")
+    print(f"aborted streams on the server: {stub.aborted}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare the blocked correlation engine against DataFrame.corr.
+
+Usage:
+    python benchmarks/bench_correlation.py                # 100/500/1000 columns, 20k rows
+    python benchmarks/bench_correlation.py --rows 100000 100 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from correlation import correlation_matrix  # noqa: E402
+
+
+def make_frame(rows, columns, nan_fraction, seed=0):
+    """Sensor-like frame: groups of correlated columns with scattered gaps"""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(rows, 16))
+    loadings = rng.normal(size=(16, columns))
+    values = factors @ loadings + rng.normal(size=(rows, columns))
+    if nan_fraction:
+        values[rng.random(values.shape) < nan_fraction] = np.nan
+    return pd.DataFrame(values, columns=[f"sensor_{i}" for i in range(columns)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("columns", nargs="*", type=int, default=[100, 500, 1000])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--nan-fraction", type=float, default=0.01)
+    parser.add_argument("--methods", nargs="*", default=["pearson", "spearman"])
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows, {args.nan_fraction:.0%} missing, {os.cpu_count()} cores")
+    print(f"{'method':>9} {'columns':>8} {'DataFrame.corr':>15} {'engine':>9} {'speedup':>8} {'max |diff|':>11}")
+    for method in args.methods:
+        for columns in args.columns:
+            df = make_frame(args.rows, columns, args.nan_fraction)
+            expected, pandas_time = timed(lambda: df.corr(method=method))
+            (actual, _), engine_time = timed(lambda: correlation_matrix(df, method))
+            diff = np.nanmax(np.abs(actual.to_numpy() - expected.to_numpy()))
+            print(f"{method:>9} {columns:>8} {pandas_time:>14.2f}s {engine_time:>8.2f}s "
+                  f"{pandas_time / engine_time:>7.1f}x {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
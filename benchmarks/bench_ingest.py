@@ -0,0 +1,65 @@
+"""Compare the upload tab's CSV engine against plain pd.read_csv.
+
+Usage:
+    python benchmarks/bench_ingest.py              # 1M and 10M rows
+    python benchmarks/bench_ingest.py 100000 1000000
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ingestion import read_csv_fast  # noqa: E402
+
+
+def make_csv(rows, seed=0):
+    """Build an in-memory CSV shaped like the student-performance datasets"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "gender": rng.choice(["female", "male"], rows),
+        "group": rng.choice(["group A", "group B", "group C", "group D", "group E"], rows),
+        "lunch": rng.choice(["standard", "free/reduced"], rows),
+        "math score": rng.integers(0, 101, rows),
+        "reading score": rng.normal(70, 15, rows).round(1),
+        "writing score": rng.normal(68, 15, rows).round(1),
+    })
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False)
+    buffer.name = f"bench_{rows}.csv"
+    return buffer
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(row_counts):
+    print(f"{'rows':>12} {'MB':>8} {'pd.read_csv':>12} {'arrow/numpy':>12} {'arrow/arrow':>12}")
+    for rows in row_counts:
+        buffer = make_csv(rows)
+        size_mb = buffer.getbuffer().nbytes / 1e6
+        repeat = 1 if rows >= 5_000_000 else 3
+
+        def baseline():
+            buffer.seek(0)
+            pd.read_csv(buffer)
+
+        numpy_time = best_of(lambda: read_csv_fast(buffer, dtype_backend="numpy"), repeat)
+        arrow_time = best_of(lambda: read_csv_fast(buffer, dtype_backend="pyarrow"), repeat)
+        pandas_time = best_of(baseline, repeat)
+        print(f"{rows:>12,} {size_mb:>8.1f} {pandas_time:>11.2f}s {numpy_time:>11.2f}s {arrow_time:>11.2f}s")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    main(counts)
@@ -0,0 +1,90 @@
+"""Exercise the pooled, pre-warmed LLM client against the stub Ollama server.
+
+Compares the first question with and without a background warm-up, and
+sequential requests on fresh connections against the pooled client.
+
+Usage:
+    python benchmarks/bench_llm_client.py
+    python benchmarks/bench_llm_client.py --load-seconds 5 --requests 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generation import stream_code  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+
+
+class UnpooledClient:
+    """Baseline: a new connection per request, like a bare requests.post"""
+
+    def __init__(self, base_url, model):
+        self.base_url = base_url
+        self.model = model
+
+    def stream(self, prompt):
+        response = requests.post(f"{self.base_url}/api/generate", stream=True,
+                                 json={"model": self.model, "prompt": prompt, "stream": True},
+                                 headers={"Connection": "close"})
+        try:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line).get("response", "")
+        finally:
+            response.close()
+
+
+def wait_ready(client, timeout=60):
+    start = time.perf_counter()
+    while client.status()["state"] == "warming" and time.perf_counter() - start < timeout:
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11501)
+    parser.add_argument("--load-seconds", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = StubOllama(load_seconds=args.load_seconds, token_seconds=0.005)
+    server = stub.serve(port=args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    prompt = "QUESTION: How many rows are there?"
+
+    # Cold: the first question pays the model load
+    cold = stream_code(LLMClient(base_url, "mistral", keep_alive="1s"), prompt)
+    time.sleep(1.5)
+
+    # Warm: the load happens in the background while the user is still typing
+    client = LLMClient(base_url, "mistral", keep_alive="30m")
+    client.warm_up()
+    wait_ready(client)
+    warm = stream_code(client, prompt)
+    print(f"model load {args.load_seconds:.1f}s")
+    print(f"first question, cold client:      {cold.total_seconds:6.3f}s (first token {cold.first_token_seconds:.3f}s)")
+    print(f"first question, pre-warmed client: {warm.total_seconds:6.3f}s (first token {warm.first_token_seconds:.3f}s)")
+
+    for name, candidate in [("new connection per request", UnpooledClient(base_url, "mistral")),
+                            ("pooled keep-alive client", client)]:
+        connections = stub.connections
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            list(candidate.stream(prompt))
+        elapsed = time.perf_counter() - start
+        print(f"{args.requests} requests, {name:>26}: {elapsed / args.requests * 1000:7.2f} ms/request, "
+              f"{stub.connections - connections} connections opened")
+
+    print(f"model loads on the server: {stub.loads}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Per-question cost of cleaning, validating and compiling generated code versus column count.
+
+"regex" is the pipeline cloud.py used before code_normalizer: a str.replace
+probe per DataFrame column, regex fix-ups, a regex validator over the
+metadata's column list and a separate compile(). "ast" is
+CodeNormalizer.check, built once per dataset. Both process the same model
+responses.
+
+Usage:
+    python benchmarks/bench_normalizer.py               # 10/100/1000/5000 columns
+    python benchmarks/bench_normalizer.py --repeat 200 50 20000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from code_normalizer import CodeNormalizer  # noqa: E402
+
+RESPONSES = [
+    'df["metric_0"].mean()',
+    "```python\ndf.metric_2.max()\n```\nThis returns the maximum.",
+    'df[df["segment_1"] == "level 3"]["metric_4"].median()',
+    'df.groupby("segment_3")["metric_6"].mean().idxmax()',
+    'df["segment_1"].value_count().idxmax()',
+]
+
+
+def regex_pipeline(raw_code, columns, metadata):
+    code = raw_code.strip()
+    if "```python" in code:
+        code = code.split("```python")[1].split("```")[0].strip()
+    lines = [line.strip() for line in code.split("\n") if line.strip()]
+    code = next((line for line in lines if line.startswith("df") or line.startswith("pd.")), lines[-1])
+    for col in columns:
+        safe_col = col.strip().replace(" ", "_").lower()
+        if f"df.{safe_col}" in code:
+            code = code.replace(f"df.{safe_col}", f'df["{col}"]')
+    code = re.sub(r'df\[\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']\s*\]', r'df[["\1", "\2"]]', code)
+    code = code.replace(".value_count(", ".value_counts(")
+    valid_columns = [entry["Column"] for entry in metadata]
+    for col in re.findall(r'df\[[\"\']([^\"\']+)[\"\']\]', code):
+        if col not in valid_columns:
+            return None
+    for pattern in (r"\.idxmax\(\)\.max\(\)", r"\.max\(\)\.idxmax\(\)", r"\.value_count\("):
+        if re.search(pattern, code):
+            return None
+    return compile(code, "<string>", "eval")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("columns", nargs="*", type=int, default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'columns':>8} {'regex ms/question':>18} {'ast ms/question':>16} {'ast build ms':>13}")
+    for count in args.columns:
+        columns = [f"metric_{i}" if i % 2 == 0 else f"segment_{i}" for i in range(count)]
+        metadata = [{"Column": column} for column in columns]
+
+        start = time.perf_counter()
+        normalizer = CodeNormalizer(columns)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for response in RESPONSES:
+            assert normalizer.check(response).valid, response
+
+        timings = {}
+        for name, run in [("regex", lambda response: regex_pipeline(response, columns, metadata)),
+                          ("ast", normalizer.check)]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for response in RESPONSES:
+                    run(response)
+            timings[name] = (time.perf_counter() - start) * 1000 / (args.repeat * len(RESPONSES))
+        print(f"{count:>8} {timings['regex']:>18.3f} {timings['ast']:>16.3f} {build_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Out-of-core engine: equivalence with pandas on the prompt's GOOD EXAMPLES, and timings.
+
+The corpus is every line under GOOD EXAMPLES in prompts.CODE_PROMPT_TEMPLATE
+plus a few more shapes the translator covers. Each expression goes
+through CodeNormalizer, then runs with pandas on the in-memory frame and
+with DuckDB on a Parquet copy of it; results (or the exception raised)
+must match. As after dtype compaction of an upload, one column is a
+pandas categorical in memory but plain strings in the Parquet copy.
+Exits non-zero on any mismatch.
+
+With --ingest, also loads the same data as a CSV upload both ways (whole
+into pandas, and spooled to Parquet with a sample) in fresh processes and
+reports their time and peak RSS.
+
+Usage:
+    python benchmarks/bench_out_of_core.py             # 1M rows
+    python benchmarks/bench_out_of_core.py --rows 10000000 --ingest
+"""
+import argparse
+import io
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ingestion  # noqa: E402
+from code_normalizer import CodeNormalizer  # noqa: E402
+from out_of_core import OutOfCoreEngine, UnsupportedQuery  # noqa: E402
+from prompts import CODE_PROMPT_TEMPLATE  # noqa: E402
+
+EXTRA = [
+    'df["math score"].median()',
+    'df["reading score"].std()',
+    'df["lunch"].nunique()',
+    'df["gender"].value_counts()',
+    'df.groupby("race/ethnicity")["math score"].mean()',
+    'df.groupby("race/ethnicity")["writing score"].sum().idxmin()',
+    'df.groupby("race/ethnicity", observed=True)["reading score"].mean().idxmax()',
+    'df[df["math score"] != 50].shape[0]',
+    'df[~(df["gender"] == "Female")].shape[0]',
+    'df[df["lunch"].isin(["Standard", "standard"]) & (df["math score"] >= 70)]["reading score"].mean()',
+    'df[df["math score"].isnull()].shape[0]',
+    'df.query("`math score` > 60 and gender == \'Male\'").shape[0]',
+    'df[df["gender"] == "Nobody"]["math score"].mean()',
+    'df["gender"].value_counts()["Nobody"]',
+    'df["math score"].mean() + 1',
+    # Categorical column: pandas raises, lists unobserved categories or keeps empty groups
+    'df["parental level of education"].max()',
+    'df[df["parental level of education"] > "high"].shape[0]',
+    'df[df["parental level of education"] != "high school"]["parental level of education"].value_counts()',
+    'df[df["parental level of education"] != "high school"].groupby("parental level of education")["math score"]'
+    '.mean()',
+    'df[df["parental level of education"] != "high school"].groupby("parental level of education")["reading score"]'
+    '.sum().idxmin()',
+    'df["parental level of education"].nunique()',
+]
+
+# Columns compacted to category in the in-memory frame
+CATEGORICAL = ["parental level of education"]
+
+
+def good_examples():
+    section = CODE_PROMPT_TEMPLATE.split("GOOD EXAMPLES:")[1].split("BAD EXAMPLES:")[0]
+    return [line.split("#")[0].strip() for line in section.strip().splitlines() if line.strip()]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "gender": rng.choice(["Female", "Male"], rows),
+        "race/ethnicity": rng.choice([f"group {c}" for c in "ABCDE"], rows),
+        "parental level of education": rng.choice(["Bachelor's degree", "Master's degree", "high school"], rows),
+        "lunch": rng.choice(["Standard", "standard", "free/reduced"], rows),
+        "test preparation course": rng.choice(["Completed", "none"], rows),
+        "math score": rng.normal(66, 15, rows).round(),
+        "reading score": rng.integers(0, 101, rows),
+        "writing score": rng.integers(0, 101, rows),
+    })
+    df.loc[rng.random(rows) < 0.01, "math score"] = np.nan
+    return df
+
+
+def outcome(run):
+    start = time.perf_counter()
+    try:
+        result = run()
+    except UnsupportedQuery:
+        raise
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - start
+
+
+def same(left, right):
+    if isinstance(left, Exception) or isinstance(right, Exception):
+        return type(left) is type(right)
+    if isinstance(left, pd.Series) and isinstance(right, pd.Series):
+        # value_counts ties may come in a different order
+        left, right = left.sort_index(), right.sort_index()
+        return (left.index.equals(right.index) and left.name == right.name
+                and np.allclose(left.to_numpy(float), right.to_numpy(float), equal_nan=True))
+    if isinstance(left, (float, np.floating)) or isinstance(right, (float, np.floating)):
+        return (math.isnan(left) and math.isnan(right)) or math.isclose(left, right, rel_tol=1e-9)
+    return left == right
+
+
+def peak_rss():
+    # VmHWM, unlike ru_maxrss, starts afresh in the spawned child
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+
+
+def ingest(csv_path, directory, out_of_core, reply):
+    with open(csv_path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    upload.name = "students.csv"
+    ingestion.OUT_OF_CORE_DIR = directory
+    ingestion.OUT_OF_CORE_THRESHOLD_BYTES = 1 if out_of_core else 0
+    start = time.perf_counter()
+    dataset = ingestion.ingest_upload(upload, ingestion.fingerprint_upload(upload))
+    seconds = time.perf_counter() - start
+    reply.send((dataset.engine, len(dataset.df), seconds, peak_rss()))
+
+
+def compare_ingestion(df, directory):
+    csv_path = os.path.join(directory, "students.csv")
+    df.to_csv(csv_path, index=False)
+    print(f"\nCSV upload of {os.path.getsize(csv_path) / 1e6:,.0f} MB")
+    context = multiprocessing.get_context("spawn")
+    for out_of_core in (False, True):
+        receiver, sender = context.Pipe()
+        process = context.Process(target=ingest, args=(csv_path, directory, out_of_core, sender))
+        process.start()
+        engine, rows, seconds, peak = receiver.recv()
+        process.join()
+        print(f"  {engine:<34} {rows:>12,} rows in memory  {seconds:7.2f}s  peak RSS {peak / 1e6:8,.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--ingest", action="store_true")
+    args = parser.parse_args()
+
+    # groupby on a categorical warns about the observed=False default
+    warnings.simplefilter("ignore", FutureWarning)
+    df = make_frame(args.rows)
+    normalizer = CodeNormalizer(df.columns)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.parquet")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+        df[CATEGORICAL] = df[CATEGORICAL].astype("category")
+        engine = OutOfCoreEngine(path, categorical=CATEGORICAL)
+
+        mismatches = 0
+        print(f"{args.rows:,} rows")
+        print(f"{'expression':<100} {'result':>10} {'pandas s':>9} {'duckdb s':>9}")
+        for expression in good_examples() + EXTRA:
+            checked = normalizer.check(expression)
+            expected, pandas_seconds = outcome(lambda: eval(checked.code, {"df": df, "pd": pd, "__builtins__": {}}))
+            try:
+                actual, duckdb_seconds = outcome(lambda: engine.run(checked.source))
+            except UnsupportedQuery:
+                print(f"{checked.source:<100} {'fallback':>10} {pandas_seconds:>9.3f}")
+                continue
+            status = "equal" if same(expected, actual) else "MISMATCH"
+            mismatches += status == "MISMATCH"
+            print(f"{checked.source:<100} {status:>10} {pandas_seconds:>9.3f} {duckdb_seconds:>9.3f}")
+            if status == "MISMATCH":
+                print(f"    pandas: {expected!r}\n    duckdb: {actual!r}")
+        if args.ingest:
+            compare_ingestion(df, directory)
+    print(f"{mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Prompt size and latency versus column count: full JSON metadata vs serialize_schema.
+
+Metadata is built by the real profiler from a synthetic frame (half numeric,
+half categorical columns). Latency is time to first token from the stub
+Ollama server, which charges prompt processing at --prompt-tokens-per-second.
+
+Usage:
+    python benchmarks/bench_prompt.py                 # 10/100/500/1000 columns
+    python benchmarks/bench_prompt.py --prompt-tokens-per-second 1000 50 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generation import stream_code  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from profiling import build_metadata, profile_dataset  # noqa: E402
+from prompts import CODE_PROMPT_TEMPLATE, estimate_tokens, serialize_schema  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+
+
+def make_metadata(columns, rows=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        if i % 2:
+            data[f"segment_{i}"] = rng.choice([f"level {j}" for j in range(8)], rows)
+        else:
+            data[f"metric_{i}"] = rng.normal(100, 15, rows).round(2)
+    df = pd.DataFrame(data)
+    return build_metadata(df, profile_dataset(df))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("columns", nargs="*", type=int, default=[10, 100, 500, 1000])
+    parser.add_argument("--port", type=int, default=11502)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=500)
+    args = parser.parse_args()
+
+    stub = StubOllama(load_seconds=0, token_seconds=0.0,
+                      prompt_chars_per_second=args.prompt_tokens_per_second * 4)
+    server = stub.serve(port=args.port)
+    client = LLMClient(f"http://127.0.0.1:{args.port}", "mistral")
+
+    print(f"prompt processing at {args.prompt_tokens_per_second:g} tokens/s (stub server)")
+    print(f"{'columns':>8} {'full tokens':>12} {'compact tokens':>15} {'serialize':>10} "
+          f"{'full TTFT':>10} {'compact TTFT':>13}")
+    for columns in args.columns:
+        metadata = make_metadata(columns)
+        question = f"Which segment_{columns - 1} has the highest average metric_{columns // 2 * 2 - 2}?"
+        full_prompt = CODE_PROMPT_TEMPLATE.format(metadata_text=json.dumps(metadata), question=question)
+
+        start = time.perf_counter()
+        schema_text = serialize_schema(metadata, question)
+        serialize_ms = (time.perf_counter() - start) * 1000
+        compact_prompt = CODE_PROMPT_TEMPLATE.format(metadata_text=schema_text, question=question)
+
+        full = stream_code(client, full_prompt)
+        compact = stream_code(client, compact_prompt)
+        print(f"{columns:>8} {estimate_tokens(full_prompt):>12,} {estimate_tokens(compact_prompt):>15,} "
+              f"{serialize_ms:>8.2f}ms {full.first_token_seconds:>9.2f}s {compact.first_token_seconds:>12.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""AI Assistant query evaluation: inline in the script thread vs the worker process pool.
+
+Reports per-query overhead for a scalar and a large frame result, then the
+latency of a light query issued while a heavy pure-Python one (an apply
+over every row) runs for another session: inline both compete for the
+GIL in one process; in the pool the heavy one is confined to its worker
+and stopped at the wall-clock limit.
+
+Usage:
+    python benchmarks/bench_query_executor.py
+    python benchmarks/bench_query_executor.py --rows 5000000 --timeout 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from query_executor import QueryExecutor  # noqa: E402
+
+LIGHT = 'df.groupby("segment")["score"].mean()'
+HEAVY = 'df["score"].apply(lambda v: df["score"].iloc[:200].sum())'
+
+
+def inline(df, source):
+    return eval(compile(source, "<query>", "eval"), {"df": df, "pd": pd, "__builtins__": {}})
+
+
+def best_of(run, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def light_latency_during_heavy(run_light, run_heavy, samples=10):
+    heavy = threading.Thread(target=run_heavy, daemon=True)
+    heavy.start()
+    time.sleep(0.2)
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        run_light()
+        latencies.append(time.perf_counter() - start)
+    return max(latencies), heavy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--timeout", type=float, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"segment": rng.choice([f"segment {i}" for i in range(50)], args.rows),
+                       "score": rng.normal(50, 15, args.rows)})
+    executor = QueryExecutor(workers=2, timeout_seconds=args.timeout)
+    pooled = lambda source: executor.run("bench", df, source)  # noqa: E731
+    pooled("df.shape[0]")  # workers started and the dataset mapped
+
+    print(f"{args.rows:,} rows")
+    for label, source in [("scalar", 'df["score"].mean()'), ("frame result", 'df[df["score"] > 50]')]:
+        print(f"{label:>13}: inline {best_of(lambda: inline(df, source)):.3f}s  "
+              f"pool {best_of(lambda: pooled(source)):.3f}s")
+
+    print(f"light query alone: inline {best_of(lambda: inline(df, LIGHT)):.3f}s  "
+          f"pool {best_of(lambda: pooled(LIGHT)):.3f}s")
+    worst_inline, heavy = light_latency_during_heavy(lambda: inline(df, LIGHT), lambda: inline(df, HEAVY))
+    print(f"worst light query while a heavy apply runs ({os.cpu_count()} CPUs): inline {worst_inline:.3f}s", end="")
+    heavy.join(timeout=0)
+
+    def run_heavy():
+        try:
+            pooled(HEAVY)
+        except Exception as e:
+            print(f"\n  heavy query in the pool: {type(e).__name__}: {e}", end="")
+
+    worst_pool, heavy = light_latency_during_heavy(lambda: pooled(LIGHT), run_heavy)
+    print(f", pool {worst_pool:.3f}s")
+    heavy.join()
+    print(f"\npool stats: {executor.stats()}")
+    executor.close()
+    os._exit(0)  # the inline heavy apply is still running on its thread
+
+
+if __name__ == "__main__":
+    main()
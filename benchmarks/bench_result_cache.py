@@ -0,0 +1,70 @@
+"""Rerun cost of an AI Assistant query with and without the result cache.
+
+Each question's code is normalized with CodeNormalizer and evaluated
+against a synthetic frame; the "rerun" column is what the next Streamlit
+rerun pays, i.e. evaluating again without the cache or a lookup with it.
+
+Usage:
+    python benchmarks/bench_result_cache.py                 # 1M and 5M rows
+    python benchmarks/bench_result_cache.py 20000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from code_normalizer import CodeNormalizer  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+QUESTIONS = [
+    'df.groupby("segment")["score"].mean().idxmax()',
+    'df[df["score"] > 50].groupby(["segment", "group"])["score"].median()',
+    'df["segment"].value_counts()',
+    'df.nlargest(10, "score")',
+]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "segment": rng.choice([f"segment {i}" for i in range(50)], rows),
+        "group": rng.choice([f"group {i}" for i in range(20)], rows),
+        "score": rng.normal(50, 15, rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="*", type=int, default=[1_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'question':<70} {'first s':>8} {'rerun s':>9} {'cached s':>9} {'MB':>6}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        normalizer = CodeNormalizer(df.columns)
+        cache = ResultCache()
+        safe_globals = {"df": df, "pd": pd, "__builtins__": {}}
+        for question in QUESTIONS:
+            checked = normalizer.check(question)
+            key = ("fingerprint", checked.canonical)
+            _, first, _ = cache.get_or_compute(key, lambda: eval(checked.code, safe_globals))
+
+            start = time.perf_counter()
+            eval(checked.code, safe_globals)
+            rerun = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, _, cached = cache.get_or_compute(key, lambda: eval(checked.code, safe_globals))
+            lookup = time.perf_counter() - start
+            assert cached
+            print(f"{rows:>10} {question:<70} {first:>8.3f} {rerun:>9.3f} {lookup:>9.6f} "
+                  f"{cache.stats()['bytes'] / 1e6:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Local stand-in for the Ollama HTTP API, for exercising the AI Assistant offline.
+
+Implements POST /api/generate (streamed and non-streamed, empty prompt =
+load only), GET /api/tags and GET /api/ps. The model "loads" on the first
+request and again whenever keep_alive has expired, and tokens are streamed
+at a fixed rate, so cold starts and early stops behave like the real server.
+
+Usage:
+    python benchmarks/stub_ollama.py                       # serve on :11434
+    python benchmarks/stub_ollama.py --port 11500 --load-seconds 3
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = 'df.shape[0]\nThis returns the number of rows in the DataFrame.'
+KEEP_ALIVE_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value, default=300.0):
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+    if not match:
+        return default
+    return float(match.group(1)) * KEEP_ALIVE_UNITS.get(match.group(2) or "s", 1)
+
+
+class StubOllama:
+    """Server state: loaded model, its expiry, and request/connection counters"""
+
+    def __init__(self, model="mistral", load_seconds=2.0, token_seconds=0.02, answer=DEFAULT_ANSWER,
+                 chars_per_token=4, prompt_chars_per_second=None):
+        self.model = model
+        self.load_seconds = load_seconds
+        self.token_seconds = token_seconds
+        self.answer = answer
+        self.chars_per_token = chars_per_token
+        self.prompt_chars_per_second = prompt_chars_per_second
+        self.loaded_until = 0.0
+        self.loads = 0
+        self.requests = 0
+        self.connections = 0
+        self.aborted = 0
+        self.prompt_chars = []
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self, keep_alive):
+        with self._lock:
+            cold = time.monotonic() >= self.loaded_until
+            if cold:
+                self.loads += 1
+        if cold:
+            time.sleep(self.load_seconds)
+        with self._lock:
+            self.loaded_until = time.monotonic() + parse_keep_alive(keep_alive)
+
+    def tokens(self, prompt, options=None):
+        """The answer split into fixed-size tokens
+
+        answer is a string, or a callable taking (prompt, sampling options) so
+        candidates with different temperatures/seeds can answer differently.
+        """
+        answer = self.answer(prompt, options or {}) if callable(self.answer) else self.answer
+        return [answer[i:i + self.chars_per_token] for i in range(0, len(answer), self.chars_per_token)]
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload):
+                line = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json(200, {"models": [{"name": f"{stub.model}:latest"}]})
+                elif self.path == "/api/ps":
+                    loaded = time.monotonic() < stub.loaded_until
+                    self._json(200, {"models": [{"name": f"{stub.model}:latest"}] if loaded else []})
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self._json(404, {"error": "not found"})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if request.get("model", "").split(":")[0] != stub.model:
+                    self._json(404, {"error": f"model '{request.get('model')}' not found"})
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                prompt = request.get("prompt", "")
+                stub.ensure_loaded(request.get("keep_alive"))
+                if not prompt:
+                    self._json(200, {"model": stub.model, "response": "", "done": True})
+                    return
+                with stub._lock:
+                    stub.prompt_chars.append(len(prompt))
+                if stub.prompt_chars_per_second:
+                    time.sleep(len(prompt) / stub.prompt_chars_per_second)
+
+                tokens = stub.tokens(prompt, request.get("options"))
+                if not request.get("stream", True):
+                    time.sleep(stub.token_seconds * len(tokens))
+                    self._json(200, {"model": stub.model, "response": "".join(tokens), "done": True})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        time.sleep(stub.token_seconds)
+                        self._chunk({"model": stub.model, "response": token, "done": False})
+                    self._chunk({"model": stub.model, "response": "", "done": True})
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading (early stop)
+                    with stub._lock:
+                        stub.aborted += 1
+                    self.close_connection = True
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=11434):
+        """Start serving in a daemon thread; returns the server (call shutdown() to stop)"""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="mistral")
+    parser.add_argument("--load-seconds", type=float, default=2.0)
+    parser.add_argument("--token-seconds", type=float, default=0.02)
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    args = parser.parse_args()
+
+    stub = StubOllama(args.model, args.load_seconds, args.token_seconds, args.answer.replace("\\n", "\n"))
+    server = ThreadingHTTPServer((args.host, args.port), stub.handler())
+    print(f"Stub Ollama serving '{args.model}' on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import io
+import threading
+from collections import OrderedDict
+
+from matplotlib.figure import Figure
+
+
+def subplots(nrows=1, ncols=1, figsize=None, **kwargs):
+    """(fig, axes) like plt.subplots, without registering the figure with pyplot
+
+    pyplot's figure list and current figure are process-wide, and Streamlit
+    draws each session on its own thread, so charts are built on standalone
+    Figures that are freed like any other object once rendered.
+    """
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots(nrows, ncols, **kwargs)
+
+
+def render_figure(draw, fmt="png", dpi=150):
+    """Call draw() to build a figure (see subplots) and return its encoded bytes"""
+    fig = draw()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """Process-wide LRU cache of rendered chart bytes, bounded by total size"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if len(data) > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._entries[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get_or_render(self, key, draw, fmt="png"):
+        """Return cached bytes for key, rendering the figure on a miss"""
+        data = self.get(key)
+        if data is None:
+            data = render_figure(draw, fmt)
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self.total_bytes}
@@ -1,20 +1,129 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import os
-import matplotlib.pyplot as plt
 import seaborn as sns
 from langchain.prompts import PromptTemplate
-from langchain.chains.llm import LLMChain
-from langchain_community.llms import Ollama
-import re
-
-# Use Ollama (make sure `ollama serve` is running)
-llm = Ollama(model="mistral")
+import time
+import functools
+from aggregation import HISTOGRAM_BIN_OPTIONS, compute_histogram, density_grid, stratified_sample
+from charts import FigureCache, subplots
+from config import (
+    FIGURE_CACHE_BYTES,
+    HEATMAP_ANNOTATE_COLUMNS,
+    HEATMAP_MAX_COLUMNS,
+    LAZY_ANALYTICS,
+    LLM_CANDIDATE_BUDGET,
+    LLM_CANDIDATES,
+    LLM_CACHE_MAX_AGE_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_KEEP_ALIVE,
+    LLM_MODEL,
+    LLM_POOL_SIZE,
+    LLM_TIMEOUT,
+    OLLAMA_URL,
+    OUT_OF_CORE_DIR,
+    OUT_OF_CORE_MEMORY_BYTES,
+    QUERY_MEMORY_BYTES,
+    QUERY_SPOOL_DIR,
+    QUERY_TIMEOUT_SECONDS,
+    QUERY_WORKERS,
+    RESULT_CACHE_BYTES,
+    SCATTER_ROW_THRESHOLD,
+    SCATTER_SAMPLE_POINTS,
+    SIMILARITY_THRESHOLD,
+)
+from code_normalizer import CodeNormalizer
+from compaction import widen_integers
+from correlation import correlation_matrix, heatmap_subset, top_correlations
+from matplotlib.colors import LogNorm
+from out_of_core import OutOfCoreEngine
+from fast_path import FastPathCompiler
+from generation import race_candidates, stream_code
+from ingestion import IngestCache, fingerprint_upload, ingest_upload
+from llm_cache import CodeCache, schema_fingerprint
+from llm_client import LLMClient
+from query_executor import (
+    DatasetLoadTimeoutError,
+    QueryCancelledError,
+    QueryExecutor,
+    QueryMemoryError,
+    QueryTimeoutError,
+)
+from question_index import SimilarQuestionCache
+from result_cache import ResultCache
+from prompts import CODE_PROMPT_TEMPLATE, CODE_PROMPT_VARIABLES, PROMPT_VERSION, estimate_tokens, serialize_schema
+
+# One Ollama client per process (make sure `ollama serve` is running): pooled
+# connections, and the model is loaded in the background as soon as the app starts
+@st.cache_resource
+def get_llm_client():
+    client = LLMClient(OLLAMA_URL, LLM_MODEL, keep_alive=LLM_KEEP_ALIVE, pool_size=LLM_POOL_SIZE,
+                       timeout=LLM_TIMEOUT)
+    client.warm_up()
+    return client
+
+# Parsed uploads are shared by every session in this process
+@st.cache_resource
+def get_ingest_cache():
+    return IngestCache(max_entries=4)
+
+# Rendered chart images are shared the same way
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache(max_bytes=FIGURE_CACHE_BYTES)
+
+# AI Assistant query results, shared by every session on the same dataset
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(max_bytes=RESULT_CACHE_BYTES)
+
+# Worker processes evaluating AI Assistant queries under time and memory limits, shared by all sessions
+@st.cache_resource
+def get_query_executor():
+    return QueryExecutor(workers=QUERY_WORKERS, timeout_seconds=QUERY_TIMEOUT_SECONDS, memory_bytes=QUERY_MEMORY_BYTES,
+                         spool_dir=QUERY_SPOOL_DIR)
+
+# DuckDB over the Parquet copy of a large upload, one per dataset, shared by all sessions
+@st.cache_resource(max_entries=4)
+def get_out_of_core_engine(fingerprint, _path, _total_rows, _sample):
+    # Categorical columns of the sample keep their pandas semantics (see out_of_core)
+    categorical = [col for col, dtype in _sample.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    return OutOfCoreEngine(_path, total_rows=_total_rows, memory_bytes=OUT_OF_CORE_MEMORY_BYTES,
+                           timeout_seconds=QUERY_TIMEOUT_SECONDS, temp_dir=os.path.join(OUT_OF_CORE_DIR, "spill"),
+                           categorical=categorical)
+
+# Generated code is cached on disk, shared with other processes on this host
+@st.cache_resource
+def get_code_cache():
+    return CodeCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_age_seconds=LLM_CACHE_MAX_AGE_SECONDS)
+
+# Rule-based question compiler, one per dataset
+@st.cache_resource(max_entries=8)
+def get_fast_path_compiler(fingerprint, _metadata):
+    return FastPathCompiler(_metadata)
+
+# AST normalizer/validator for generated code, one per dataset
+@st.cache_resource(max_entries=8)
+def get_code_normalizer(fingerprint, _columns):
+    return CodeNormalizer(_columns)
+
+# In-memory similarity indexes over the questions in the code cache
+@st.cache_resource
+def get_similar_question_cache():
+    return SimilarQuestionCache(threshold=SIMILARITY_THRESHOLD)
 
 # Streamlit page setup
 st.set_page_config(page_title="🧠 Cogniview", layout="wide", page_icon="🧠")
 
+# Start (or retry) the model warm-up on every run; a no-op once it is loaded
+get_llm_client().warm_up()
+# Query workers start importing pandas now rather than on the first question
+if QUERY_WORKERS > 0:
+    get_query_executor()
+
 # Custom CSS for premium styling
 st.markdown("""
 <style>
@@ -371,6 +480,18 @@ if 'metadata' not in st.session_state:
     st.session_state.metadata = None
 if 'df' not in st.session_state:
     st.session_state.df = None
+if 'fingerprint' not in st.session_state:
+    st.session_state.fingerprint = None
+if 'compaction_report' not in st.session_state:
+    st.session_state.compaction_report = None
+if 'profile' not in st.session_state:
+    st.session_state.profile = None
+if 'parquet_path' not in st.session_state:
+    st.session_state.parquet_path = None
+if 'total_rows' not in st.session_state:
+    st.session_state.total_rows = None
+if 'upload_fingerprints' not in st.session_state:
+    st.session_state.upload_fingerprints = {}
 
 # Tab 1: Overview - FIXED VERSION
 with tab1:
@@ -457,31 +578,70 @@ with tab2:
 
     if file:
         try:
-            # Load file
-            if file.name.endswith(".csv"):
-                df = pd.read_csv(file)
-            else:
-                df = pd.read_excel(file)
-
+            # Fingerprint once per upload; reruns reuse it instead of rehashing the bytes
+            upload_id = getattr(file, "file_id", None)
+            fingerprint = st.session_state.upload_fingerprints.get(upload_id) if upload_id else None
+            if fingerprint is None:
+                fingerprint = fingerprint_upload(file)
+                if upload_id:
+                    st.session_state.upload_fingerprints[upload_id] = fingerprint
+
+            # Large CSVs stream in: preview the first block while the rest loads
+            early_preview = st.empty()
+            load_progress = st.empty()
+
+            def show_first_chunk(chunk):
+                with early_preview.container():
+                    st.info("⏳ Large file detected - previewing the first block while the rest loads...")
+                    st.dataframe(chunk.head(5), use_container_width=True)
+                    st.dataframe(pd.DataFrame({
+                        'Column': chunk.columns,
+                        'Provisional Type': chunk.dtypes.astype(str).values,
+                        'Non-Null (first block)': chunk.count().values
+                    }), use_container_width=True, hide_index=True)
+
+            def show_progress(bytes_read, total_bytes):
+                fraction = min(bytes_read / total_bytes, 1.0) if total_bytes else 1.0
+                load_progress.progress(fraction, text=f"📥 Loaded {bytes_read / 1e6:,.0f} of {total_bytes / 1e6:,.0f} MB")
+
+            # Load file (parsed once per distinct content, shared across reruns and sessions)
+            ingest_cache = get_ingest_cache()
+            dataset, cache_hit = ingest_cache.get_or_load(
+                fingerprint, lambda: ingest_upload(file, fingerprint, show_first_chunk, show_progress)
+            )
+            early_preview.empty()
+            load_progress.empty()
+            df = dataset.df
+            metadata = dataset.metadata
             sample_df = df.head(5)
-            st.session_state.df = df
-
-            # Build metadata
-            metadata = []
-            for col in sample_df.columns:
-                metadata.append({
-                    "Column": col,
-                    "Type": str(sample_df[col].dtype),
-                    "Sample": ', '.join(map(str, sample_df[col].dropna().unique().tolist()))
-                })
 
-            st.session_state.metadata = metadata
+            if st.session_state.fingerprint != fingerprint:
+                st.session_state.df = df
+                st.session_state.metadata = metadata
+                st.session_state.fingerprint = fingerprint
+                st.session_state.compaction_report = dataset.compaction_report
+                st.session_state.profile = dataset.profile
+                st.session_state.parquet_path = dataset.parquet_path
+                st.session_state.total_rows = dataset.total_rows
 
-            # Save metadata as JSON
-            with open("metadata.json", "w") as f:
-                json.dump(metadata, f, indent=4)
+                # Save metadata as JSON
+                with open("metadata.json", "w") as f:
+                    json.dump(metadata, f, indent=4)
 
             st.success("✅ Dataset processed successfully! Metadata extracted and ready for analysis.")
+            cache_stats = ingest_cache.stats()
+            st.caption(
+                f"⚡ Parsed with {dataset.engine} in {dataset.load_seconds:.2f}s · "
+                f"ingestion cache {'hit' if cache_hit else 'miss'} · "
+                f"{cache_stats['hits']} hits / {cache_stats['misses']} misses · "
+                f"{cache_stats['entries']} datasets cached"
+            )
+            if dataset.parquet_path is not None:
+                st.warning(
+                    f"🦆 Large file: all {dataset.total_rows:,} rows were saved to disk as Parquet. Previews, "
+                    f"analytics and charts use a random sample of {len(df):,} rows; the AI Assistant answers "
+                    f"filters, counts and aggregates from every row with DuckDB."
+                )
             
             st.markdown('<div class="glass-card" style="margin-top: 30px;">', unsafe_allow_html=True)
             st.markdown('<h3 style="color: white; margin-bottom: 20px;">📊 Data Preview</h3>', unsafe_allow_html=True)
@@ -491,6 +651,247 @@ with tab2:
         except Exception as e:
             st.error(f"❌ Error processing file: {e}")
 
+# Analytics panels: each renders from the shared profile and memoized results
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_correlation_matrix(fingerprint, columns, method, _df):
+    """Correlation matrix (and rows used) memoized per dataset fingerprint, column set and method"""
+    return correlation_matrix(_df[list(columns)], method)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_top_correlations(fingerprint, columns, method, k, _df):
+    """Top-k correlated pairs, pulled from the cached matrix's upper triangle"""
+    corr_matrix, _ = cached_correlation_matrix(fingerprint, columns, method, _df)
+    return top_correlations(corr_matrix, k)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_pair_correlation(fingerprint, x_col, y_col, _df):
+    """Pearson correlation of two columns memoized per dataset fingerprint"""
+    return _df[x_col].corr(_df[y_col])
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def cached_histogram(fingerprint, column, _df, _profile):
+    """Fine-grained histogram of one column, binned once per dataset fingerprint"""
+    value_range = _column_range(_profile, column)
+    if _profile.approximate:
+        # Reservoir sample weighted back up to full-data frequencies
+        sample = _profile.samples[column]
+        return compute_histogram(sample, value_range, scale=_profile.non_null_counts[column] / max(len(sample), 1))
+    return compute_histogram(_df[column], value_range)
+
+def _column_range(profile, column):
+    return profile.numeric_summary.at['min', column], profile.numeric_summary.at['max', column]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_density_grid(fingerprint, x_col, y_col, _df, _profile):
+    """2D-histogram raster of two columns, memoized per dataset fingerprint"""
+    return density_grid(_df[x_col], _df[y_col], _column_range(_profile, x_col), _column_range(_profile, y_col))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_scatter_sample(fingerprint, x_col, y_col, _df, _profile):
+    """Density-stratified point sample of two columns, memoized per dataset fingerprint"""
+    return stratified_sample(_df[x_col], _df[y_col], _column_range(_profile, x_col),
+                             _column_range(_profile, y_col), target_points=SCATTER_SAMPLE_POINTS)
+
+def show_chart(fingerprint, kind, params, draw):
+    """Display a chart through the shared figure cache; draw() builds it only on a miss"""
+    image = get_figure_cache().get_or_render((fingerprint, kind) + tuple(params), draw)
+    st.image(image, use_container_width=True)
+
+def render_data_quality(df, profile, fingerprint):
+    missing_data = profile.missing_by_column()
+
+    if len(missing_data) > 0:
+        def draw_missing_values():
+            fig, ax = subplots(figsize=(6, 4))
+            missing_data.plot(kind='bar', ax=ax, color='salmon')
+            ax.set_title('Missing Values by Column', color='white')
+            ax.set_ylabel('Missing Count', color='white')
+            ax.tick_params(colors='white')
+            fig.patch.set_facecolor((0, 0, 0, 0))  # Fully transparent RGBA
+            ax.set_facecolor((0, 0, 0, 0))
+            ax.tick_params(axis='x', labelrotation=45)
+            fig.tight_layout()
+            return fig
+
+        show_chart(fingerprint, "missing_values", (), draw_missing_values)
+    else:
+        st.markdown("""
+        <div style="text-align: center; padding: 40px;">
+            <div style="font-size: 3rem; margin-bottom: 15px;">✅</div>
+            <h4 style="color: white;">Perfect Data Quality</h4>
+            <p style="color: rgba(255, 255, 255, 0.8);">No missing values detected</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_distributions(df, profile, fingerprint):
+    numeric_cols = profile.numeric_cols
+    # Numeric columns distribution
+    if numeric_cols:
+        st.markdown("**Select Numeric Columns to Visualize:**")
+        selected_numeric = st.multiselect("Choose columns:", numeric_cols, default=numeric_cols[:2])
+        bins = st.select_slider("Bins:", options=HISTOGRAM_BIN_OPTIONS, value=20, key="histogram_bins")
+
+        if selected_numeric:
+            # Binned once per column; switching columns or bin counts never rescans the data
+            histograms = {col: cached_histogram(fingerprint, col, df, profile).rebin(bins) for col in selected_numeric}
+
+            def draw_histograms():
+                # Create smaller subplots
+                cols_per_row = 2
+                rows = (len(selected_numeric) + 1) // cols_per_row
+                fig, axes = subplots(rows, cols_per_row, figsize=(10, 4*rows))
+                fig.patch.set_facecolor((0, 0, 0, 0))
+
+                if rows == 1:
+                    axes = [axes] if len(selected_numeric) == 1 else axes
+                else:
+                    axes = axes.flatten()
+
+                for i, col in enumerate(selected_numeric):
+                    if i < len(axes):
+                        edges, counts = histograms[col]
+                        axes[i].hist(edges[:-1], bins=edges, weights=counts, alpha=0.7, color='skyblue', edgecolor='black')
+                        axes[i].set_title(f'{col}', fontsize=10, color='white')
+                        axes[i].set_xlabel(col, fontsize=9, color='white')
+                        axes[i].set_ylabel('Frequency', fontsize=9, color='white')
+                        axes[i].set_facecolor((0, 0, 0, 0))
+                        axes[i].tick_params(colors='white')
+
+                # Hide empty subplots
+                for i in range(len(selected_numeric), len(axes)):
+                    axes[i].set_visible(False)
+
+                fig.tight_layout()
+                return fig
+
+            show_chart(fingerprint, "histograms", (tuple(selected_numeric), bins), draw_histograms)
+
+    # Categorical columns
+    categorical_cols = profile.categorical_cols
+    if categorical_cols:
+        st.markdown("**Select Categorical Column to Visualize:**")
+        selected_cat = st.selectbox("Choose column:", categorical_cols)
+
+        if selected_cat:
+            def draw_value_counts():
+                fig, ax = subplots(figsize=(8, 4))
+                fig.patch.set_facecolor((0, 0, 0, 0))
+                ax.set_facecolor((0, 0, 0, 0))
+                value_counts = profile.top_values[selected_cat].head(10)
+                value_counts.plot(kind='bar', ax=ax, color='lightcoral')
+                ax.set_title(f'Distribution of {selected_cat}', color='white')
+                ax.set_xlabel(selected_cat, color='white')
+                ax.set_ylabel('Count', color='white')
+                ax.tick_params(colors='white')
+                ax.tick_params(axis='x', labelrotation=45)
+                fig.tight_layout()
+                return fig
+
+            show_chart(fingerprint, "value_counts", (selected_cat, 10), draw_value_counts)
+
+def render_relationships(df, profile, fingerprint):
+    numeric_cols = profile.numeric_cols
+    # Scatter plots for relationships
+    if len(numeric_cols) >= 2:
+        st.markdown("**Explore Relationships Between Variables:**")
+        col1, col2 = st.columns(2)
+
+        with col1:
+            x_axis = st.selectbox("Select X-axis:", numeric_cols, key="x_axis")
+        with col2:
+            y_axis = st.selectbox("Select Y-axis:", numeric_cols, key="y_axis")
+
+        scatter_mode = st.radio("Rendering:", ["Auto", "All points", "Sampled points", "Density raster"],
+                                horizontal=True, key="scatter_mode")
+        if scatter_mode == "Auto":
+            scatter_mode = "Density raster" if profile.rows > SCATTER_ROW_THRESHOLD else "All points"
+
+        if x_axis != y_axis:
+            if scatter_mode == "Density raster":
+                # Rendering cost depends on the raster size, not on the row count
+                def draw_scatter():
+                    counts, extent = cached_density_grid(fingerprint, x_axis, y_axis, df, profile)
+                    fig, ax = subplots(figsize=(8, 5))
+                    fig.patch.set_facecolor((0, 0, 0, 0))
+                    ax.set_facecolor((0, 0, 0, 0))
+                    if counts.any():
+                        image = ax.imshow(np.ma.masked_equal(counts, 0), origin='lower', extent=extent,
+                                          aspect='auto', cmap='plasma', norm=LogNorm(), interpolation='nearest')
+                        colorbar = fig.colorbar(image, ax=ax)
+                        colorbar.set_label('Rows per pixel', color='white')
+                        colorbar.ax.tick_params(colors='white')
+                    else:
+                        ax.text(0.5, 0.5, 'No rows with finite values in both columns', transform=ax.transAxes,
+                                ha='center', va='center', color='white')
+                    ax.set_xlabel(x_axis, color='white')
+                    ax.set_ylabel(y_axis, color='white')
+                    ax.set_title(f'Relationship between {x_axis} and {y_axis}', color='white')
+                    ax.tick_params(colors='white')
+                    fig.tight_layout()
+                    return fig
+            else:
+                if scatter_mode == "Sampled points":
+                    x_values, y_values = cached_scatter_sample(fingerprint, x_axis, y_axis, df, profile)
+                    st.caption(f"Showing {len(x_values):,} of {profile.rows:,} rows, thinned evenly by point density")
+                else:
+                    x_values, y_values = df[x_axis], df[y_axis]
+
+                def draw_scatter():
+                    fig, ax = subplots(figsize=(8, 5))
+                    fig.patch.set_facecolor((0, 0, 0, 0))
+                    ax.set_facecolor((0, 0, 0, 0))
+                    ax.scatter(x_values, y_values, alpha=0.6, color='purple')
+                    ax.set_xlabel(x_axis, color='white')
+                    ax.set_ylabel(y_axis, color='white')
+                    ax.set_title(f'Relationship between {x_axis} and {y_axis}', color='white')
+                    ax.tick_params(colors='white')
+                    fig.tight_layout()
+                    return fig
+
+            show_chart(fingerprint, "scatter", (x_axis, y_axis, scatter_mode), draw_scatter)
+
+            # Calculate correlation (always over the full data)
+            corr_coef = cached_pair_correlation(fingerprint, x_axis, y_axis, df)
+            st.metric("📊 Correlation Coefficient", f"{corr_coef:.3f}")
+    else:
+        st.info("Need at least 2 numeric columns for relationship analysis")
+
+def render_correlations(df, profile, fingerprint):
+    numeric_cols = profile.numeric_cols
+    # Correlation Matrix
+    if len(numeric_cols) > 1:
+        method_label = st.radio("Method:", ["Pearson", "Spearman", "Kendall"], horizontal=True, key="corr_method")
+        method = method_label.lower()
+        corr_matrix, rows_used = cached_correlation_matrix(fingerprint, tuple(numeric_cols), method, df)
+        if rows_used < profile.rows:
+            st.caption(f"≈ {method_label} computed on a random sample of {rows_used:,} of {profile.rows:,} rows")
+
+        # Wide frames show the most correlated columns, clustered, instead of every cell
+        heatmap_matrix = heatmap_subset(corr_matrix, HEATMAP_MAX_COLUMNS)
+        if len(heatmap_matrix) < len(corr_matrix):
+            st.caption(f"Showing the {len(heatmap_matrix)} most correlated of {len(corr_matrix)} numeric columns, clustered")
+
+        def draw_heatmap():
+            fig, ax = subplots(figsize=(8, 6))
+            fig.patch.set_facecolor((0, 0, 0, 0))
+            ax.set_facecolor((0, 0, 0, 0))
+            sns.heatmap(heatmap_matrix, annot=len(heatmap_matrix) <= HEATMAP_ANNOTATE_COLUMNS, cmap='coolwarm', center=0,
+                        ax=ax, square=True, linewidths=0.5, cbar_kws={"shrink": 0.8})
+            ax.set_title(f'Correlation Matrix ({method_label})', color='white')
+            ax.tick_params(colors='white')
+            fig.tight_layout()
+            return fig
+
+        show_chart(fingerprint, "correlation_heatmap", (tuple(numeric_cols), method, HEATMAP_MAX_COLUMNS), draw_heatmap)
+
+        # Strongest correlations
+        st.subheader("🔥 Strongest Correlations")
+        strongest = cached_top_correlations(fingerprint, tuple(numeric_cols), method, 5, df)
+        for col1, col2, corr_val in strongest.itertuples(index=False):
+            st.write(f"**{col1}** ↔ **{col2}**: {corr_val:.3f}")
+    else:
+        st.info("Need at least 2 numeric columns for correlation analysis")
+
 # Tab 3: EDA Analysis
 with tab3:
     st.markdown('<h2 class="section-header">📊 Advanced Analytics</h2>', unsafe_allow_html=True)
@@ -509,6 +910,8 @@ with tab3:
         """, unsafe_allow_html=True)
     else:
         df = st.session_state.df
+        profile = st.session_state.profile
+        fingerprint = st.session_state.fingerprint
         
         # Basic Info in glass cards
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -516,37 +919,62 @@ with tab3:
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("📊 Total Rows", f"{df.shape[0]:,}")
+            st.metric("📊 Total Rows", f"{profile.rows:,}")
         with col2:
-            st.metric("📋 Total Columns", df.shape[1])
+            st.metric("📋 Total Columns", profile.columns)
         with col3:
-            st.metric("⚠️ Missing Values", f"{df.isnull().sum().sum():,}")
+            st.metric("⚠️ Missing Values", f"{profile.total_missing:,}")
         with col4:
-            st.metric("💾 Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+            st.metric("💾 Memory Usage", f"{profile.total_memory / 1024:.1f} KB")
+        
+        if profile.approximate:
+            bounds = profile.error_bounds
+            st.info(
+                f"≈ **Approximate profile** ({profile.rows:,} rows, computed with streaming sketches). "
+                f"Quantiles are within ±{bounds['quantile_rank_error']:.2%} rank, distinct counts within "
+                f"±{bounds['distinct_relative_error']:.1%}, top-value counts within ±{bounds['top_k_count_error']:,} rows; "
+                f"histograms use a {bounds['sample_size']:,}-row reservoir sample. Counts, means, std, min and max are exact."
+            )
+        
+        # Before/after report from the dtype compaction done at load time
+        report = st.session_state.compaction_report
+        if report is not None:
+            before_kb = report['Before (KB)'].sum()
+            after_kb = report['After (KB)'].sum()
+            with st.expander(f"🗜️ Memory Optimization: {before_kb:,.1f} KB → {after_kb:,.1f} KB"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Before Compaction", f"{before_kb:,.1f} KB")
+                with col2:
+                    st.metric("After Compaction", f"{after_kb:,.1f} KB")
+                with col3:
+                    saved = (1 - after_kb / before_kb) * 100 if before_kb else 0.0
+                    st.metric("Saved", f"{saved:.1f}%")
+                st.dataframe(report, use_container_width=True, hide_index=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
         
+        lazy_mode = st.toggle("⚡ Lazy analytics - compute charts only when a panel is opened",
+                              value=LAZY_ANALYTICS, key="lazy_analytics")
+        
         # Create two main columns for layout
         left_col, right_col = st.columns([1, 1])
         
         with left_col:
             st.markdown('<div class="glass-card floating-card">', unsafe_allow_html=True)
             st.markdown('<h3 style="color: white; margin-bottom: 20px;">📋 Column Information</h3>', unsafe_allow_html=True)
-            dtype_df = pd.DataFrame({
-                'Column': df.columns,
-                'Data Type': df.dtypes,
-                'Non-Null Count': df.count(),
-                'Null Count': df.isnull().sum()
-            })
-            st.dataframe(dtype_df, height=300, use_container_width=True)
+            dtype_df = profile.column_info()
+            st.dataframe(dtype_df, height=300, use_container_width=True, hide_index=True)
             st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('<div class="glass-card floating-card" style="margin-top: 20px;">', unsafe_allow_html=True)
             st.markdown('<h3 style="color: white; margin-bottom: 20px;">📊 Statistical Summary</h3>', unsafe_allow_html=True)
-            numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
+            numeric_cols = profile.numeric_cols
             if numeric_cols:
-                summary_stats = df[numeric_cols].describe()
+                summary_stats = profile.numeric_summary
                 st.dataframe(summary_stats, use_container_width=True)
+                if profile.approximate:
+                    st.caption(f"≈ 25%/50%/75% are approximate (±{profile.error_bounds['quantile_rank_error']:.2%} rank)")
             else:
                 st.info("No numeric columns found for statistical summary")
             st.markdown('</div>', unsafe_allow_html=True)
@@ -554,33 +982,11 @@ with tab3:
         with right_col:
             st.markdown('<div class="glass-card floating-card">', unsafe_allow_html=True)
             st.markdown('<h3 style="color: white; margin-bottom: 20px;">🔍 Data Quality Analysis</h3>', unsafe_allow_html=True)
-            missing_data = df.isnull().sum()
-            missing_data = missing_data[missing_data > 0].sort_values(ascending=False)
-            
-            if len(missing_data) > 0:
-                fig, ax = plt.subplots(figsize=(6, 4))
-                missing_data.plot(kind='bar', ax=ax, color='salmon')
-                ax.set_title('Missing Values by Column', color='white')
-                ax.set_ylabel('Missing Count', color='white')
-                ax.tick_params(colors='white')
-                fig.patch.set_facecolor((0, 0, 0, 0))  # Fully transparent RGBA
-                ax.set_facecolor((0, 0, 0, 0))
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
-            else:
-                st.markdown("""
-                <div style="text-align: center; padding: 40px;">
-                    <div style="font-size: 3rem; margin-bottom: 15px;">✅</div>
-                    <h4 style="color: white;">Perfect Data Quality</h4>
-                    <p style="color: rgba(255, 255, 255, 0.8);">No missing values detected</p>
-                </div>
-                """, unsafe_allow_html=True)
+            if not lazy_mode or st.toggle("Show missing-values chart", key="show_quality_chart"):
+                render_data_quality(df, profile, fingerprint)
             
             # Data Quality Score
-            total_cells = df.shape[0] * df.shape[1]
-            missing_cells = df.isnull().sum().sum()
-            quality_score = ((total_cells - missing_cells) / total_cells) * 100
+            quality_score = profile.completeness
             
             st.metric("🎯 Data Completeness", f"{quality_score:.1f}%")
             st.markdown('</div>', unsafe_allow_html=True)
@@ -589,242 +995,67 @@ with tab3:
         st.markdown('<div class="glass-card" style="margin-top: 30px;">', unsafe_allow_html=True)
         st.markdown('<h3 style="color: white; text-align: center; margin-bottom: 30px;">📈 Interactive Visualizations</h3>', unsafe_allow_html=True)
         
-        # Create tabs for different types of visualizations
-        viz_tab1, viz_tab2, viz_tab3 = st.tabs(["📊 Distributions", "📈 Relationships", "🔗 Correlations"])
-        
-        with viz_tab1:
-            # Numeric columns distribution
-            if numeric_cols:
-                st.markdown("**Select Numeric Columns to Visualize:**")
-                selected_numeric = st.multiselect("Choose columns:", numeric_cols, default=numeric_cols[:2])
-                
-                if selected_numeric:
-                    # Create smaller subplots
-                    cols_per_row = 2
-                    rows = (len(selected_numeric) + 1) // cols_per_row
-                    fig, axes = plt.subplots(rows, cols_per_row, figsize=(10, 4*rows))
-                    fig.patch.set_facecolor((0, 0, 0, 0))
-
-                    
-                    if rows == 1:
-                        axes = [axes] if len(selected_numeric) == 1 else axes
-                    else:
-                        axes = axes.flatten()
-                    
-                    for i, col in enumerate(selected_numeric):
-                        if i < len(axes):
-                            axes[i].hist(df[col].dropna(), bins=20, alpha=0.7, color='skyblue', edgecolor='black')
-                            axes[i].set_title(f'{col}', fontsize=10, color='white')
-                            axes[i].set_xlabel(col, fontsize=9, color='white')
-                            axes[i].set_ylabel('Frequency', fontsize=9, color='white')
-                            axes[i].set_facecolor((0, 0, 0, 0))
-                            axes[i].tick_params(colors='white')
-                    
-                    # Hide empty subplots
-                    for i in range(len(selected_numeric), len(axes)):
-                        axes[i].set_visible(False)
-                    
-                    plt.tight_layout()
-                    st.pyplot(fig)
-            
-            # Categorical columns
-            categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
-            if categorical_cols:
-                st.markdown("**Select Categorical Column to Visualize:**")
-                selected_cat = st.selectbox("Choose column:", categorical_cols)
-                
-                if selected_cat:
-                    fig, ax = plt.subplots(figsize=(8, 4))
-                    fig.patch.set_facecolor((0, 0, 0, 0))
-                    ax.set_facecolor((0, 0, 0, 0))
-                    value_counts = df[selected_cat].value_counts().head(10)
-                    value_counts.plot(kind='bar', ax=ax, color='lightcoral')
-                    ax.set_title(f'Distribution of {selected_cat}', color='white')
-                    ax.set_xlabel(selected_cat, color='white')
-                    ax.set_ylabel('Count', color='white')
-                    ax.tick_params(colors='white')
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
-                    st.pyplot(fig)
+        viz_panels = ["📊 Distributions", "📈 Relationships", "🔗 Correlations"]
+        viz_renderers = [render_distributions, render_relationships, render_correlations]
         
-        with viz_tab2:
-            # Scatter plots for relationships
-            if len(numeric_cols) >= 2:
-                st.markdown("**Explore Relationships Between Variables:**")
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    x_axis = st.selectbox("Select X-axis:", numeric_cols, key="x_axis")
-                with col2:
-                    y_axis = st.selectbox("Select Y-axis:", numeric_cols, key="y_axis")
-                
-                if x_axis != y_axis:
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    fig.patch.set_facecolor((0, 0, 0, 0))
-                    ax.set_facecolor((0, 0, 0, 0))
-                    ax.scatter(df[x_axis], df[y_axis], alpha=0.6, color='purple')
-                    ax.set_xlabel(x_axis, color='white')
-                    ax.set_ylabel(y_axis, color='white')
-                    ax.set_title(f'Relationship between {x_axis} and {y_axis}', color='white')
-                    ax.tick_params(colors='white')
-                    plt.tight_layout()
-                    st.pyplot(fig)
-                    
-                    # Calculate correlation
-                    corr_coef = df[x_axis].corr(df[y_axis])
-                    st.metric("📊 Correlation Coefficient", f"{corr_coef:.3f}")
-            else:
-                st.info("Need at least 2 numeric columns for relationship analysis")
+        if lazy_mode:
+            # Only the opened panel runs; the others cost nothing on a rerun
+            active_panel = st.radio("Open a panel:", ["💤 None"] + viz_panels, horizontal=True, key="active_viz_panel")
+            if active_panel in viz_panels:
+                viz_renderers[viz_panels.index(active_panel)](df, profile, fingerprint)
+        else:
+            # Create tabs for different types of visualizations
+            for viz_tab, render_panel in zip(st.tabs(viz_panels), viz_renderers):
+                with viz_tab:
+                    render_panel(df, profile, fingerprint)
         
-        with viz_tab3:
-            # Correlation Matrix
-            if len(numeric_cols) > 1:
-                fig, ax = plt.subplots(figsize=(8, 6))
-                fig.patch.set_facecolor((0, 0, 0, 0))
-                ax.set_facecolor((0, 0, 0, 0))
-                corr_matrix = df[numeric_cols].corr()
-                sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', center=0, ax=ax, 
-                           square=True, linewidths=0.5, cbar_kws={"shrink": 0.8})
-                ax.set_title('Correlation Matrix', color='white')
-                ax.tick_params(colors='white')
-                plt.tight_layout()
-                st.pyplot(fig)
-                
-                # Strongest correlations
-                st.subheader("🔥 Strongest Correlations")
-                corr_pairs = []
-                for i in range(len(corr_matrix.columns)):
-                    for j in range(i+1, len(corr_matrix.columns)):
-                        col1, col2 = corr_matrix.columns[i], corr_matrix.columns[j]
-                        corr_val = corr_matrix.iloc[i, j]
-                        corr_pairs.append((col1, col2, abs(corr_val), corr_val))
-                
-                corr_pairs.sort(key=lambda x: x[2], reverse=True)
-                
-                for col1, col2, abs_corr, corr_val in corr_pairs[:5]:
-                    st.write(f"**{col1}** ↔ **{col2}**: {corr_val:.3f}")
-            else:
-                st.info("Need at least 2 numeric columns for correlation analysis")
-
-# Helper functions for code validation
-def extract_column_names_from_code(code):
-    """Extract column names referenced in the code"""
-    # Pattern to match df["column"] or df['column']
-    pattern = r'df\[[\"\']([^\"\']+)[\"\']\]'
-    matches = re.findall(pattern, code)
-    return matches
-
-def validate_pandas_code(code, metadata):
-    """Validate the generated pandas code"""
+        figure_stats = get_figure_cache().stats()
+        st.caption(
+            f"🖼️ Figure cache: {figure_stats['hits']} hits / {figure_stats['misses']} misses · "
+            f"{figure_stats['entries']} charts · {figure_stats['bytes'] / 1e6:.1f} MB"
+        )
+
+def evaluate_query(checked, df, fingerprint, executor=None, engine=None, cancelled=None):
+    """Evaluate validated code with DuckDB on the full dataset when engine covers it,
+    otherwise in the query worker pool (skipped if cancelled() turns true while
+    it waits for a worker), or inline when there is none"""
+    if engine is not None and engine.supports(checked.source):
+        return engine.run(checked.source)
+    if executor is not None:
+        return executor.run(fingerprint, df, checked.source, cancelled=cancelled)
+    return eval(checked.code, {"df": widen_integers(df), "pd": pd, "__builtins__": {}})
+
+def check_candidate(text, cancelled, normalizer, evaluate):
+    """Normalize, validate and trial-run one raced candidate: (accepted, CheckedCode, message, result)
+
+    None when another candidate won first, so no query worker is spent on a trial run.
+    """
+    checked = normalizer.check(text)
+    if not checked.valid:
+        return False, checked, checked.message, None
+    if cancelled():
+        return None
     try:
-
-        # Get valid column names from metadata
-        valid_columns = [col['Column'] for col in metadata]
-        
-        # Extract column names from code
-        referenced_columns = extract_column_names_from_code(code)
-        
-        # Check if all referenced columns exist
-        for col in referenced_columns:
-            if col not in valid_columns:
-                return False, f"Column '{col}' not found. Available: {valid_columns}"
-        
-        # Check for common problematic patterns
-        problematic_patterns = [
-            (r'\.idxmax\(\)\.max\(\)', "Cannot chain .idxmax() with .max()"),
-            (r'\.max\(\)\.idxmax\(\)', "Cannot chain .max() with .idxmax()"),
-            (r'\.idxmin\(\)\.min\(\)', "Cannot chain .idxmin() with .min()"),
-            (r'\.min\(\)\.idxmin\(\)', "Cannot chain .min() with .idxmin()"),
-            (r'\.value_count\(', "Typo: Use `.value_counts()` instead of `.value_count()`"),
-
-        ]
-        
-        for pattern, message in problematic_patterns:
-            if re.search(pattern, code):
-                return False, message
-        
-        return True, "Code validation passed"
-    
+        result = evaluate(checked, cancelled=cancelled)
+    except QueryCancelledError:
+        return None
     except Exception as e:
-        return False, f"Validation error: {str(e)}"
-
-def clean_generated_code(raw_code):
-    """Clean and extract the actual pandas code"""
-    import re
-
-    # Remove any markdown formatting
-    code = raw_code.strip()
-    
-    # Remove markdown code blocks
-    if "```python" in code:
-        code = code.split("```python")[1].split("```")[0].strip()
-    elif "```" in code:
-        code = code.split("```")[1].split("```")[0].strip()
-    
-    # Split by lines and find the actual code line
-    lines = code.split('\n')
-    code_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        if line and (line.startswith('df') or line.startswith('pd.')):
-            code_lines.append(line)
-    
-    if code_lines:
-        final_code = code_lines[0]
-    else:
-        non_empty_lines = [line.strip() for line in lines if line.strip()]
-        final_code = non_empty_lines[-1] if non_empty_lines else code
-
-    # Remove any comments
-    if '#' in final_code:
-        final_code = final_code.split('#')[0].strip()
-
-    # 🔧 Fix dot-style access like df.reading_score → df["reading score"]
-    if 'df' in st.session_state and isinstance(st.session_state.df, pd.DataFrame):
-        for col in st.session_state.df.columns:
-            safe_col = col.strip().replace(' ', '_').lower()
-            dot_pattern = f"df.{safe_col}"
-            bracket_pattern = f'df["{col}"]'
-            if dot_pattern in final_code:
-                final_code = final_code.replace(dot_pattern, bracket_pattern)
-
-    # 🔧 Fix broken multi-column access: df["col1", "col2"] → df[["col1", "col2"]]
-    pattern = r'df\[\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']\s*\]'
-    final_code = re.sub(pattern, r'df[[\"\1\", \"\2\"]]', final_code)
-
-    # 🔧 Fix .loc[...] with argmax() → replace with groupby().mean().idxmax() idiom
-    if ".loc[" in final_code and "argmax()" in final_code:
-        final_code = 'df[df["test preparation course"] == "Completed"].groupby("gender")["writing score"].mean().idxmax()'
-
-    # 🔧 Fix weird backslashes, quotes
-    final_code = final_code.replace("\\\n", "")
-    final_code = final_code.replace("\\", "")
-    final_code = final_code.replace('“', '"').replace('”', '"').replace("‘", "'").replace("’", "'")
-
-        # 🔧 Final LLM insanity patch: groupby(df.query(...)) nonsense
-    broken_groupby = re.search(r'df\.query\([^)]+\)\["gender"\]\.groupby\(df\.query\([^)]+\)\["gender"\]\)', final_code)
-    if broken_groupby:
-        final_code = 'df[df["test preparation course"] == "Completed"].groupby("gender")["writing score"].mean().idxmax()'
-
-    # Fix variable-style column access: test_preparation_course → df["test preparation course"]
-    if "test_preparation_course" in final_code and 'df["test preparation course"]' not in final_code:
-        final_code = final_code.replace("test_preparation_course", 'df["test preparation course"]')
-
-# Fix common LLM mistakes
-    final_code = final_code.replace('.value_count(', '.value_counts(')
-
-# If LLM filters only for "Master's Degree", replace it with full groupby logic
-    if 'df["parental level of education"] == "Master\'s Degree"' in final_code:
-        final_code = 'df.groupby("parental level of education")["math score"].mean().idxmax()'
-
-
-    return final_code
+        return False, checked, f"Execution error: {e}", None
+    return True, checked, checked.message, result
 
 # Tab 4: Ask question and generate Python code
 with tab4:
     st.header("🧠 Neural Link - Ask a Question")
 
+    llm_status = get_llm_client().status()
+    if llm_status["state"] == "ready":
+        warmed = f" (loaded in {llm_status['warm_seconds']:.1f}s)" if llm_status["warm_seconds"] is not None else ""
+        st.caption(f"🟢 {llm_status['model']} is loaded and ready{warmed}")
+    elif llm_status["state"] == "warming":
+        st.caption(f"🟡 Loading {llm_status['model']} in the background; the first answer may take longer")
+    elif llm_status["state"] == "unavailable":
+        st.caption(f"🔴 Ollama is unavailable at {OLLAMA_URL}: {llm_status['detail']}")
+
     if st.session_state.metadata is None:
         st.warning("⚠️ Please upload a dataset in the 'Upload Dataset' tab first.")
     else:
@@ -835,24 +1066,24 @@ with tab4:
             st.subheader("💡 Question Suggestions")
 
             suggestions = []
-            numeric_columns = [col['Column'] for col in st.session_state.metadata if 'int' in col['Type'] or 'float' in col['Type']]
-            categorical_columns = [col['Column'] for col in st.session_state.metadata if 'object' in col['Type']]
+            suggestion_numeric = st.session_state.profile.numeric_cols
+            suggestion_categorical = st.session_state.profile.categorical_cols
 
-            if numeric_columns:
+            if suggestion_numeric:
                 suggestions.extend([
-                    f"What is the average of {numeric_columns[0]}?",
-                    f"What is the maximum value in {numeric_columns[0]}?",
-                    f"How many rows have {numeric_columns[0]} greater than 50?"
+                    f"What is the average of {suggestion_numeric[0]}?",
+                    f"What is the maximum value in {suggestion_numeric[0]}?",
+                    f"How many rows have {suggestion_numeric[0]} greater than 50?"
                 ])
 
-            if categorical_columns:
+            if suggestion_categorical:
                 suggestions.extend([
-                    f"Count the number of unique values in {categorical_columns[0]}",
-                    f"What is the most common value in {categorical_columns[0]}?"
+                    f"Count the number of unique values in {suggestion_categorical[0]}",
+                    f"What is the most common value in {suggestion_categorical[0]}?"
                 ])
 
-            if len(numeric_columns) >= 1 and len(categorical_columns) >= 1:
-                suggestions.append(f"Which {categorical_columns[0]} has the highest average {numeric_columns[0]}?")
+            if len(suggestion_numeric) >= 1 and len(suggestion_categorical) >= 1:
+                suggestions.append(f"Which {suggestion_categorical[0]} has the highest average {suggestion_numeric[0]}?")
 
             suggestions.extend([
                 "How many rows are there in total?",
@@ -875,93 +1106,136 @@ with tab4:
             del st.session_state.suggested_question
 
         if question:
-            # 🚀 BULLETPROOF PROMPT TEMPLATE
-            prompt = PromptTemplate(
-                input_variables=["metadata_text", "question"],
-                template="""
-You are an expert Python data analyst. Your ONLY job is to return ONE LINE of valid Python Pandas code.
-
-You will be given:
-- METADATA: a description of the DataFrame `df` (column names, data types, sample values)
-- QUESTION: a natural language question from the user
-
-IMPORTANT RULE:
-✅ ALWAYS access columns with square brackets: df["reading score"]
-❌ NEVER use dot-style like df.reading_score – it breaks if column has spaces
-
-STRICT RULES:
-1. Use ONLY column names from metadata.
-2. Always access columns using square brackets: df["column name"]
-3. NEVER use dot-access like df.reading_score – it breaks if column has spaces.
-4. Return ONLY one valid Python Pandas code line – no explanation, no markdown.
-5. Always use the DataFrame name: df
-6. Use double quotes for string values: "value"
-7. Use df.query("...") or df.loc[...] for filters.
-8. For group comparisons like "Which group has the highest average X?", use:
-   df.groupby("group_column")["numeric_column"].mean().idxmax()
-9. When using groupby, apply .mean() only to numeric columns (e.g., scores).
-10. NEVER use .loc[...] with .argmax()/argmin(). Use groupby().mean().idxmax() instead.
-11. NEVER make up Python-style variable names like test_preparation_course.
-    Always use the exact column name from metadata with quotes: df["test preparation course"]
-12. To count a specific value like "Male", use:
-    df["column"].value_counts()["Value"]
-13. For filtered group comparison, like “Which gender has highest score among X?”, use:
-    df[df["filter_column"] == "value"].groupby("group_column")["numeric_column"].mean().idxmax()
-14.To get the most common value in a column (like "What is the most common value in gender?"), use:
-df["column"].value_counts().idxmax()
-
-GOOD EXAMPLES:
-df.shape[0]  
-df["math score"].mean()  
-df[df["gender"] == "Female"].shape[0]  
-df.query("lunch == 'Standard'")["reading score"].mean()  
-df.groupby("lunch")["reading score"].mean().idxmax()  
-df[df["test preparation course"] == "Completed"].shape[0]  
-df["gender"].value_counts()["Male"]  
-df[df["test preparation course"] == "Completed"].groupby("gender")["writing score"].mean().idxmax()  
-df[df["lunch"] == "standard"].groupby("gender")["reading score"].mean().idxmax()  
-df[df["parental level of education"] == "Bachelor's degree"]["math score"].mean()  # For specific filtering
-df["gender"].value_counts().idxmax()
-
-BAD EXAMPLES:
-df.reading_score.mean() ❌  
-df.gender.value_counts() ❌  
-df["gender"].loc[df["math score"].argmax()] ❌  
-df[test_preparation_course] ❌  
-df[test_preparation_course == "Completed"] ❌  
-df.query("lunch == 'Standard'")["reading score"].idxmax() ❌  
-
-METADATA:
-{metadata_text}
-
-QUESTION:
-{question}
-
-Respond with ONLY one line of valid Python Pandas code.
-""",
-            )
-
-            chain = LLMChain(llm=llm, prompt=prompt)
+            prompt = PromptTemplate(input_variables=CODE_PROMPT_VARIABLES, template=CODE_PROMPT_TEMPLATE)
 
             with st.spinner("🧠 Generating Python code..."):
                 metadata_str = json.dumps(st.session_state.metadata)
-                raw_pandas_code = chain.run({
-                    "metadata_text": metadata_str,
-                    "question": question
-                })
-
-                # Clean the generated code
-                pandas_code = clean_generated_code(raw_pandas_code)
-                
-                print(f"Raw code: {raw_pandas_code}")
-                print(f"Cleaned code: {pandas_code}")
+                # Only the columns relevant to the question are described in full
+                schema_text = serialize_schema(st.session_state.metadata, question)
+
+                # Common question shapes compile straight to pandas, no model involved
+                fast_path = get_fast_path_compiler(st.session_state.fingerprint, st.session_state.metadata)
+                compile_start = time.perf_counter()
+                pandas_code = fast_path.compile(question)
+                compile_ms = (time.perf_counter() - compile_start) * 1000
+                code_source = "rule"
+
+                # Identical questions on the same schema reuse the stored code
+                code_cache = get_code_cache()
+                schema = schema_fingerprint(metadata_str)
+                cache_key = code_cache.make_key(LLM_MODEL, PROMPT_VERSION, schema, question)
+                if pandas_code is None:
+                    pandas_code = code_cache.get(cache_key)
+                    code_source = "cache" if pandas_code is not None else "llm"
+
+                # Otherwise a near-duplicate of an earlier question may already have validated code
+                similar_match = None
+                if pandas_code is None and SIMILARITY_THRESHOLD > 0:
+                    similar_cache = get_similar_question_cache()
+                    question_index = similar_cache.index_for(
+                        (LLM_MODEL, PROMPT_VERSION, schema),
+                        st.session_state.metadata,
+                        lambda: code_cache.entries(LLM_MODEL, PROMPT_VERSION, schema),
+                    )
+                    similar_match = similar_cache.lookup(question_index, question)
+                    if similar_match is not None:
+                        pandas_code = similar_match[0]
+                        code_source = "similar"
+
+                normalizer = get_code_normalizer(st.session_state.fingerprint, st.session_state.df.columns)
+                # Large uploads: df is a sample and the full dataset is on disk
+                engine = None
+                if st.session_state.parquet_path is not None:
+                    engine = get_out_of_core_engine(st.session_state.fingerprint, st.session_state.parquet_path,
+                                                    st.session_state.total_rows, st.session_state.df)
+                evaluate = functools.partial(evaluate_query, df=st.session_state.df,
+                                             fingerprint=st.session_state.fingerprint,
+                                             executor=get_query_executor() if QUERY_WORKERS > 0 else None,
+                                             engine=engine)
+                winner = None
+                checked = None
+                if code_source == "llm" and LLM_CANDIDATES > 1:
+                    # Race several candidates; the first that validates and runs cleanly wins
+                    winner, outcomes, generation_seconds = race_candidates(
+                        get_llm_client(),
+                        prompt.format(metadata_text=schema_text, question=question),
+                        LLM_CANDIDATES,
+                        LLM_CANDIDATE_BUDGET,
+                        functools.partial(check_candidate, normalizer=normalizer, evaluate=evaluate),
+                    )
+                    chosen = winner or next((outcome for outcome in outcomes if outcome.code), None)
+                    raw_pandas_code = chosen.generation.text if chosen is not None else ""
+                    # Candidates were already normalized while racing
+                    checked = chosen.code if chosen is not None else normalizer.check("")
+                elif code_source == "llm":
+                    # Stream tokens as they arrive and stop once a complete code line is out
+                    token_preview = st.empty()
+                    generation = stream_code(
+                        get_llm_client(),
+                        prompt.format(metadata_text=schema_text, question=question),
+                        on_token=lambda text: token_preview.code(text, language="python"),
+                    )
+                    token_preview.empty()
+                    raw_pandas_code = generation.text
+                    pandas_code = raw_pandas_code
+                    generation_seconds = generation.total_seconds
                 
                 st.subheader("⚡ Generated Python Code")
                 # st.code(pandas_code, language="python")
 
                 
-               # Validate the code before execution
-                is_valid, validation_message = validate_pandas_code(pandas_code, st.session_state.metadata)
+               # Parse, normalize and validate the code once; the result carries the compiled code object
+                if checked is None:
+                    checked = normalizer.check(pandas_code)
+                pandas_code = checked.source
+                is_valid, validation_message = checked.valid, checked.message
+
+                if code_source == "rule":
+                    st.caption(f"⚡ Compiled by the rule-based fast path in {compile_ms:.2f} ms (no LLM call)")
+                elif code_source == "cache":
+                    st.caption("⚡ Served from the code cache (no LLM call)")
+                elif code_source == "similar":
+                    st.caption(f"♻️ Reused the code of a similar question: \"{similar_match[2]}\" "
+                               f"(similarity {similar_match[1]:.2f}, no LLM call)")
+                else:
+                    if LLM_CANDIDATES > 1 and winner is not None:
+                        st.caption(
+                            f"Raced {LLM_CANDIDATES} candidates on {LLM_MODEL}: #{winner.index + 1} "
+                            f"(temperature {winner.options['temperature']}) validated and ran cleanly after "
+                            f"{generation_seconds:.2f}s; {len(outcomes) - 1} rejected before it, the rest cancelled"
+                        )
+                    elif LLM_CANDIDATES > 1:
+                        st.caption(
+                            f"Raced {LLM_CANDIDATES} candidates on {LLM_MODEL}: none validated and ran cleanly "
+                            f"within {LLM_CANDIDATE_BUDGET:g}s ({len(outcomes)} finished)"
+                        )
+                    else:
+                        st.caption(
+                            f"Generated by {LLM_MODEL}: first token after {generation.first_token_seconds:.2f}s, "
+                            f"{generation.total_seconds:.2f}s in total"
+                            + (" (stopped as soon as the code line was complete)" if generation.stopped_early else "")
+                            + f" · schema sent as ~{estimate_tokens(schema_text):,} tokens "
+                            f"(full metadata ~{estimate_tokens(metadata_str):,})"
+                        )
+                    # A race without a winner only has code that failed to run; don't keep it
+                    if is_valid and (LLM_CANDIDATES == 1 or winner is not None):
+                        code_cache.put(cache_key, LLM_MODEL, PROMPT_VERSION, schema, question,
+                                       pandas_code, generation_seconds)
+                        if SIMILARITY_THRESHOLD > 0:
+                            question_index.add(question, pandas_code)
+                cache_stats = code_cache.stats()
+                st.caption(
+                    f"Code cache: {cache_stats['hit_rate']:.0%} hit rate "
+                    f"({cache_stats['hits']} hits / {cache_stats['misses']} misses), "
+                    f"{cache_stats['saved_seconds']:.1f}s of generation saved, "
+                    f"{cache_stats['entries']} entries on disk"
+                )
+                if SIMILARITY_THRESHOLD > 0:
+                    similar_stats = get_similar_question_cache().stats()
+                    st.caption(
+                        f"Similar-question reuse: {similar_stats['reuses']} of {similar_stats['lookups']} "
+                        f"cache misses ({similar_stats['reuse_rate']:.0%}) answered without the LLM"
+                    )
 
                 if not is_valid:
                     st.error(f"❌ Code validation failed: {validation_message}")
@@ -971,18 +1245,61 @@ Respond with ONLY one line of valid Python Pandas code.
                         st.error("⚠️ No dataset found. Please upload a dataset first.")
                     else:
                         try:
-                            safe_globals = {
-                                "df": st.session_state.df,
-                                "pd": pd,
-                                "__builtins__": {}
-                            }
-
             # Show cleaned code
                             st.code(pandas_code, language="python")
 
-            # Compile and execute code
-                            compiled_code = compile(pandas_code, "<string>", "eval")
-                            result = eval(compiled_code, safe_globals)
+            # Execute the compiled code (in a query worker process unless disabled)
+                            # Reruns and other sessions on this dataset reuse the result of the same expression
+                            result_cache = get_result_cache()
+                            # Answers from the full Parquet copy and from the sample are kept apart
+                            full_data = engine is not None and engine.available()
+                            result_key = (st.session_state.fingerprint, checked.canonical, full_data)
+                            if winner is not None:
+                                # A winning candidate was already evaluated while racing
+                                result, result_seconds, result_cached = winner.result, None, False
+                                if RESULT_CACHE_BYTES > 0:
+                                    result_cache.put(result_key, result)
+                            elif RESULT_CACHE_BYTES > 0:
+                                result, result_seconds, result_cached = result_cache.get_or_compute(
+                                    result_key, lambda: evaluate(checked)
+                                )
+                            else:
+                                result, result_seconds, result_cached = evaluate(checked), None, False
+                            if result_cached:
+                                result_stats = result_cache.stats()
+                                st.caption(
+                                    f"♻️ Result reused from the result cache (took {result_seconds:.3f}s to compute) · "
+                                    f"{result_stats['hits']} hits / {result_stats['misses']} misses, "
+                                    f"{result_stats['entries']} results, {result_stats['bytes'] / 1e6:.1f} MB"
+                                )
+                            elif result_seconds is not None:
+                                st.caption(f"⏱️ Computed in {result_seconds:.3f}s; reruns reuse it until the dataset changes")
+                            if engine is not None:
+                                if engine.supports(checked.source):
+                                    st.caption(f"🦆 Answered from all {engine.total_rows:,} rows on disk with DuckDB")
+                                elif not engine.available():
+                                    st.warning(
+                                        f"⚠️ The on-disk copy of this dataset was removed to make room for newer "
+                                        f"uploads, so pandas answered from a random sample of "
+                                        f"{len(st.session_state.df):,} of the {engine.total_rows:,} rows. "
+                                        f"Upload the file again to query every row."
+                                    )
+                                else:
+                                    st.warning(
+                                        f"⚠️ DuckDB can't run this query, so pandas answered it from a "
+                                        f"random sample of {len(st.session_state.df):,} of the {engine.total_rows:,} rows. "
+                                        f"Counts and sums are for the sample only, and other results may differ "
+                                        f"from the full dataset."
+                                    )
+                            if QUERY_WORKERS > 0:
+                                executor_stats = get_query_executor().stats()
+                                st.caption(
+                                    f"🧮 Query workers: {executor_stats['workers']} processes, "
+                                    f"{executor_stats['queued']} queued · wait p95 {executor_stats['wait_p95']:.3f}s · "
+                                    f"run p50 {executor_stats['run_p50']:.3f}s / p95 {executor_stats['run_p95']:.3f}s · "
+                                    f"{executor_stats['timeouts']} timeouts, {executor_stats['load_timeouts']} load timeouts, "
+                                    f"{executor_stats['memory_errors']} over memory"
+                                )
 
                             st.markdown('<div class="glass-card" style="margin-top: 30px;">', unsafe_allow_html=True)
                             st.subheader("📊 Query Result")
@@ -1027,7 +1344,11 @@ Respond with ONLY one line of valid Python Pandas code.
 
             # Specific error guidance
                             error_str = str(e).lower()
-                            if "idxmax" in error_str and ("scalar" in error_str or "cannot" in error_str):
+                            if isinstance(e, DatasetLoadTimeoutError):
+                                st.info("💡 **Dataset Load Timeout**: The query never ran because a worker couldn't load the dataset in time. Try again once the server is less busy.")
+                            elif isinstance(e, (QueryTimeoutError, QueryMemoryError)):
+                                st.info("💡 **Query Too Heavy**: Filter the rows first or ask for an aggregate (count, mean, top 10) instead of every row.")
+                            elif "idxmax" in error_str and ("scalar" in error_str or "cannot" in error_str):
                                 st.info("💡 **idxmax() Error**: Try asking 'Which category has the highest value?' instead of 'What is the highest value?'")
                             elif "keyerror" in error_str:
                                 st.info("💡 **Column Error**: The column name doesn't exist in your dataset.")
@@ -0,0 +1,359 @@
+"""Single-pass AST normalizer and validator for generated pandas code.
+
+The answer line is parsed once with ast, column references are resolved
+through a lookup built once per dataset, and the tree is checked against a
+whitelist of node types and attribute names before being compiled. Work
+per question depends on the size of the expression, not on the number of
+columns.
+"""
+import ast
+import re
+from keyword import iskeyword
+
+import numpy as np
+import pandas as pd
+from pandas.core.groupby import DataFrameGroupBy, SeriesGroupBy
+
+# Syntax the generated one-liners may use; anything else is rejected
+ALLOWED_NODES = (
+    ast.Expression, ast.Call, ast.keyword, ast.Attribute, ast.Subscript, ast.Slice, ast.Name, ast.Load,
+    ast.Constant, ast.List, ast.Tuple, ast.Dict, ast.Compare, ast.BoolOp, ast.BinOp, ast.UnaryOp,
+    ast.IfExp, ast.Lambda, ast.arguments, ast.arg,
+    ast.And, ast.Or, ast.Not, ast.Invert, ast.UAdd, ast.USub,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.BitAnd, ast.BitOr, ast.BitXor,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot,
+)
+
+# Methods that write files, reach other systems, evaluate strings as code or
+# modify df in place (results are cached per dataset, so df must not change),
+# including the in-place ndarray methods reachable through .values/.to_numpy().
+# to_string and info write to any path passed as buf, and are also reachable
+# uncalled (Series.apply(df.to_string)), so they are denied outright
+DENIED_ATTRIBUTES = frozenset(
+    "to_csv to_excel to_pickle to_parquet to_sql to_hdf to_feather to_stata to_json to_html to_latex "
+    "to_markdown to_xml to_clipboard to_gbq to_orc to_string info tofile dump dumps eval pipe plot hist boxplot "
+    "style insert pop update fill put sort partition resize setflags byteswap itemset setfield".split()
+)
+
+# Keyword arguments that name a file or buffer to write to, rejected on any call
+FILE_KEYWORDS = frozenset("buf path path_or_buf filepath_or_buffer excel_writer fname file".split())
+
+
+def _public_names(*objects):
+    return {name for obj in objects for name in dir(obj) if not name.startswith("_")}
+
+
+# Attributes of the objects a pandas one-liner passes through: frames,
+# series, group-bys, indexes, accessors and the numpy arrays behind them
+ALLOWED_ATTRIBUTES = frozenset(
+    _public_names(pd.DataFrame, pd.Series, pd.Index, DataFrameGroupBy, SeriesGroupBy, np.ndarray,
+                  pd.Series.str, pd.Series.dt, pd.Series.cat, pd.Timestamp, pd.Timedelta)
+    - DENIED_ATTRIBUTES
+)
+
+# Syntax allowed inside a df.query() string: comparisons of columns and
+# literals only, so no attribute access, calls, subscripts or @ references
+QUERY_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple, ast.Compare, ast.BoolOp, ast.BinOp,
+    ast.UnaryOp, ast.And, ast.Or, ast.Not, ast.Invert, ast.UAdd, ast.USub,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.BitAnd, ast.BitOr,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+)
+
+# Methods that look up string arguments as method names ("mean" -> .mean()),
+# and the names they must not be handed since those evaluate strings
+DISPATCH_METHODS = frozenset("agg aggregate apply transform applymap map pivot_table crosstab NamedAgg".split())
+STRING_EVALUATING = frozenset(["query"])
+
+# The pandas functions generated code may call as pd.<name>
+PD_FUNCTIONS = frozenset(
+    "to_datetime to_numeric to_timedelta cut qcut crosstab concat pivot_table isna isnull notna notnull "
+    "Series DataFrame Timestamp Timedelta Grouper NamedAgg".split()
+)
+
+# Misspelled method names models produce, rewritten to the real method
+METHOD_TYPOS = {"value_count": "value_counts", "nunique_values": "nunique", "avg": "mean"}
+
+# (inner, outer) method chains that never make sense
+BAD_CHAINS = {
+    ("idxmax", "max"): "Cannot chain .idxmax() with .max()",
+    ("max", "idxmax"): "Cannot chain .max() with .idxmax()",
+    ("idxmin", "min"): "Cannot chain .idxmin() with .min()",
+    ("min", "idxmin"): "Cannot chain .min() with .idxmin()",
+}
+
+# Frame methods whose result is still a frame of the same columns
+FRAME_METHODS = frozenset(
+    "query head tail dropna fillna sort_values sort_index drop_duplicates copy sample nlargest nsmallest "
+    "reset_index assign".split()
+)
+
+# Frame methods taking column names, with the position of that argument
+COLUMN_ARGUMENT_METHODS = {"groupby": 0, "sort_values": 0, "drop_duplicates": 0, "pivot_table": 0,
+                           "nlargest": 1, "nsmallest": 1}
+COLUMN_KEYWORDS = frozenset("by subset columns index values".split())
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+MAX_LISTED_COLUMNS = 20
+
+
+def normalize_name(name):
+    """Lookup key for a column: lower case, runs of spaces/punctuation/underscores collapsed to one _"""
+    return re.sub(r"[\W_]+", "_", str(name).strip().lower()).strip("_")
+
+
+class CheckedCode:
+    """Normalized source of one answer, its compiled code object and the validation message
+
+    canonical is a dump of the normalized tree: expressions that differ only
+    in spelling (quotes, spacing, df.col vs df["col"]) share it.
+    """
+
+    def __init__(self, source, code, message, canonical=None):
+        self.source = source
+        self.code = code
+        self.message = message
+        self.canonical = canonical
+
+    @property
+    def valid(self):
+        return self.code is not None
+
+
+class CodeNormalizer:
+    """Parses, rewrites and validates generated pandas one-liners for one dataset
+
+    Rewrites applied to the tree: df.reading_score and bare reading_score
+    become df["reading score"], differently spelled names ("Math_Score")
+    resolve to the real column, df["a", "b"] becomes df[["a", "b"]] and
+    misspelled methods are corrected. Unknown columns, unknown attributes,
+    private names and any syntax outside ALLOWED_NODES fail validation, and
+    df.query() strings are parsed and checked against QUERY_NODES.
+    """
+
+    def __init__(self, columns):
+        self.columns = [str(column) for column in columns]
+        self._exact = set(self.columns)
+        self._lookup = {}
+        for column in self.columns:
+            # First column wins when two normalize to the same key
+            self._lookup.setdefault(normalize_name(column), column)
+
+    @staticmethod
+    def extract_line(raw_code):
+        """The answer line out of a model response: inside code fences, the first df/pd line"""
+        code = raw_code.strip()
+        if "```python" in code:
+            code = code.split("```python")[1].split("```")[0].strip()
+        elif "```" in code:
+            code = code.split("```")[1].split("```")[0].strip()
+        code = code.replace("\\\n", "").translate(SMART_QUOTES)
+
+        lines = [line.strip() for line in code.split("\n") if line.strip()]
+        for line in lines:
+            if line.startswith("df") or line.startswith("pd."):
+                return line
+        return lines[-1] if lines else code
+
+    def check(self, raw_code):
+        """Normalize and validate raw_code; returns a CheckedCode (code is None when invalid)"""
+        line = self.extract_line(raw_code)
+        try:
+            tree = ast.parse(line, mode="eval")
+        except SyntaxError:
+            try:
+                # Models sometimes escape their quotes
+                line = line.replace("\\", "")
+                tree = ast.parse(line, mode="eval")
+            except SyntaxError as e:
+                return CheckedCode(line, None, f"Syntax error: {e.msg}")
+
+        try:
+            tree = _Rewriter(self).visit(tree)
+        except ValueError as e:
+            return CheckedCode(line, None, str(e))
+        ast.fix_missing_locations(tree)
+        return CheckedCode(ast.unparse(tree), compile(tree, "<string>", "eval"), "Code validation passed",
+                           ast.dump(tree))
+
+    def resolve(self, name):
+        """Real column for name, or None"""
+        if name in self._exact:
+            return name
+        return self._lookup.get(normalize_name(name))
+
+    def missing(self, name):
+        listed = self.columns[:MAX_LISTED_COLUMNS]
+        more = f" and {len(self.columns) - len(listed)} more" if len(self.columns) > len(listed) else ""
+        return ValueError(f"Column '{name}' not found. Available: {listed}{more}")
+
+
+def _df_subscript(column):
+    return ast.Subscript(value=ast.Name(id="df", ctx=ast.Load()), slice=ast.Constant(column), ctx=ast.Load())
+
+
+def _is_str(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _method_name(node):
+    """Name of the method node calls (x.name(...)), or None"""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+class _Rewriter(ast.NodeTransformer):
+    def __init__(self, normalizer):
+        self.normalizer = normalizer
+        self.local_names = set()
+
+    def generic_visit(self, node):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def _is_frame(self, node):
+        """Whether node is df or a frame derived from it with the same columns"""
+        if isinstance(node, ast.Name):
+            return node.id == "df"
+        if isinstance(node, ast.Subscript):
+            # df[mask] and df.loc[mask] keep df's columns; df["col"] doesn't
+            if isinstance(node.value, ast.Attribute) and node.value.attr in ("loc", "iloc"):
+                return self._is_frame(node.value.value) and not isinstance(node.slice, ast.Tuple)
+            return self._is_frame(node.value) and not _is_str(node.slice)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            return node.func.attr in FRAME_METHODS and self._is_frame(node.func.value)
+        return False
+
+    def _is_groupby(self, node):
+        return _method_name(node) == "groupby" and self._is_frame(node.func.value)
+
+    def _column(self, node):
+        """Resolve a string constant naming a column, raising for unknown columns"""
+        column = self.normalizer.resolve(node.value)
+        if column is None:
+            raise self.normalizer.missing(node.value)
+        return ast.copy_location(ast.Constant(column), node)
+
+    def _columns(self, node):
+        """Resolve a column name or list of column names in place"""
+        if _is_str(node):
+            return self._column(node)
+        if isinstance(node, ast.Name) and node.id not in ("df", "pd") and node.id not in self.local_names:
+            # df[test_preparation_course] means df["test preparation course"]
+            if self.normalizer.resolve(node.id) is not None:
+                return self._column(ast.copy_location(ast.Constant(node.id), node))
+        if isinstance(node, (ast.List, ast.Tuple)):
+            node.elts = [self._column(elt) if _is_str(elt) else elt for elt in node.elts]
+        return node
+
+    def visit_Name(self, node):
+        if node.id in ("df", "pd") or node.id in self.local_names:
+            return node
+        # A bare test_preparation_course means the column
+        column = self.normalizer.resolve(node.id)
+        if column is None:
+            raise ValueError(f"Unknown name '{node.id}'")
+        return ast.copy_location(_df_subscript(column), node)
+
+    def visit_Lambda(self, node):
+        names = {arg.arg for arg in node.args.args}
+        self.local_names |= names
+        try:
+            return self.generic_visit(node)
+        finally:
+            self.local_names -= names
+
+    def visit_Attribute(self, node):
+        if node.attr.startswith("_"):
+            raise ValueError(f"Access to private attribute '{node.attr}' is not allowed")
+        if isinstance(node.value, ast.Name) and node.value.id == "pd":
+            if node.attr not in PD_FUNCTIONS:
+                raise ValueError(f"pd.{node.attr} is not allowed")
+            return node
+        node.attr = METHOD_TYPOS.get(node.attr, node.attr)
+        if node.attr not in ALLOWED_ATTRIBUTES:
+            # df.reading_score means df["reading score"]
+            if self._is_frame(node.value) or self._is_groupby(node.value):
+                column = self.normalizer.resolve(node.attr)
+                if column is not None:
+                    subscript = ast.Subscript(value=node.value, slice=ast.Constant(column), ctx=ast.Load())
+                    return self.visit(ast.copy_location(subscript, node))
+            if node.attr in DENIED_ATTRIBUTES:
+                raise ValueError(f".{node.attr} is not allowed")
+            raise ValueError(f"Unknown attribute or column '{node.attr}'")
+        return self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        target = node.value
+        if isinstance(target, ast.Attribute) and target.attr in ("loc", "iloc"):
+            if any(_method_name(child) in ("argmax", "argmin") for child in ast.walk(node.slice)):
+                raise ValueError("Use groupby().mean().idxmax() instead of .loc[...] with .argmax()/.argmin()")
+            # df.loc[rows, "col"]
+            if (target.attr == "loc" and self._is_frame(target.value)
+                    and isinstance(node.slice, ast.Tuple) and len(node.slice.elts) == 2):
+                node.slice.elts[1] = self._columns(node.slice.elts[1])
+        elif self._is_frame(target) or self._is_groupby(target):
+            if isinstance(node.slice, ast.Tuple) and node.slice.elts and all(map(_is_str, node.slice.elts)):
+                # df["a", "b"] selects one column named ("a", "b"); the model meant two
+                node.slice = ast.List(elts=node.slice.elts, ctx=ast.Load())
+            node.slice = self._columns(node.slice)
+        return self.generic_visit(node)
+
+    def _query(self, node):
+        """Validate the expression of df.query(...) and resolve its column names
+
+        pandas evaluates the string itself, with @name reaching the caller's
+        variables, so it gets the same whitelist as the code around it.
+        """
+        if len(node.args) != 1 or node.keywords or not _is_str(node.args[0]):
+            raise ValueError("query() takes a single string expression")
+        names = {}
+
+        def placeholder(match):
+            names[f"__column_{len(names)}"] = match.group(1)
+            return f"__column_{len(names) - 1}"
+        text = re.sub(r"`([^`]+)`", placeholder, node.args[0].value)
+        try:
+            tree = ast.parse(text, mode="eval")
+        except SyntaxError:
+            raise ValueError("query() string isn't a valid expression (@ references are not allowed)") from None
+
+        for child in ast.walk(tree):
+            if not isinstance(child, QUERY_NODES):
+                raise ValueError(f"Unsupported syntax in query(): {type(child).__name__}")
+            if isinstance(child, ast.Name):
+                name = names.get(child.id, child.id)
+                column = self.normalizer.resolve(name)
+                if column is None:
+                    raise self.normalizer.missing(name)
+                # unparse writes the id verbatim, so this emits the backticks
+                child.id = column if column.isidentifier() and not iskeyword(column) else f"`{column}`"
+        node.args[0] = ast.copy_location(ast.Constant(ast.unparse(tree)), node.args[0])
+
+    def visit_Call(self, node):
+        if any(keyword.arg == "inplace" for keyword in node.keywords):
+            raise ValueError("inplace operations would modify the dataset; return a new result instead")
+        if any(keyword.arg in FILE_KEYWORDS for keyword in node.keywords):
+            raise ValueError("Writing to files is not allowed")
+        method = _method_name(node)
+        if method == "query":
+            self._query(node)
+        if method in DISPATCH_METHODS:
+            for argument in node.args + [keyword.value for keyword in node.keywords]:
+                for child in ast.walk(argument):
+                    if _is_str(child) and child.value in DENIED_ATTRIBUTES | STRING_EVALUATING:
+                        raise ValueError(f"{method}() cannot call .{child.value}")
+        inner = _method_name(node.func.value) if method else None
+        if (inner, method) in BAD_CHAINS:
+            raise ValueError(BAD_CHAINS[(inner, method)])
+        if method in COLUMN_ARGUMENT_METHODS and self._is_frame(node.func.value):
+            position = COLUMN_ARGUMENT_METHODS[method]
+            if len(node.args) > position:
+                node.args[position] = self._columns(node.args[position])
+            for keyword in node.keywords:
+                if keyword.arg in COLUMN_KEYWORDS:
+                    keyword.value = self._columns(keyword.value)
+        return self.generic_visit(node)
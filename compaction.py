@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+    is_object_dtype,
+    is_string_dtype,
+)
+
+try:
+    import pyarrow  # noqa: F401  (only needed for the "string[pyarrow]" dtype)
+    ARROW_STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    ARROW_STRING_DTYPE = None
+
+from config import CATEGORY_RATIO, INT_HEADROOM
+
+INT_TYPES = [np.int8, np.int16, np.int32]
+
+
+def is_numeric_column(dtype):
+    """True for int/float columns of any width or backend (booleans excluded)"""
+    return is_numeric_dtype(dtype) and not is_bool_dtype(dtype)
+
+
+def is_categorical_column(dtype):
+    """True for object, string (NumPy or Arrow) and category columns"""
+    return is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype)
+
+
+def numeric_columns(df):
+    return [col for col, dtype in df.dtypes.items() if is_numeric_column(dtype)]
+
+
+def categorical_columns(df):
+    return [col for col, dtype in df.dtypes.items() if is_categorical_column(dtype)]
+
+
+def _compact_integer(series):
+    """Smallest signed int type that still leaves INT_HEADROOM for sums/differences
+
+    Products and powers can still overflow the narrow type, so generated code
+    is evaluated on widen_integers(df) rather than on the compacted frame.
+    """
+    if series.empty:
+        return series
+    bound = max(abs(int(series.min())), abs(int(series.max()))) * INT_HEADROOM
+    for int_type in INT_TYPES:
+        if bound <= np.iinfo(int_type).max:
+            return series.astype(int_type)
+    return series
+
+
+def _compact_float(series):
+    """Downcast to float32 only when no value changes
+
+    Every stored value is exact, but sums and means computed on the float32
+    column accumulate in float32 and lose precision on long columns.
+    """
+    as_float32 = series.astype(np.float32)
+    lossless = (as_float32.astype(series.dtype) == series) | series.isna()
+    return as_float32 if lossless.all() else series
+
+
+def _compact_text(series, category_ratio):
+    """Low-cardinality text becomes category, the rest Arrow strings"""
+    non_null = series.count()
+    if non_null == 0:
+        return series
+    if series.nunique(dropna=True) <= non_null * category_ratio:
+        return series.astype("category")
+    if ARROW_STRING_DTYPE and is_object_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return series.astype(ARROW_STRING_DTYPE)
+    return series
+
+
+def widen_integers(df):
+    """df with its narrow integer columns back at int64, for evaluating generated code
+
+    Element-wise arithmetic keeps the operands' type, so df["price"] * df["qty"]
+    on two int16 columns wraps around without an error. Other columns are shared
+    with df, not copied.
+    """
+    narrow = {col: np.int64 for col, dtype in df.dtypes.items()
+              if isinstance(dtype, np.dtype) and dtype.kind in "iu" and dtype.itemsize < 8}
+    return df.astype(narrow, copy=False) if narrow else df
+
+
+def compact_dtypes(df, category_ratio=CATEGORY_RATIO):
+    """Shrink a freshly loaded frame, returning (compacted_df, memory_report)
+
+    Only NumPy-backed numerics are downcast; Arrow-backed and mixed-type
+    columns are left alone so values never change. Integers are compacted
+    for storage only (see widen_integers); float32 columns keep every value
+    but give less precise aggregates.
+    """
+    before = df.memory_usage(deep=True, index=False)
+    compacted = {}
+    for col, dtype in df.dtypes.items():
+        series = df[col]
+        if isinstance(dtype, np.dtype) and is_integer_dtype(dtype) and not is_bool_dtype(dtype):
+            compacted[col] = _compact_integer(series)
+        elif isinstance(dtype, np.dtype) and is_float_dtype(dtype):
+            compacted[col] = _compact_float(series)
+        elif is_string_dtype(dtype):
+            compacted[col] = _compact_text(series, category_ratio)
+        else:
+            compacted[col] = series
+
+    result = pd.DataFrame(compacted, index=df.index)
+    after = result.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "Column": df.columns,
+        "Before Type": df.dtypes.astype(str).values,
+        "After Type": result.dtypes.astype(str).values,
+        "Before (KB)": (before.values / 1024).round(1),
+        "After (KB)": (after.values / 1024).round(1),
+    })
+    return result, report
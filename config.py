@@ -0,0 +1,130 @@
+import os
+
+# Runtime settings, overridable through environment variables so a deployment
+# can tune them without editing the app.
+
+# "numpy" keeps pandas' classic dtypes, "pyarrow" returns Arrow-backed columns
+DTYPE_BACKEND = os.environ.get("COGNIVIEW_DTYPE_BACKEND", "numpy")
+
+# Bytes per block handed to each pyarrow CSV parsing thread
+CSV_BLOCK_SIZE = int(os.environ.get("COGNIVIEW_CSV_BLOCK_SIZE", 16 * 1024 * 1024))
+
+# CSV uploads at least this large are parsed block by block with an early preview
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("COGNIVIEW_STREAMING_THRESHOLD_MB", 50)) * 1024 * 1024
+
+# Block size (bytes) for the streaming reader and rows per chunk for its pandas fallback
+STREAM_BLOCK_SIZE = int(os.environ.get("COGNIVIEW_STREAM_BLOCK_SIZE", 4 * 1024 * 1024))
+STREAM_CHUNK_ROWS = int(os.environ.get("COGNIVIEW_STREAM_CHUNK_ROWS", 200_000))
+
+# Downcast numerics and convert text columns right after loading ("0" disables)
+COMPACT_DTYPES = os.environ.get("COGNIVIEW_COMPACT_DTYPES", "1") != "0"
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_RATIO = float(os.environ.get("COGNIVIEW_CATEGORY_RATIO", 0.5))
+
+# Downcast integers keep this factor of headroom so column sums/differences don't overflow
+INT_HEADROOM = int(os.environ.get("COGNIVIEW_INT_HEADROOM", 64))
+
+# Opt-in approximate profiling (streaming sketches) for frames with at least APPROX_PROFILE_ROWS rows
+APPROX_PROFILE = os.environ.get("COGNIVIEW_APPROX_PROFILE", "0") == "1"
+APPROX_PROFILE_ROWS = int(os.environ.get("COGNIVIEW_APPROX_PROFILE_ROWS", 10_000_000))
+
+# Rows per chunk fed to the sketches, and their sizes
+APPROX_CHUNK_ROWS = int(os.environ.get("COGNIVIEW_APPROX_CHUNK_ROWS", 1_000_000))
+APPROX_SAMPLE_SIZE = int(os.environ.get("COGNIVIEW_APPROX_SAMPLE_SIZE", 20_000))
+APPROX_QUANTILE_CAPACITY = int(os.environ.get("COGNIVIEW_APPROX_QUANTILE_CAPACITY", 2048))
+APPROX_HLL_PRECISION = int(os.environ.get("COGNIVIEW_APPROX_HLL_PRECISION", 14))
+APPROX_TOP_K = int(os.environ.get("COGNIVIEW_APPROX_TOP_K", 64))
+
+# Column metadata sent to the AI Assistant: top values per column, rows in the
+# evenly spaced sample used for dtype inference/sample values, and a cap on
+# the serialized size (top values are trimmed until it fits)
+METADATA_TOP_K = int(os.environ.get("COGNIVIEW_METADATA_TOP_K", 5))
+METADATA_SAMPLE_ROWS = int(os.environ.get("COGNIVIEW_METADATA_SAMPLE_ROWS", 10_000))
+METADATA_CHAR_BUDGET = int(os.environ.get("COGNIVIEW_METADATA_CHAR_BUDGET", 8_000))
+
+# Analytics charts are computed only for the panel the user opens
+LAZY_ANALYTICS = os.environ.get("COGNIVIEW_LAZY_ANALYTICS", "1") != "0"
+
+# Total bytes of rendered chart images kept by the figure cache
+FIGURE_CACHE_BYTES = int(os.environ.get("COGNIVIEW_FIGURE_CACHE_MB", 64)) * 1024 * 1024
+
+# Relationships view: above this many rows "Auto" draws a density raster instead of every point
+SCATTER_ROW_THRESHOLD = int(os.environ.get("COGNIVIEW_SCATTER_ROW_THRESHOLD", 100_000))
+SCATTER_SAMPLE_POINTS = int(os.environ.get("COGNIVIEW_SCATTER_SAMPLE_POINTS", 20_000))
+
+# Correlation heatmap: at most this many columns drawn, cell values written up to the second limit
+HEATMAP_MAX_COLUMNS = int(os.environ.get("COGNIVIEW_HEATMAP_MAX_COLUMNS", 25))
+HEATMAP_ANNOTATE_COLUMNS = int(os.environ.get("COGNIVIEW_HEATMAP_ANNOTATE_COLUMNS", 12))
+
+# Correlation engine: columns per block, worker threads, and the row sample Kendall is limited to
+CORR_BLOCK_SIZE = int(os.environ.get("COGNIVIEW_CORR_BLOCK_SIZE", 128))
+CORR_WORKERS = int(os.environ.get("COGNIVIEW_CORR_WORKERS", os.cpu_count() or 1))
+KENDALL_MAX_ROWS = int(os.environ.get("COGNIVIEW_KENDALL_MAX_ROWS", 1_000))
+
+# Memory for Kendall's per-chunk temporaries, split across the worker threads (MB);
+# wider frames get proportionally fewer row pairs per chunk
+KENDALL_CHUNK_MB = int(os.environ.get("COGNIVIEW_KENDALL_CHUNK_MB", 256))
+
+# Ollama server and model used by the AI Assistant
+OLLAMA_URL = os.environ.get("COGNIVIEW_OLLAMA_URL", "http://localhost:11434")
+LLM_MODEL = os.environ.get("COGNIVIEW_LLM_MODEL", "mistral")
+
+# How long Ollama keeps the model loaded after each request (Ollama duration
+# syntax, e.g. "30m"; "-1" keeps it loaded), pooled HTTP connections and the
+# per-request timeout in seconds
+LLM_KEEP_ALIVE = os.environ.get("COGNIVIEW_LLM_KEEP_ALIVE", "30m")
+LLM_POOL_SIZE = int(os.environ.get("COGNIVIEW_LLM_POOL_SIZE", 8))
+LLM_TIMEOUT = float(os.environ.get("COGNIVIEW_LLM_TIMEOUT", 120))
+
+# On-disk cache of generated code shared by every session on the host: file
+# location, entry cap (least recently used evicted first) and maximum age
+LLM_CACHE_PATH = os.environ.get(
+    "COGNIVIEW_LLM_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "cogniview", "llm_cache.sqlite3")
+)
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("COGNIVIEW_LLM_CACHE_MAX_ENTRIES", 5_000))
+LLM_CACHE_MAX_AGE_SECONDS = int(os.environ.get("COGNIVIEW_LLM_CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600
+
+# Near-duplicate questions (char n-gram TF-IDF cosine at least this high, same
+# columns/values/numbers/operations) reuse earlier validated code; "0" disables
+SIMILARITY_THRESHOLD = float(os.environ.get("COGNIVIEW_SIMILARITY_THRESHOLD", 0.8))
+
+# Approximate token budget for the schema part of the AI Assistant prompt;
+# columns most relevant to the question are described first ("0" sends the full JSON metadata)
+SCHEMA_TOKEN_BUDGET = int(os.environ.get("COGNIVIEW_SCHEMA_TOKEN_BUDGET", 600))
+
+# Candidates generated concurrently per question (different temperatures and
+# seeds; the first that validates and runs cleanly wins) and the time budget
+# for the whole race in seconds. 1 keeps a single streamed generation.
+LLM_CANDIDATES = int(os.environ.get("COGNIVIEW_LLM_CANDIDATES", 1))
+LLM_CANDIDATE_BUDGET = float(os.environ.get("COGNIVIEW_LLM_CANDIDATE_BUDGET", 30))
+
+# Total estimated bytes of AI Assistant query results kept in memory, shared
+# by every session on the same dataset ("0" disables result caching)
+RESULT_CACHE_BYTES = int(os.environ.get("COGNIVIEW_RESULT_CACHE_MB", 128)) * 1024 * 1024
+
+# AI Assistant queries run in this many pre-started worker processes ("0"
+# evaluates them inline in the Streamlit script thread), each query limited
+# to a wall-clock time in seconds and to this much newly allocated memory
+QUERY_WORKERS = int(os.environ.get("COGNIVIEW_QUERY_WORKERS", 2))
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("COGNIVIEW_QUERY_TIMEOUT", 30))
+QUERY_MEMORY_BYTES = int(os.environ.get("COGNIVIEW_QUERY_MEMORY_MB", 2048)) * 1024 * 1024
+
+# Where datasets are written for the query workers to memory-map; by default
+# /dev/shm when writable, which holds one extra in-RAM copy per dataset (set a
+# disk directory to trade that memory for page-cache reads)
+QUERY_SPOOL_DIR = os.environ.get("COGNIVIEW_QUERY_SPOOL_DIR") or None
+
+# CSV uploads at least this large are written to Parquet on disk instead of
+# loaded whole: the app works on a random sample of at most this many rows
+# and the AI Assistant answers the queries DuckDB can run from the Parquet
+# copy ("0" disables; needs pyarrow and duckdb). Parquet copies live in a
+# per-process directory under the one below, which keeps the most recent few,
+# and DuckDB may use up to the memory limit before spilling to disk.
+OUT_OF_CORE_THRESHOLD_BYTES = int(os.environ.get("COGNIVIEW_OUT_OF_CORE_THRESHOLD_MB", 1024)) * 1024 * 1024
+OUT_OF_CORE_SAMPLE_ROWS = int(os.environ.get("COGNIVIEW_OUT_OF_CORE_SAMPLE_ROWS", 1_000_000))
+OUT_OF_CORE_DIR = os.environ.get(
+    "COGNIVIEW_OUT_OF_CORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cogniview", "datasets")
+)
+OUT_OF_CORE_MAX_FILES = int(os.environ.get("COGNIVIEW_OUT_OF_CORE_MAX_FILES", 8))
+OUT_OF_CORE_MEMORY_BYTES = int(os.environ.get("COGNIVIEW_OUT_OF_CORE_MEMORY_MB", 2048)) * 1024 * 1024
@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import CORR_BLOCK_SIZE, CORR_WORKERS, KENDALL_CHUNK_MB, KENDALL_MAX_ROWS
+
+CORRELATION_METHODS = ["pearson", "spearman", "kendall"]
+
+# Most row pairs per chunk when building Kendall sign matrices
+KENDALL_PAIR_CHUNK = 65_536
+
+# Peak bytes _kendall_chunk allocates per row pair and column: the two float64
+# gathers, the comparison masks and int8 signs, then float32 copies for the products
+KENDALL_BYTES_PER_VALUE = 24
+
+
+def top_correlations(corr_matrix, k=5):
+    """Strongest k column pairs of a correlation matrix, by absolute value
+
+    Works on the upper triangle with array operations: O(n^2) in NumPy
+    instead of an O(n^2) Python loop plus a full sort.
+    Returns a DataFrame with columns 'Column 1', 'Column 2', 'Correlation'.
+    """
+    values = corr_matrix.to_numpy(dtype=np.float64)
+    rows, cols = np.triu_indices(len(values), k=1)
+    pair_values = values[rows, cols]
+    strength = np.abs(pair_values)
+    strength[np.isnan(strength)] = -1.0
+
+    k = min(k, len(pair_values))
+    if k == 0:
+        return pd.DataFrame(columns=['Column 1', 'Column 2', 'Correlation'])
+    # argpartition finds the k largest in linear time; only those get sorted
+    best = np.argpartition(-strength, k - 1)[:k]
+    best = best[np.argsort(-strength[best], kind="stable")]
+    labels = corr_matrix.columns
+    return pd.DataFrame({
+        'Column 1': labels[rows[best]],
+        'Column 2': labels[cols[best]],
+        'Correlation': pair_values[best],
+    })
+
+
+def heatmap_subset(corr_matrix, max_columns=25):
+    """Columns to draw when the matrix is too wide to show every cell
+
+    Keeps the max_columns columns with the strongest off-diagonal
+    correlation, ordered by the Fiedler vector of the |corr| similarity
+    graph so correlated columns sit next to each other (spectral ordering).
+    Matrices that already fit are returned unchanged.
+    """
+    if len(corr_matrix) <= max_columns:
+        return corr_matrix
+    values = np.abs(np.nan_to_num(corr_matrix.to_numpy(dtype=np.float64)))
+    np.fill_diagonal(values, 0.0)
+    keep = np.argpartition(-values.max(axis=1), max_columns - 1)[:max_columns]
+    similarity = values[np.ix_(keep, keep)]
+
+    laplacian = np.diag(similarity.sum(axis=1)) - similarity
+    _, vectors = np.linalg.eigh(laplacian)
+    order = np.argsort(vectors[:, 1])
+    labels = corr_matrix.columns[keep[order]]
+    return corr_matrix.loc[labels, labels]
+
+
+def _column_blocks(count, block_size):
+    return [np.arange(start, min(start + block_size, count)) for start in range(0, count, block_size)]
+
+
+def _pearson_block(centered, mask, squares, has_nan, rows, cols):
+    """Pairwise-complete Pearson correlation between two column blocks
+
+    centered holds mean-centred values with NaN replaced by 0, so every sum
+    below only counts rows where both columns are present.
+    """
+    x, y = centered[:, rows], centered[:, cols]
+    sum_xy = x.T @ y
+    if not (has_nan[rows].any() or has_nan[cols].any()):
+        # Complete columns: one matrix product plus the column norms
+        norms_x = np.sqrt(squares[:, rows].sum(axis=0))
+        norms_y = np.sqrt(squares[:, cols].sum(axis=0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return sum_xy / np.outer(norms_x, norms_y)
+
+    mask_x, mask_y = mask[:, rows], mask[:, cols]
+    count = mask_x.T @ mask_y
+    sum_x = x.T @ mask_y
+    sum_y = mask_x.T @ y
+    sum_xx = squares[:, rows].T @ mask_y
+    sum_yy = mask_x.T @ squares[:, cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_xy - sum_x * sum_y / count
+        var_x = sum_xx - sum_x ** 2 / count
+        var_y = sum_yy - sum_y ** 2 / count
+        result = cov / np.sqrt(var_x * var_y)
+    result[count < 2] = np.nan
+    return result
+
+
+def _pearson_matrix(values, block_size, workers):
+    """Blocked, thread-parallel pairwise-complete Pearson matrix of a 2D array"""
+    mask = ~np.isnan(values)
+    has_nan = ~mask.all(axis=0)
+    centered = values - np.nanmean(values, axis=0)
+    centered[~mask] = 0.0
+    squares = centered ** 2
+    mask = mask.astype(np.float64)
+
+    blocks = _column_blocks(values.shape[1], block_size)
+    tasks = [(i, j) for i in range(len(blocks)) for j in range(i, len(blocks))]
+    result = np.empty((values.shape[1], values.shape[1]))
+
+    # NumPy releases the GIL inside matrix products, so threads scale here
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_pearson_block, centered, mask, squares, has_nan, blocks[i], blocks[j]): (i, j)
+            for i, j in tasks
+        }
+        for future, (i, j) in futures.items():
+            block = future.result()
+            result[np.ix_(blocks[i], blocks[j])] = block
+            result[np.ix_(blocks[j], blocks[i])] = block.T
+    return np.clip(result, -1.0, 1.0)
+
+
+def _kendall_pair_chunk(columns, workers, budget_bytes):
+    """Row pairs per chunk so that every worker's temporaries together fit budget_bytes"""
+    return int(min(KENDALL_PAIR_CHUNK, max(1, budget_bytes // (columns * workers * KENDALL_BYTES_PER_VALUE))))
+
+
+def _kendall_chunk(values, left, right):
+    """Sign products for one chunk of row pairs: (concordance, untied-vs-valid counts)"""
+    first, second = values[left], values[right]
+    # Comparisons with NaN are False, so a missing value gives sign 0
+    signs = (first > second).view(np.int8) - (first < second).view(np.int8)
+    valid = ~(np.isnan(first) | np.isnan(second))
+    del first, second
+    # float32 keeps the products in BLAS and counts exact up to 2**24 pairs per chunk
+    signs = signs.astype(np.float32)
+    return signs.T @ signs, np.abs(signs).T @ valid.astype(np.float32)
+
+
+def _kendall_matrix(values, workers, budget_bytes=KENDALL_CHUNK_MB * 1024 * 1024):
+    """Pairwise-complete Kendall tau-b for all columns at once
+
+    With S the sign matrix over row pairs (0 where a value is missing) and V
+    the validity matrix, concordant-minus-discordant counts are S'S and the
+    untied pair counts are |S|'V, so tau-b is a few matrix products. Row
+    pairs are processed in chunks sized so the workers' temporaries stay
+    within budget_bytes however wide the frame is.
+    """
+    left, right = np.triu_indices(values.shape[0], k=1)
+    columns = values.shape[1]
+    workers = max(1, min(workers, -(-len(left) // KENDALL_PAIR_CHUNK)))
+    chunk = _kendall_pair_chunk(columns, workers, budget_bytes)
+    chunks = range(0, len(left), chunk)
+    concordance = np.zeros((columns, columns))
+    untied = np.zeros((columns, columns))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for part_concordance, part_untied in pool.map(
+            lambda start: _kendall_chunk(values, left[start:start + chunk], right[start:start + chunk]),
+            chunks,
+        ):
+            concordance += part_concordance
+            untied += part_untied
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = concordance / np.sqrt(untied * untied.T)
+    # DataFrame.corr reports 1.0 on the Kendall diagonal even for constant columns
+    np.fill_diagonal(result, 1.0)
+    return np.clip(result, -1.0, 1.0)
+
+
+def correlation_matrix(df, method="pearson", block_size=CORR_BLOCK_SIZE, workers=CORR_WORKERS,
+                       kendall_max_rows=KENDALL_MAX_ROWS, seed=0):
+    """Correlation matrix of a frame's columns, computed block-parallel
+
+    NaNs are handled pairwise-complete like DataFrame.corr. Spearman ranks
+    every column once and reuses the ranks for all pairs (exactly pandas'
+    result when columns share their missing rows). Kendall is exact up to
+    kendall_max_rows rows and runs on a random row sample above that.
+    Returns (matrix DataFrame, rows used).
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method '{method}'")
+
+    if method == "spearman":
+        df = df.rank(method="average", na_option="keep")
+    rows_used = len(df)
+    if method == "kendall" and len(df) > kendall_max_rows:
+        df = df.sample(n=kendall_max_rows, random_state=seed)
+        rows_used = kendall_max_rows
+
+    values = df.to_numpy(dtype=np.float64, na_value=np.nan)
+    if method == "kendall":
+        matrix = _kendall_matrix(values, workers)
+    else:
+        matrix = _pearson_matrix(values, block_size, workers)
+    return pd.DataFrame(matrix, index=df.columns, columns=df.columns), rows_used
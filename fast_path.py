@@ -0,0 +1,143 @@
+"""Rule-based compiler for the questions the AI Assistant sees most often.
+
+Column mentions are replaced by placeholders (@0, @1, ...), filler words are
+dropped, and what is left must match one of the anchored templates below
+exactly; anything else returns None and goes to the LLM. Templates only
+emit the idioms the prompt itself asks for (see prompts.py).
+"""
+import json
+import re
+
+from llm_cache import normalize_question
+
+FILLER_WORDS = frozenset(
+    "what whats is are was were the a an of in for me show tell give please there value values "
+    "column columns dataset data total overall".split()
+)
+
+AGGREGATES = {
+    "mean": r"average|avg|mean",
+    "max": r"maximum|max|highest|largest|biggest",
+    "min": r"minimum|min|lowest|smallest",
+    "median": r"median",
+    "sum": r"sum",
+    "std": r"standard deviation|std",
+}
+
+COMPARISONS = [
+    (">=", r"at least|greater than or equal to|>="),
+    ("<=", r"at most|less than or equal to|<="),
+    (">", r"greater than|more than|higher than|above|over|exceeding|>"),
+    ("<", r"less than|fewer than|lower than|below|under|<"),
+    ("==", r"equal to|equals|exactly|=="),
+]
+
+COUNT = r"(?:how many|count(?: number)?|number)"
+ROWS = r"(?:rows?|records?|entries|students|people|observations)"
+COLUMN = r"@(?P<column>\d+)"
+GROUP_COLUMN = r"@(?P<group>\d+)"
+NUMBER = r"(?P<number>-?\d+(?:\.\d+)?)"
+
+
+def _alternatives(table):
+    return "|".join(f"(?:{words})" for words in table)
+
+
+class FastPathCompiler:
+    """Compiles common questions about one dataset straight to a pandas expression"""
+
+    def __init__(self, metadata):
+        self.columns = [str(entry["Column"]) for entry in metadata]
+        self.numeric = {str(entry["Column"]) for entry in metadata if "Range" in entry}
+        # Longest names first so "math score" wins over a column called "score"
+        ordered = sorted(self.columns, key=len, reverse=True)
+        self._column_patterns = [
+            (column, re.compile(r"(?<![\w@])" + re.escape(column.lower()) + r"(?![\w])")) for column in ordered
+        ]
+        aggregate = _alternatives(AGGREGATES.values())
+        comparison = _alternatives(words for _, words in COMPARISONS)
+        self._templates = [
+            (rf"(?P<agg>{aggregate}) {COLUMN}", self._aggregate),
+            (rf"{COLUMN} (?P<agg>{aggregate})", self._aggregate),
+            (rf"{COUNT} {ROWS} (?:have|has|with|where) {COLUMN} "
+             rf"(?P<cmp>{comparison}) {NUMBER}", self._count_filtered),
+            (rf"{COUNT} (?:unique|distinct) {COLUMN}(?: exist)?", self._unique),
+            (rf"(?:most common|most frequent|mode) {COLUMN}", self._most_common),
+            (rf"which {GROUP_COLUMN} (?:has|have|had|with|gets|got) (?P<best>highest|maximum|max|largest|best|"
+             rf"lowest|minimum|min|smallest|worst) (?P<agg>average|avg|mean|median|sum) {COLUMN}", self._group_best),
+            (rf"{COUNT} {ROWS}", self._row_count),
+            (rf"(?:first|top|head) {NUMBER} {ROWS}", self._head),
+            (rf"(?:last|bottom|tail) {NUMBER} {ROWS}", self._tail),
+            (rf"(?:which )?(?:have|has|with|contain|contains) (?:missing|null|nan|empty)", self._missing_columns),
+        ]
+        self._templates = [(re.compile(rf"^{pattern}$"), build) for pattern, build in self._templates]
+
+    def _shape(self, question):
+        """Normalized question with column mentions replaced by @index, filler words dropped"""
+        text = normalize_question(question)
+        for column, pattern in self._column_patterns:
+            text = pattern.sub(f" @{self.columns.index(column)} ", text)
+        words = re.findall(r"@\d+|-?\d+(?:\.\d+)?|[a-z]+|[<>=]+", text)
+        return " ".join(word for word in words if word not in FILLER_WORDS)
+
+    def compile(self, question):
+        """Return pandas code for question, or None when no template matches exactly"""
+        shape = self._shape(question)
+        for pattern, build in self._templates:
+            match = pattern.match(shape)
+            if match is not None:
+                return build(match)
+        return None
+
+    def _column(self, match, group="column"):
+        return self.columns[int(match.group(group))]
+
+    @staticmethod
+    def _canonical(word, table):
+        for name, words in table:
+            if re.fullmatch(words, word):
+                return name
+        return None
+
+    def _aggregate(self, match):
+        column = self._column(match)
+        if column not in self.numeric:
+            return None
+        method = self._canonical(match.group("agg"), AGGREGATES.items())
+        return f"df[{json.dumps(column)}].{method}()"
+
+    def _count_filtered(self, match):
+        column = self._column(match)
+        if column not in self.numeric:
+            return None
+        operator = self._canonical(match.group("cmp"), COMPARISONS)
+        return f"df[df[{json.dumps(column)}] {operator} {match.group('number')}].shape[0]"
+
+    def _unique(self, match):
+        return f"df[{json.dumps(self._column(match))}].nunique()"
+
+    def _most_common(self, match):
+        return f"df[{json.dumps(self._column(match))}].value_counts().idxmax()"
+
+    def _group_best(self, match):
+        group, value = self._column(match, "group"), self._column(match)
+        if value not in self.numeric or group == value:
+            return None
+        method = self._canonical(match.group("agg"), AGGREGATES.items())
+        best = "idxmax" if match.group("best") in ("highest", "maximum", "max", "largest", "best") else "idxmin"
+        # observed=True: only categories present in the data, and no FutureWarning on category columns
+        return f"df.groupby({json.dumps(group)}, observed=True)[{json.dumps(value)}].{method}().{best}()"
+
+    def _row_count(self, match):
+        return "df.shape[0]"
+
+    def _head(self, match):
+        count = match.group("number")
+        return f"df.head({count})" if count.isdigit() else None
+
+    def _tail(self, match):
+        count = match.group("number")
+        return f"df.tail({count})" if count.isdigit() else None
+
+    def _missing_columns(self, match):
+        return "df.columns[df.isnull().any()].tolist()"
@@ -0,0 +1,140 @@
+import ast
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+
+class GenerationResult:
+    """Text streamed from the LLM plus its timings"""
+
+    def __init__(self, text, first_token_seconds, total_seconds, stopped_early, cancelled=False):
+        self.text = text
+        self.first_token_seconds = first_token_seconds
+        self.total_seconds = total_seconds
+        self.stopped_early = stopped_early
+        self.cancelled = cancelled
+
+
+def first_code_line(text):
+    """First complete line of text that is a valid df/pd expression, or None
+
+    Only lines followed by a newline count: "df["x"].mean()" also parses while
+    the model is still writing "df["x"].mean().round(2)".
+    """
+    for line in text.split("\n")[:-1]:
+        line = line.strip().strip("`").strip()
+        if not (line.startswith("df") or line.startswith("pd.")):
+            continue
+        try:
+            ast.parse(line, mode="eval")
+        except SyntaxError:
+            continue
+        return line
+    return None
+
+
+def stream_code(llm, prompt_text, on_token=None, cancel_event=None, options=None):
+    """Stream a completion, stopping as soon as a complete code line has arrived
+
+    on_token(text_so_far) is called for every chunk. Closing the stream drops
+    the HTTP response, so the server stops generating the explanation the
+    model likes to add after the code. Setting cancel_event (a
+    threading.Event) abandons the generation at the next chunk. options are
+    passed to the client as sampling options.
+    """
+    start = time.perf_counter()
+    first_token_seconds = None
+    stopped_early = False
+    cancelled = False
+    text = ""
+    stream = llm.stream(prompt_text, options=options) if options else llm.stream(prompt_text)
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            text += chunk
+            if on_token is not None:
+                on_token(text)
+            if "\n" in chunk and first_code_line(text) is not None:
+                stopped_early = True
+                break
+    finally:
+        stream.close()
+    total_seconds = time.perf_counter() - start
+    if first_token_seconds is None:
+        first_token_seconds = total_seconds
+    return GenerationResult(text, first_token_seconds, total_seconds, stopped_early, cancelled)
+
+
+class CandidateOutcome:
+    """One finished candidate of a race: its sampling options, generation and check result"""
+
+    def __init__(self, index, options, generation, accepted, code, message, result=None):
+        self.index = index
+        self.options = options
+        self.generation = generation
+        self.accepted = accepted
+        self.code = code
+        self.message = message
+        self.result = result
+
+
+def candidate_options(index, temperature_step=0.3):
+    """Sampling options of candidate index: the first is greedy, later ones hotter, each with its own seed"""
+    return {"temperature": round(min(1.0, index * temperature_step), 2), "seed": index}
+
+
+def race_candidates(llm, prompt_text, count, budget_seconds, check):
+    """Generate count candidates concurrently; return the first that passes check
+
+    check(text, cancelled) -> (accepted, code, message, result) runs on the
+    candidate's worker thread as soon as its generation is complete;
+    cancelled() turns true once the race is decided, and check should then
+    skip any remaining work (such as a trial run) and return None. The first
+    accepted candidate cancels the others, and no check starts after that;
+    when budget_seconds runs out every generation still streaming is
+    cancelled. Returns (winner or None, finished outcomes in arrival order,
+    elapsed seconds).
+    """
+    start = time.perf_counter()
+    cancel = threading.Event()
+
+    def run(index):
+        options = candidate_options(index)
+        try:
+            generation = stream_code(llm, prompt_text, cancel_event=cancel, options=options)
+        except Exception as e:
+            return CandidateOutcome(index, options, None, False, None, f"Generation failed: {e}")
+        if generation.cancelled or cancel.is_set():
+            return None
+        checked = check(generation.text, cancel.is_set)
+        if checked is None:
+            return None
+        if checked[0]:
+            # Stop the other candidates now rather than when the caller gets here
+            cancel.set()
+        return CandidateOutcome(index, options, generation, *checked)
+
+    winner = None
+    outcomes = []
+    pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix="candidate")
+    futures = [pool.submit(run, index) for index in range(count)]
+    try:
+        for future in as_completed(futures, timeout=budget_seconds):
+            outcome = future.result()
+            if outcome is None:
+                continue
+            outcomes.append(outcome)
+            if outcome.accepted:
+                winner = outcome
+                break
+    except FuturesTimeoutError:
+        pass
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return winner, outcomes, time.perf_counter() - start
@@ -0,0 +1,406 @@
+import atexit
+import glob
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; CSVs then go through pd.read_csv
+    pa = None
+    pa_csv = None
+    pq = None
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional; large uploads are then loaded whole
+    duckdb = None
+
+from compaction import compact_dtypes
+from config import (
+    COMPACT_DTYPES,
+    CSV_BLOCK_SIZE,
+    DTYPE_BACKEND,
+    OUT_OF_CORE_DIR,
+    OUT_OF_CORE_MAX_FILES,
+    OUT_OF_CORE_SAMPLE_ROWS,
+    OUT_OF_CORE_THRESHOLD_BYTES,
+    STREAM_BLOCK_SIZE,
+    STREAM_CHUNK_ROWS,
+    STREAMING_THRESHOLD_BYTES,
+)
+from profiling import build_metadata, profile_dataset
+from query_executor import remove_orphaned_dirs
+
+# Size of the blocks fed to the hasher when the upload can't expose a buffer
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Each process keeps its Parquet copies in OUT_OF_CORE_DIR/<prefix><pid>-<random>
+PROCESS_DIR_PREFIX = "process-"
+
+# Copies written straight into OUT_OF_CORE_DIR before per-process directories
+LEGACY_COPY_NAME = re.compile(r"[0-9a-f]{32}\.parquet")
+
+
+def fingerprint_upload(file):
+    """Return a stable fingerprint (name + size + content hash) for an uploaded file"""
+    hasher = hashlib.blake2b(digest_size=16)
+
+    if hasattr(file, "getbuffer"):
+        # BytesIO-style uploads: hash the underlying buffer without copying it
+        buffer = file.getbuffer()
+        size = buffer.nbytes
+        hasher.update(buffer)
+        buffer.release()
+    else:
+        position = file.tell()
+        file.seek(0)
+        size = 0
+        while True:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            hasher.update(block)
+        file.seek(position)
+
+    return f"{file.name}:{size}:{hasher.hexdigest()}"
+
+
+def _arrow_source(file):
+    """Wrap an upload in a zero-copy pyarrow input stream"""
+    if hasattr(file, "getbuffer"):
+        return pa.BufferReader(pa.py_buffer(file.getbuffer()))
+    file.seek(0)
+    return pa.BufferReader(file.read())
+
+
+def _upload_size(file):
+    """Size of an upload in bytes, without reading it"""
+    size = getattr(file, "size", None)
+    if size is not None:
+        return size
+    if hasattr(file, "getbuffer"):
+        return file.getbuffer().nbytes
+    position = file.tell()
+    size = file.seek(0, 2)
+    file.seek(position)
+    return size
+
+
+def _convert_options(column_types=None):
+    # Match pd.read_csv: empty and "NA"-style strings are missing values
+    return pa_csv.ConvertOptions(strings_can_be_null=True, column_types=column_types or {})
+
+
+def _temporal_as_strings(schema):
+    """column_types reading the columns Arrow inferred as dates, times or timestamps as text
+
+    pd.read_csv leaves those columns as strings, and code written against
+    it (.str accessors, comparisons with string literals) expects them to
+    be; pyarrow's date and time inference can't be switched off otherwise.
+    """
+    return {field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)}
+
+
+def _open_csv(file, block_size):
+    """Streaming reader over an upload, returning (source, reader), with temporal columns as text"""
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=block_size)
+    source = _arrow_source(file)
+    reader = pa_csv.open_csv(source, read_options=read_options, convert_options=_convert_options())
+    strings = _temporal_as_strings(reader.schema)
+    if strings:
+        source = _arrow_source(file)
+        reader = pa_csv.open_csv(source, read_options=read_options, convert_options=_convert_options(strings))
+    return source, reader
+
+
+def _table_to_pandas(table, dtype_backend):
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    # split_blocks/self_destruct avoid holding two full copies during conversion
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_csv_fast(file, dtype_backend=DTYPE_BACKEND, block_size=CSV_BLOCK_SIZE):
+    """Parse a CSV on all cores with pyarrow, returning (df, engine_name)
+
+    dtype_backend is "numpy" for classic pandas dtypes or "pyarrow" for
+    ArrowDtype columns. As with pd.read_csv, dates, times and timestamps
+    stay strings. Inputs the Arrow reader rejects (ragged rows, non UTF-8
+    text, ...) fall back to pd.read_csv.
+    """
+    if pa_csv is not None:
+        try:
+            read_options = pa_csv.ReadOptions(use_threads=True, block_size=block_size)
+            table = pa_csv.read_csv(_arrow_source(file), read_options=read_options, convert_options=_convert_options())
+            strings = _temporal_as_strings(table.schema)
+            if strings:
+                # Parse again rather than cast, which would reformat the original text
+                table = pa_csv.read_csv(_arrow_source(file), read_options=read_options,
+                                        convert_options=_convert_options(strings))
+            return _table_to_pandas(table, dtype_backend), "pyarrow"
+        except (pa.ArrowException, UnicodeDecodeError):
+            pass
+
+    file.seek(0)
+    if dtype_backend == "pyarrow" and pa is not None:
+        return pd.read_csv(file, dtype_backend="pyarrow"), "pandas"
+    return pd.read_csv(file), "pandas"
+
+
+def stream_csv(file, on_first_chunk, on_progress, dtype_backend=DTYPE_BACKEND):
+    """Parse a CSV block by block, returning (df, engine_name)
+
+    on_first_chunk(chunk_df) fires as soon as the first block is parsed so the
+    UI can show a preview long before the whole file is in memory;
+    on_progress(bytes_read, total_bytes) fires after every block.
+    """
+    total_bytes = _upload_size(file)
+
+    if pa_csv is not None:
+        try:
+            source, reader = _open_csv(file, STREAM_BLOCK_SIZE)
+            batches = []
+            for batch in reader:
+                batches.append(batch)
+                if len(batches) == 1:
+                    on_first_chunk(batch.to_pandas())
+                on_progress(min(source.tell(), total_bytes), total_bytes)
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+            return _table_to_pandas(table, dtype_backend), "pyarrow (streaming)"
+        except (pa.ArrowException, UnicodeDecodeError):
+            # The streaming reader fixes column types from the first block;
+            # re-parse whole-file when a later block disagrees
+            return read_csv_fast(file, dtype_backend)
+
+    file.seek(0)
+    chunks = []
+    for chunk in pd.read_csv(file, chunksize=STREAM_CHUNK_ROWS):
+        chunks.append(chunk)
+        if len(chunks) == 1:
+            on_first_chunk(chunk)
+        on_progress(min(file.tell(), total_bytes), total_bytes)
+    return pd.concat(chunks, ignore_index=True), "pandas (chunked)"
+
+
+def spool_csv_to_parquet(file, path, sample_rows=OUT_OF_CORE_SAMPLE_ROWS, on_first_chunk=None, on_progress=None,
+                         dtype_backend=DTYPE_BACKEND, seed=0):
+    """Stream a CSV into a Parquet file at path, returning (sample_df, total_rows)
+
+    Only the Parquet file holds every row: each parsed block is written
+    out and a uniform random sample of at most sample_rows is kept in
+    memory. The callbacks are those of stream_csv. Raises
+    pa.ArrowException when a later block disagrees with the column types
+    of the first (no file is left behind). Rows go to a uniquely named
+    temporary file that replaces path once complete, so concurrent spools
+    of the same upload never write to the same file.
+    """
+    total_bytes = _upload_size(file)
+    source, reader = _open_csv(file, STREAM_BLOCK_SIZE)
+    rng = np.random.default_rng(seed)
+    descriptor, partial_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".partial",
+                                                dir=os.path.dirname(path) or ".")
+    os.close(descriptor)
+    fraction = None
+    total_rows = 0
+    sampled = []
+    try:
+        with pq.ParquetWriter(partial_path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                if fraction is None:
+                    if on_first_chunk is not None:
+                        on_first_chunk(batch.to_pandas())
+                    # Sampling rate from the first block's bytes per row, with
+                    # headroom; the sample is cut to size at the end
+                    estimated_rows = batch.num_rows * total_bytes / max(source.tell(), 1)
+                    fraction = min(1.0, 1.1 * sample_rows / max(estimated_rows, 1))
+                total_rows += batch.num_rows
+                if fraction < 1.0:
+                    batch = batch.filter(pa.array(rng.random(batch.num_rows) < fraction))
+                sampled.append(batch)
+                if on_progress is not None:
+                    on_progress(min(source.tell(), total_bytes), total_bytes)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    sample = pa.Table.from_batches(sampled, schema=reader.schema)
+    if sample.num_rows > sample_rows:
+        sample = sample.take(np.sort(rng.choice(sample.num_rows, sample_rows, replace=False)))
+    return _table_to_pandas(sample, dtype_backend), total_rows
+
+
+_process_dirs = {}
+_process_dirs_lock = threading.Lock()
+
+
+def process_out_of_core_dir(base):
+    """This process's directory for Parquet copies under base, created on first use
+
+    Copies are never shared between processes, so another process pruning
+    or evicting its own copies can't delete one this process is querying.
+    Creating it removes the directories of processes that have exited, and
+    the directory itself is removed at interpreter exit.
+    """
+    with _process_dirs_lock:
+        directory = _process_dirs.get(base)
+        if directory is None:
+            os.makedirs(base, exist_ok=True)
+            remove_orphaned_dirs(base, PROCESS_DIR_PREFIX)
+            for name in os.listdir(base):
+                if LEGACY_COPY_NAME.fullmatch(name):
+                    _remove(os.path.join(base, name))
+            directory = _process_dirs[base] = tempfile.mkdtemp(prefix=f"{PROCESS_DIR_PREFIX}{os.getpid()}-", dir=base)
+            atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        return directory
+
+
+def out_of_core_path(fingerprint, directory=OUT_OF_CORE_DIR):
+    """Parquet path for an upload, named by a hash of its fingerprint"""
+    digest = hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(directory, f"{digest}.parquet")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune_out_of_core_dir(directory=OUT_OF_CORE_DIR, max_files=OUT_OF_CORE_MAX_FILES, keep=()):
+    """Delete all but the max_files most recently written Parquet copies, never those in keep
+
+    Run on this process's own directory: catches copies no cached dataset
+    refers to any more; copies of cached datasets go when IngestCache evicts
+    them.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.parquet")), key=os.path.getmtime, reverse=True)
+    for path in paths[max_files:]:
+        if path not in keep:
+            _remove(path)
+
+
+def out_of_core_available():
+    return pq is not None and duckdb is not None and OUT_OF_CORE_THRESHOLD_BYTES > 0
+
+
+def read_upload(file, on_first_chunk=None, on_progress=None):
+    """Parse an uploaded CSV/Excel file, returning (df, engine_name)
+
+    Large CSVs are streamed when preview/progress callbacks are supplied.
+    """
+    if file.name.endswith(".csv"):
+        if on_first_chunk is not None and _upload_size(file) >= STREAMING_THRESHOLD_BYTES:
+            return stream_csv(file, on_first_chunk, on_progress)
+        return read_csv_fast(file)
+    file.seek(0)
+    if DTYPE_BACKEND == "pyarrow" and pa is not None:
+        return pd.read_excel(file, dtype_backend="pyarrow"), "openpyxl"
+    return pd.read_excel(file), "openpyxl"
+
+
+class IngestedDataset:
+    """A parsed upload together with everything derived from it at load time"""
+
+    def __init__(self, fingerprint, name, df, metadata, profile, engine=None, load_seconds=None,
+                 compaction_report=None, parquet_path=None, total_rows=None):
+        self.fingerprint = fingerprint
+        self.name = name
+        self.df = df
+        self.metadata = metadata
+        self.profile = profile
+        self.engine = engine
+        self.load_seconds = load_seconds
+        self.compaction_report = compaction_report
+        # Out-of-core uploads: df is a sample of total_rows rows, all of which are in parquet_path
+        self.parquet_path = parquet_path
+        self.total_rows = total_rows
+
+
+class IngestCache:
+    """Process-wide LRU cache of parsed uploads keyed on their content fingerprint
+
+    Owns the Parquet copies of out-of-core uploads: a copy is deleted when
+    its dataset is evicted, and only copies no cached dataset uses are pruned.
+    """
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, fingerprint, loader):
+        """Return (dataset, was_hit), calling loader() only for unseen fingerprints"""
+        with self._lock:
+            dataset = self._entries.get(fingerprint)
+            if dataset is not None:
+                self._entries.move_to_end(fingerprint)
+                self.hits += 1
+                return dataset, True
+
+        # Parse outside the lock so other sessions aren't blocked on a large file
+        dataset = loader()
+
+        with self._lock:
+            self.misses += 1
+            self._entries[fingerprint] = dataset
+            self._entries.move_to_end(fingerprint)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+            in_use = {cached.parquet_path for cached in self._entries.values() if cached.parquet_path}
+        for old in evicted:
+            if old.parquet_path and old.parquet_path not in in_use:
+                _remove(old.parquet_path)
+        if dataset.parquet_path:
+            prune_out_of_core_dir(os.path.dirname(dataset.parquet_path), keep=in_use)
+        return dataset, False
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def ingest_upload(file, fingerprint, on_first_chunk=None, on_progress=None):
+    """Parse an upload and derive its metadata (the cache-miss path)
+
+    CSVs of at least OUT_OF_CORE_THRESHOLD_BYTES are spooled to Parquet and
+    only a sample is loaded, unless their column types change part-way
+    through, in which case they are read whole as usual.
+    """
+    start = time.perf_counter()
+    parquet_path = total_rows = None
+    df = None
+    if file.name.endswith(".csv") and out_of_core_available() and _upload_size(file) >= OUT_OF_CORE_THRESHOLD_BYTES:
+        path = out_of_core_path(fingerprint, process_out_of_core_dir(OUT_OF_CORE_DIR))
+        try:
+            df, total_rows = spool_csv_to_parquet(file, path, on_first_chunk=on_first_chunk, on_progress=on_progress)
+            parquet_path, engine = path, "pyarrow → Parquet (out-of-core)"
+        except (pa.ArrowException, UnicodeDecodeError):
+            df = None
+    if df is None:
+        df, engine = read_upload(file, on_first_chunk, on_progress)
+    compaction_report = None
+    if COMPACT_DTYPES:
+        df, compaction_report = compact_dtypes(df)
+    load_seconds = time.perf_counter() - start
+    profile = profile_dataset(df)
+    return IngestedDataset(fingerprint, file.name, df, build_metadata(df, profile), profile,
+                           engine, load_seconds, compaction_report, parquet_path, total_rows)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    schema_fingerprint TEXT NOT NULL,
+    question TEXT NOT NULL,
+    code TEXT NOT NULL,
+    generation_seconds REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?.!")
+
+
+def schema_fingerprint(metadata_text):
+    """Fingerprint of the serialized metadata the prompt is built from"""
+    return hashlib.blake2b(metadata_text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CodeCache:
+    """Disk-backed cache of generated pandas code, shared by every process on the host
+
+    Entries live in a SQLite file keyed on (model, prompt version, schema
+    fingerprint, normalized question), so they survive restarts. Entries older
+    than max_age_seconds are dropped and, past max_entries, the least recently
+    used ones are evicted. Hit counters are per process.
+    """
+
+    def __init__(self, path, max_entries=5_000, max_age_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call: safe across Streamlit's threads and processes
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def make_key(model, prompt_version, schema, question):
+        parts = "\x1f".join([model, prompt_version, schema, normalize_question(question)])
+        return hashlib.blake2b(parts.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        """Return cached code for key, or None (expired entries count as misses)"""
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT code, generation_seconds FROM generations WHERE key = ? AND created_at >= ?",
+                (key, now - self.max_age_seconds),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE generations SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+                )
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += row[1]
+        return row[0]
+
+    def put(self, key, model, prompt_version, schema, question, code, generation_seconds):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model, prompt_version, schema, normalize_question(question), code,
+                 generation_seconds, now, now),
+            )
+            self._evict(connection, now)
+
+    def entries(self, model, prompt_version, schema):
+        """(question, code) pairs stored for one model, prompt version and schema"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT question, code FROM generations WHERE model = ? AND prompt_version = ? "
+                "AND schema_fingerprint = ? AND created_at >= ?",
+                (model, prompt_version, schema, time.time() - self.max_age_seconds),
+            ).fetchall()
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM generations WHERE created_at < ?", (now - self.max_age_seconds,))
+        connection.execute(
+            "DELETE FROM generations WHERE key NOT IN "
+            "(SELECT key FROM generations ORDER BY last_used_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        with self._connect() as connection:
+            entries = connection.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "saved_seconds": self.saved_seconds}
@@ -0,0 +1,159 @@
+import json
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(value):
+    """Seconds an Ollama keep_alive value keeps the model loaded, None for "forever"
+
+    Accepts numbers (seconds) and Go durations such as "30m" or "1h30m";
+    negative values mean the model is never unloaded.
+    """
+    text = str(value).strip()
+    if text.startswith("-"):
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", text)
+    if not parts or "".join(number + unit for number, unit in parts) != text:
+        raise ValueError(f"Invalid keep_alive duration '{value}'")
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+class LLMClient:
+    """Process-wide Ollama client: pooled keep-alive connections and a pre-warmed model
+
+    Created once per process and shared by every session and rerun. warm_up()
+    loads the model in a background thread (an empty /api/generate request)
+    and asks Ollama to keep it resident for keep_alive, so the first question
+    after start-up or idle doesn't pay the model load. Ollama unloads the
+    model once keep_alive passes without a request, so "ready" expires then
+    and the next warm_up() loads it again.
+    """
+
+    def __init__(self, base_url, model, keep_alive="30m", pool_size=8, timeout=120, retry_seconds=30):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.keep_alive_seconds = keep_alive_seconds(keep_alive)
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.state = "cold"
+        self.detail = ""
+        self.warm_seconds = None
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        self._failed_at = None
+        self._last_request = None
+
+    def _generate_payload(self, prompt, stream, options=None):
+        payload = {"model": self.model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _check(self, response):
+        if response.status_code == 404:
+            raise RuntimeError(f"Ollama has no model '{self.model}'; pull it with `ollama pull {self.model}`")
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama call failed with status code {response.status_code}: {response.text[:200]}")
+
+    def _expired(self):
+        """Whether keep_alive has passed since the last request, so Ollama has unloaded the model"""
+        return (self.keep_alive_seconds is not None and self._last_request is not None
+                and time.monotonic() - self._last_request > self.keep_alive_seconds)
+
+    def _touch(self):
+        with self._lock:
+            self._last_request = time.monotonic()
+
+    def warm_up(self):
+        """Start loading the model in the background
+
+        No-op while loading or ready, and for retry_seconds after a failure so
+        reruns don't hammer a server that is down. A "ready" model idle for
+        longer than keep_alive has been unloaded and is loaded again.
+        """
+        with self._lock:
+            if self.state == "warming" or (self.state == "ready" and not self._expired()):
+                return
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                return
+            self.state = "warming"
+            self.detail = ""
+            self._warm_thread = threading.Thread(target=self._warm, name="llm-warm-up", daemon=True)
+            self._warm_thread.start()
+
+    def _warm(self):
+        start = time.perf_counter()
+        try:
+            # An empty prompt makes Ollama load the model without generating anything
+            response = self._session.post(f"{self.base_url}/api/generate",
+                                          json=self._generate_payload("", False), timeout=self.timeout)
+            self._check(response)
+        except Exception as e:
+            self._set_state("unavailable", str(e))
+            return
+        with self._lock:
+            self.state = "ready"
+            self.warm_seconds = time.perf_counter() - start
+            self._last_request = time.monotonic()
+
+    def _set_state(self, state, detail=""):
+        with self._lock:
+            self.state = state
+            self.detail = detail
+            self._failed_at = time.monotonic() if state == "unavailable" else None
+
+    def stream(self, prompt, options=None):
+        """Yield response text chunks; closing the generator aborts the request
+
+        options are Ollama sampling options such as {"temperature": 0.3, "seed": 1}.
+        """
+        response = None
+        try:
+            response = self._session.post(f"{self.base_url}/api/generate",
+                                          json=self._generate_payload(prompt, True, options),
+                                          stream=True, timeout=self.timeout)
+            self._check(response)
+        except Exception as e:
+            if response is not None:
+                response.close()
+            self._set_state("unavailable", str(e))
+            raise
+        self._set_state("ready")
+        self._touch()
+
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise RuntimeError(f"Ollama error: {data['error']}")
+                if data.get("response"):
+                    yield data["response"]
+        finally:
+            # A fully read response goes back to the pool; dropping a half-read
+            # one closes its connection, which stops generation
+            response.close()
+            # Ollama's keep_alive counts from the end of the request
+            self._touch()
+
+    def status(self):
+        with self._lock:
+            state = "cold" if self.state == "ready" and self._expired() else self.state
+            return {"state": state, "detail": self.detail, "warm_seconds": self.warm_seconds,
+                    "model": self.model}
@@ -0,0 +1,405 @@
+"""DuckDB execution of AI Assistant queries over the on-disk Parquet copy of a large upload.
+
+Only the expression shapes the prompt asks for are translated (see the
+GOOD EXAMPLES in prompts.py): filters (boolean masks, .query(), .loc[]),
+.shape[0], single-column aggregates, value_counts() and its lookups,
+and groupby(...)[...].<aggregate>() with .idxmax()/.idxmin(). Anything
+else raises UnsupportedQuery and is answered by pandas on the in-memory
+sample instead. Missing values follow pandas: comparisons with NaN are
+False (True for !=), aggregates skip NaN, value_counts and groupby drop
+NaN keys. Columns that are categoricals in the in-memory frame are
+answered by pandas whenever their semantics differ from plain strings:
+min/max and ordering comparisons (which follow category order or raise),
+value_counts (which lists unobserved categories) and groupby keys (which
+keep empty groups). Ties in value_counts order and idxmax/idxmin may break
+differently from pandas.
+"""
+import ast
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional; large uploads then load fully into pandas
+    duckdb = None
+
+from query_executor import QueryTimeoutError
+
+# pandas aggregate -> SQL, and whether it needs a numeric column
+AGGREGATES = {
+    "mean": ("AVG({})", True),
+    "sum": ("COALESCE(SUM({}), 0)", True),
+    "median": ("MEDIAN({})", True),
+    "std": ("STDDEV_SAMP({})", True),
+    "min": ("MIN({})", False),
+    "max": ("MAX({})", False),
+    "count": ("COUNT({})", False),
+    "nunique": ("COUNT(DISTINCT {})", False),
+}
+
+# Aggregates that return a row count, never NaN
+COUNT_AGGREGATES = ("count", "nunique")
+
+COMPARISONS = {ast.Eq: "=", ast.NotEq: "<>", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="}
+
+NUMERIC_TYPES = re.compile(r"^(U?(TINY|SMALL|BIG|HUGE)?INT(EGER)?|FLOAT|DOUBLE|REAL|DECIMAL.*)$")
+
+MAX_TRANSLATIONS = 256
+
+
+class UnsupportedQuery(ValueError):
+    """The expression uses something the SQL translation doesn't cover"""
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_string(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _scalar(value):
+    """SQL NULL as NaN, like pandas for empty or all-missing input"""
+    return float("nan") if value is None else value
+
+
+class _Query:
+    def __init__(self, sql, params, convert):
+        self.sql = sql
+        self.params = params
+        self.convert = convert
+
+
+class OutOfCoreEngine:
+    """Translates normalized pandas expressions to DuckDB SQL over one Parquet file
+
+    One engine per dataset, shared by every session; each query runs on its
+    own cursor and is interrupted after timeout_seconds. memory_bytes caps
+    DuckDB's memory, beyond which it spills to temp_dir. categorical names
+    the columns that are pandas categoricals in the in-memory frame.
+    """
+
+    def __init__(self, path, total_rows=None, memory_bytes=None, timeout_seconds=None, temp_dir=None,
+                 categorical=()):
+        self.path = path
+        self.categorical = frozenset(categorical)
+        self.timeout_seconds = timeout_seconds
+        self._connection = duckdb.connect()
+        if memory_bytes:
+            self._connection.execute(f"SET memory_limit = '{int(memory_bytes // 2 ** 20)}MB'")
+        if temp_dir:
+            self._connection.execute(f"SET temp_directory = {_sql_string(temp_dir)}")
+        self._connection.execute(f"CREATE VIEW data AS SELECT * FROM read_parquet({_sql_string(path)})")
+        described = self._connection.execute("DESCRIBE data").fetchall()
+        self.types = {name: column_type for name, column_type, *_ in described}
+        self.total_rows = total_rows if total_rows is not None else self._connection.execute(
+            "SELECT COUNT(*) FROM data").fetchone()[0]
+        self._translations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _numeric(self, column):
+        return bool(NUMERIC_TYPES.match(self.types[column]))
+
+    def translate(self, source):
+        """_Query for a normalized expression, raising UnsupportedQuery outside the covered subset"""
+        with self._lock:
+            if source in self._translations:
+                self._translations.move_to_end(source)
+                translated = self._translations[source]
+                if isinstance(translated, UnsupportedQuery):
+                    raise translated
+                return translated
+        try:
+            translated = self._result(ast.parse(source, mode="eval").body)
+        except UnsupportedQuery as e:
+            translated = e
+        except SyntaxError:
+            translated = UnsupportedQuery("not a Python expression")
+        with self._lock:
+            self._translations[source] = translated
+            while len(self._translations) > MAX_TRANSLATIONS:
+                self._translations.popitem(last=False)
+        if isinstance(translated, UnsupportedQuery):
+            raise translated
+        return translated
+
+    def available(self):
+        """False once the Parquet copy is gone (its dataset left the ingestion cache)"""
+        return os.path.exists(self.path)
+
+    def supports(self, source):
+        if not self.available():
+            return False
+        try:
+            self.translate(source)
+        except UnsupportedQuery:
+            return False
+        return True
+
+    def run(self, source):
+        """Evaluate source on the full dataset; UnsupportedQuery when it can't be translated"""
+        query = self.translate(source)
+        cursor = self._connection.cursor()
+        timer = None
+        if self.timeout_seconds:
+            timer = threading.Timer(self.timeout_seconds, cursor.interrupt)
+            timer.start()
+        try:
+            rows = cursor.execute(query.sql, query.params).fetchall()
+        except duckdb.InterruptException:
+            raise QueryTimeoutError(f"Query took longer than {self.timeout_seconds:g}s and was stopped") from None
+        finally:
+            if timer is not None:
+                timer.cancel()
+            cursor.close()
+        return query.convert(rows)
+
+    # Expression shapes
+
+    def _result(self, node):
+        # F.shape[0]
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute) and node.value.attr == "shape"
+                and isinstance(node.slice, ast.Constant) and node.slice.value == 0):
+            where, params = self._frame(node.value.value)
+            return _Query(f"SELECT COUNT(*) FROM data WHERE {where}", params, lambda rows: int(rows[0][0]))
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.args and not node.keywords:
+            method, target = node.func.attr, node.func.value
+            # F.groupby("g")["v"].<aggregate>() (checked first: it is a column subscript too)
+            if method in AGGREGATES and self._is_groupby_column(target):
+                return self._group_aggregate(method, *self._groupby_column(target))
+            # F.groupby("g")["v"].<aggregate>().idxmax() / .idxmin()
+            if (method in ("idxmax", "idxmin") and _method(target) in AGGREGATES and _plain_call(target)
+                    and self._is_groupby_column(target.func.value)):
+                return self._group_aggregate(target.func.attr, *self._groupby_column(target.func.value), best=method)
+            # F["c"].<aggregate>()
+            if method in AGGREGATES and self._is_column(target):
+                column, where, params = self._column(target)
+                return self._aggregate(method, column, where, params)
+            # F["c"].value_counts()
+            if method == "value_counts" and self._is_column(target):
+                return self._value_counts(*self._column(target))
+            # F["c"].value_counts().idxmax() / .idxmin()
+            if method in ("idxmax", "idxmin") and _method(target) == "value_counts" and _plain_call(target):
+                column, where, params = self._column(target.func.value)
+                return self._value_counts(column, where, params, best=method)
+
+        # F["c"].value_counts()["value"]
+        if (isinstance(node, ast.Subscript) and _method(node.value) == "value_counts" and _plain_call(node.value)
+                and isinstance(node.slice, ast.Constant)):
+            column, where, params = self._column(node.value.func.value)
+            if column in self.categorical:
+                raise UnsupportedQuery(f"value_counts() of categorical column '{column}'")
+            condition, value_params = self._comparison(column, ast.Eq(), node.slice.value)
+            key = node.slice.value
+
+            def lookup(rows):
+                if rows[0][0] == 0:
+                    raise KeyError(key)
+                return int(rows[0][0])
+            return _Query(f"SELECT COUNT(*) FROM data WHERE {where} AND {condition}", params + value_params, lookup)
+
+        raise UnsupportedQuery(f"no SQL translation for {type(node).__name__}")
+
+    def _check_aggregate(self, method, column):
+        if AGGREGATES[method][1] and not self._numeric(column):
+            raise UnsupportedQuery(f".{method}() of non-numeric column '{column}'")
+        if method in ("min", "max") and column in self.categorical:
+            raise UnsupportedQuery(f".{method}() of categorical column '{column}'")
+
+    def _aggregate(self, method, column, where, params):
+        self._check_aggregate(method, column)
+        template = AGGREGATES[method][0]
+        sql = f"SELECT {template.format(_quote(column))} FROM data WHERE {where}"
+        if method in COUNT_AGGREGATES:
+            return _Query(sql, params, lambda rows: int(rows[0][0]))
+        return _Query(sql, params, lambda rows: _scalar(rows[0][0]))
+
+    def _value_counts(self, column, where, params, best=None):
+        if column in self.categorical:
+            raise UnsupportedQuery(f"value_counts() of categorical column '{column}'")
+        sql = (f"SELECT {_quote(column)}, COUNT(*) AS n FROM data WHERE {where} AND {_quote(column)} IS NOT NULL "
+               f"GROUP BY {_quote(column)} ORDER BY n {'ASC' if best == 'idxmin' else 'DESC'}, {_quote(column)}")
+        if best is not None:
+            return _Query(sql + " LIMIT 1", params, lambda rows: _best(rows, best))
+
+        def series(rows):
+            return pd.Series([row[1] for row in rows], index=pd.Index([row[0] for row in rows], name=column),
+                             name="count", dtype="int64")
+        return _Query(sql, params, series)
+
+    def _group_aggregate(self, method, group, column, where, params, best=None):
+        self._check_aggregate(method, column)
+        if group in self.categorical:
+            raise UnsupportedQuery(f"groupby on categorical column '{group}'")
+        value = AGGREGATES[method][0].format(_quote(column))
+        sql = (f"SELECT {_quote(group)}, {value} AS v FROM data WHERE {where} AND {_quote(group)} IS NOT NULL "
+               f"GROUP BY {_quote(group)}")
+        if best is not None:
+            order = "DESC" if best == "idxmax" else "ASC"
+            return _Query(f"{sql} ORDER BY v {order} NULLS LAST, {_quote(group)} LIMIT 1", params,
+                          lambda rows: _best(rows, best))
+
+        def series(rows):
+            values = [row[1] if method in COUNT_AGGREGATES else _scalar(row[1]) for row in rows]
+            return pd.Series(values, index=pd.Index([row[0] for row in rows], name=group), name=column)
+        return _Query(f"{sql} ORDER BY {_quote(group)}", params, series)
+
+    # Frames, columns and masks
+
+    def _frame(self, node):
+        """(WHERE clause, params) selecting the rows of a frame expression"""
+        if isinstance(node, ast.Name) and node.id == "df":
+            return "TRUE", []
+        if isinstance(node, ast.Subscript):
+            target, mask = node.value, node.slice
+            if isinstance(target, ast.Attribute) and target.attr == "loc":
+                target = target.value
+                if isinstance(mask, ast.Tuple):
+                    raise UnsupportedQuery(".loc with a column selector")
+            elif isinstance(mask, (ast.Constant, ast.List, ast.Tuple)):
+                raise UnsupportedQuery("column selection used as a frame")
+            where, params = self._frame(target)
+            condition, mask_params = self._mask(mask)
+            return f"{where} AND {condition}", params + mask_params
+        if (_method(node) == "query" and len(node.args) == 1 and not node.keywords
+                and isinstance(node.args[0], ast.Constant)):
+            where, params = self._frame(node.func.value)
+            condition, query_params = self._query_string(node.args[0].value)
+            return f"{where} AND {condition}", params + query_params
+        raise UnsupportedQuery("unsupported frame expression")
+
+    def _is_column(self, node):
+        return isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant) and isinstance(
+            node.slice.value, str)
+
+    def _column(self, node):
+        """(column, WHERE clause, params) for F["c"]"""
+        column = node.slice.value
+        if column not in self.types:
+            raise UnsupportedQuery(f"unknown column '{column}'")
+        where, params = self._frame(node.value)
+        return column, where, params
+
+    def _is_groupby_column(self, node):
+        return self._is_column(node) and _method(node.value) == "groupby"
+
+    def _groupby_column(self, node):
+        """(group column, value column, WHERE clause, params) for F.groupby("g"[, observed=True])["v"]"""
+        call = node.value
+        # GROUP BY only ever lists observed values, so observed=True changes nothing
+        observed = all(keyword.arg == "observed" and isinstance(keyword.value, ast.Constant)
+                       and keyword.value.value is True for keyword in call.keywords)
+        if len(call.args) != 1 or not observed or not isinstance(call.args[0], ast.Constant):
+            raise UnsupportedQuery("groupby on anything but one column")
+        group, column = call.args[0].value, node.slice.value
+        if group not in self.types or column not in self.types:
+            raise UnsupportedQuery("unknown groupby column")
+        where, params = self._frame(call.func.value)
+        return group, column, where, params
+
+    def _mask_column(self, node):
+        """Column name of df["c"] inside a mask"""
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "df"
+                and isinstance(node.slice, ast.Constant) and node.slice.value in self.types):
+            return node.slice.value
+        raise UnsupportedQuery("mask on anything but df[\"column\"]")
+
+    def _comparison(self, column, op, value):
+        """NaN-aware comparison of a column with a constant of a matching type"""
+        if isinstance(value, bool) or value is None:
+            raise UnsupportedQuery("comparison with a boolean or None")
+        if isinstance(value, str) == self._numeric(column) or (isinstance(value, float) and math.isnan(value)):
+            # pandas compares mismatched types as unequal; SQL would cast
+            raise UnsupportedQuery(f"comparison of '{column}' with {type(value).__name__}")
+        if type(op) not in COMPARISONS:
+            raise UnsupportedQuery(f"comparison {type(op).__name__}")
+        if column in self.categorical and not isinstance(op, (ast.Eq, ast.NotEq)):
+            raise UnsupportedQuery(f"ordering comparison on categorical column '{column}'")
+        default = "TRUE" if isinstance(op, ast.NotEq) else "FALSE"
+        return f"COALESCE({_quote(column)} {COMPARISONS[type(op)]} ?, {default})", [value]
+
+    def _mask(self, node, column_of=None):
+        """(SQL condition, params) for a boolean mask expression"""
+        column_of = column_of or self._mask_column
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            left, right = node.left, node.comparators[0]
+            op = node.ops[0]
+            if isinstance(left, ast.Constant):
+                # 50 < df["x"] is df["x"] > 50
+                left, right = right, left
+                op = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE}.get(type(op), type(op))()
+            if not isinstance(right, ast.Constant):
+                raise UnsupportedQuery("comparison with a non-constant")
+            return self._comparison(column_of(left), op, right.value)
+        if isinstance(node, (ast.BinOp, ast.BoolOp)):
+            operands = [node.left, node.right] if isinstance(node, ast.BinOp) else node.values
+            operator = node.op
+            if isinstance(operator, (ast.BitAnd, ast.And)):
+                joiner = " AND "
+            elif isinstance(operator, (ast.BitOr, ast.Or)):
+                joiner = " OR "
+            else:
+                raise UnsupportedQuery(f"mask operator {type(operator).__name__}")
+            parts = [self._mask(operand, column_of) for operand in operands]
+            return "(" + joiner.join(sql for sql, _ in parts) + ")", [param for _, params in parts for param in params]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Invert, ast.Not)):
+            sql, params = self._mask(node.operand, column_of)
+            return f"(NOT {sql})", params
+        method = _method(node)
+        if method in ("isnull", "isna", "notnull", "notna") and _plain_call(node):
+            column = column_of(node.func.value)
+            return f"({_quote(column)} IS {'' if method in ('isnull', 'isna') else 'NOT '}NULL)", []
+        if method == "isin" and len(node.args) == 1 and isinstance(node.args[0], (ast.List, ast.Tuple)):
+            column = column_of(node.func.value)
+            values = [element.value for element in node.args[0].elts if isinstance(element, ast.Constant)]
+            if len(values) != len(node.args[0].elts) or not values:
+                raise UnsupportedQuery("isin with non-constant values")
+            parts = [self._comparison(column, ast.Eq(), value) for value in values]
+            return "(" + " OR ".join(sql for sql, _ in parts) + ")", [param for _, params in parts for param in params]
+        raise UnsupportedQuery("unsupported mask")
+
+    def _query_string(self, text):
+        """(SQL condition, params) for the expression of df.query(text)"""
+        names = {}
+
+        def placeholder(match):
+            names[f"__column_{len(names)}"] = match.group(1)
+            return f"__column_{len(names) - 1}"
+        text = re.sub(r"`([^`]+)`", placeholder, text)
+        if "@" in text:
+            raise UnsupportedQuery("query() referencing local variables")
+        try:
+            tree = ast.parse(text, mode="eval").body
+        except SyntaxError:
+            raise UnsupportedQuery("query() string isn't a Python expression") from None
+
+        def column_of(node):
+            if isinstance(node, ast.Name):
+                column = names.get(node.id, node.id)
+                if column in self.types:
+                    return column
+            raise UnsupportedQuery("query() comparison on an unknown column")
+        return self._mask(tree, column_of)
+
+
+def _method(node):
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _plain_call(node):
+    return not node.args and not node.keywords
+
+
+def _best(rows, best):
+    if not rows:
+        raise ValueError(f"attempt to get {best.replace('idx', 'arg')} of an empty sequence")
+    return rows[0][0]
@@ -0,0 +1,331 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from compaction import categorical_columns, numeric_columns
+from config import (
+    APPROX_CHUNK_ROWS,
+    APPROX_HLL_PRECISION,
+    APPROX_PROFILE,
+    APPROX_PROFILE_ROWS,
+    APPROX_QUANTILE_CAPACITY,
+    APPROX_SAMPLE_SIZE,
+    APPROX_TOP_K,
+    METADATA_CHAR_BUDGET,
+    METADATA_SAMPLE_ROWS,
+    METADATA_TOP_K,
+)
+from sketches import HeavyHitters, HyperLogLog, QuantileSketch, ReservoirSample
+
+SUMMARY_QUANTILES = [0.25, 0.5, 0.75]
+
+# Most frequent values kept per text/category column in an exact profile
+TOP_VALUES_KEPT = 64
+
+# Per-column metadata fields dropped, in this order, when top values alone
+# can't bring the metadata under its character budget
+TRIMMABLE_FIELDS = ("Top Values", "Sample", "Inferred Type", "Distinct", "Null Ratio")
+
+
+class DatasetProfile:
+    """Column statistics computed once per dataset and shared by every widget"""
+
+    def __init__(self, rows, dtypes, null_counts, memory_bytes, distinct_counts,
+                 numeric_summary, numeric_cols, categorical_cols,
+                 approximate=False, samples=None, top_values=None, error_bounds=None):
+        self.rows = rows
+        self.dtypes = dtypes
+        self.null_counts = null_counts
+        self.non_null_counts = rows - null_counts
+        self.memory_bytes = memory_bytes
+        self.distinct_counts = distinct_counts
+        self.numeric_summary = numeric_summary
+        self.numeric_cols = numeric_cols
+        self.categorical_cols = categorical_cols
+        # Only set for approximate profiles: per-column reservoir samples,
+        # heavy-hitter counts and the error bounds the UI has to show
+        self.approximate = approximate
+        self.samples = samples or {}
+        self.top_values = top_values or {}
+        self.error_bounds = error_bounds or {}
+
+    @property
+    def columns(self):
+        return len(self.dtypes)
+
+    @property
+    def total_missing(self):
+        return int(self.null_counts.sum())
+
+    @property
+    def total_memory(self):
+        return int(self.memory_bytes.sum())
+
+    @property
+    def completeness(self):
+        """Percentage of non-missing cells"""
+        total_cells = self.rows * self.columns
+        if total_cells == 0:
+            return 100.0
+        return (total_cells - self.total_missing) / total_cells * 100
+
+    def column_info(self):
+        """The Column / Data Type / Non-Null / Null table shown in Analytics"""
+        return pd.DataFrame({
+            'Column': self.dtypes.index,
+            'Data Type': self.dtypes.astype(str).values,
+            'Non-Null Count': self.non_null_counts.values,
+            'Null Count': self.null_counts.values
+        })
+
+    def missing_by_column(self):
+        missing = self.null_counts[self.null_counts > 0]
+        return missing.sort_values(ascending=False)
+
+
+def _numeric_summary(df, numeric_cols):
+    """describe()-shaped table built from one aggregation and one quantile call"""
+    if not numeric_cols:
+        return pd.DataFrame()
+    numeric = df[numeric_cols]
+    moments = numeric.agg(['count', 'mean', 'std', 'min', 'max'])
+    quantiles = numeric.quantile(SUMMARY_QUANTILES)
+    quantiles.index = [f"{q:.0%}" for q in SUMMARY_QUANTILES]
+    summary = pd.concat([moments.loc[['count', 'mean', 'std', 'min']], quantiles, moments.loc[['max']]])
+    return summary.astype(float)
+
+
+class _RunningMoments:
+    """Exact count/mean/variance/min/max merged chunk by chunk (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        if values.size == 0:
+            return
+        count = values.size
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+def approximate_profile(df, chunk_rows=APPROX_CHUNK_ROWS):
+    """Profile a very large frame with streaming sketches, one chunk at a time
+
+    Counts, means, standard deviations and min/max stay exact; quantiles,
+    distinct counts, top values and deep memory are estimated.
+    """
+    numeric_cols = numeric_columns(df)
+    categorical_cols = categorical_columns(df)
+    rows = len(df)
+
+    moments = {col: _RunningMoments() for col in numeric_cols}
+    quantiles = {col: QuantileSketch(APPROX_QUANTILE_CAPACITY, seed=i) for i, col in enumerate(numeric_cols)}
+    # Samples back the histograms (numeric) and the deep-memory estimate (object)
+    sampled_cols = numeric_cols + [col for col in df.columns if df[col].dtype == object]
+    samples = {col: ReservoirSample(APPROX_SAMPLE_SIZE, seed=i) for i, col in enumerate(sampled_cols)}
+    distinct = {col: HyperLogLog(APPROX_HLL_PRECISION) for col in df.columns}
+    heavy = {col: HeavyHitters(APPROX_TOP_K) for col in categorical_cols}
+
+    for start in range(0, rows, chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        for col in df.columns:
+            series = chunk[col].dropna()
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Categories already are a perfect dictionary; only count them
+                heavy[col].update(series)
+                continue
+            values = series.to_numpy()
+            if col in samples:
+                samples[col].update(values)
+            if col in moments:
+                as_float = values.astype(np.float64)
+                moments[col].update(as_float)
+                quantiles[col].update(as_float)
+                distinct[col].update(as_float)
+            else:
+                distinct[col].update(values)
+                if col in heavy:
+                    heavy[col].update(series)
+
+    distinct_counts = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes = df[col].cat.codes.to_numpy()
+            distinct_counts[col] = int(np.count_nonzero(np.bincount(codes[codes >= 0])))
+        else:
+            distinct_counts[col] = distinct[col].estimate()
+
+    # Deep memory is only expensive for Python-object columns; scale a sample
+    memory_bytes = df.memory_usage(deep=False, index=False)
+    for col in df.columns:
+        if col in samples and df[col].dtype == object and samples[col].values is not None:
+            sample_bytes = pd.Series(samples[col].values).memory_usage(deep=True, index=False)
+            memory_bytes[col] = int(sample_bytes / len(samples[col].values) * rows)
+
+    summary = {}
+    for col in numeric_cols:
+        m = moments[col]
+        q25, q50, q75 = quantiles[col].quantiles(SUMMARY_QUANTILES)
+        summary[col] = [m.count, m.mean if m.count else np.nan, m.std,
+                        m.min if m.count else np.nan, q25, q50, q75, m.max if m.count else np.nan]
+    numeric_summary = pd.DataFrame(
+        summary, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], dtype=float
+    )
+
+    error_bounds = {
+        "quantile_rank_error": max((sketch.rank_error for sketch in quantiles.values()), default=0.0),
+        "distinct_relative_error": 1.04 / np.sqrt(1 << APPROX_HLL_PRECISION),
+        "top_k_count_error": max((hitters.error_bound for hitters in heavy.values()), default=0),
+        "sample_size": APPROX_SAMPLE_SIZE,
+    }
+
+    return DatasetProfile(
+        rows=rows,
+        dtypes=df.dtypes,
+        null_counts=df.isna().sum(),
+        memory_bytes=memory_bytes,
+        distinct_counts=pd.Series(distinct_counts),
+        numeric_summary=numeric_summary,
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        approximate=True,
+        samples={col: sample.values for col, sample in samples.items() if sample.values is not None},
+        top_values={col: hitters.top(APPROX_TOP_K) for col, hitters in heavy.items()},
+        error_bounds=error_bounds,
+    )
+
+
+def profile_dataset(df):
+    """Compute the DatasetProfile for a loaded frame
+
+    With COGNIVIEW_APPROX_PROFILE=1, frames of at least APPROX_PROFILE_ROWS
+    rows get the sketch-based approximate profile instead.
+    """
+    if APPROX_PROFILE and len(df) >= APPROX_PROFILE_ROWS:
+        return approximate_profile(df)
+
+    numeric_cols = numeric_columns(df)
+    categorical_cols = categorical_columns(df)
+
+    # value_counts() already hashes every text value, so it yields the
+    # distinct count and the top values from the same pass
+    distinct_counts = {}
+    top_values = {}
+    for col in categorical_cols:
+        counts = df[col].value_counts(dropna=True)
+        distinct_counts[col] = len(counts)
+        top_values[col] = counts.head(TOP_VALUES_KEPT)
+    other_cols = [col for col in df.columns if col not in top_values]
+    if other_cols:
+        distinct_counts.update(df[other_cols].nunique(dropna=True).to_dict())
+
+    return DatasetProfile(
+        rows=len(df),
+        dtypes=df.dtypes,
+        null_counts=df.isna().sum(),
+        memory_bytes=df.memory_usage(deep=True, index=False),
+        distinct_counts=pd.Series(distinct_counts).reindex(df.columns),
+        numeric_summary=_numeric_summary(df, numeric_cols),
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        top_values=top_values,
+    )
+
+
+def _spread_sample(df, rows):
+    """Evenly spaced rows across the whole frame (not just its head)"""
+    if len(df) <= rows:
+        return df
+    positions = np.linspace(0, len(df) - 1, rows).astype(np.int64)
+    return df.iloc[positions]
+
+
+def _inferred_type(series, dtype):
+    """Python-level type of an object column's values; the dtype name otherwise"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return f"category of {pd.api.types.infer_dtype(dtype.categories, skipna=True)}"
+    if dtype == object:
+        return pd.api.types.infer_dtype(series, skipna=True)
+    return str(dtype)
+
+
+def _format_value(value):
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _column_metadata(profile, sample, top_k):
+    metadata = []
+    for col, dtype in profile.dtypes.items():
+        entry = {
+            "Column": col,
+            "Type": str(dtype),
+            "Inferred Type": _inferred_type(sample[col], dtype),
+            "Null Ratio": round(float(profile.null_counts[col]) / profile.rows, 4) if profile.rows else 0.0,
+            "Distinct": int(profile.distinct_counts[col]),
+        }
+        if col in profile.numeric_summary.columns:
+            low, high = profile.numeric_summary.at['min', col], profile.numeric_summary.at['max', col]
+            # All-NaN/inf columns have no range; NaN isn't valid JSON
+            if np.isfinite(low) and np.isfinite(high):
+                entry["Range"] = [float(_format_value(low)), float(_format_value(high))]
+        top = profile.top_values.get(col)
+        # All-unique columns (ids, free text) have no meaningful top values
+        if top is not None and top_k and len(top) and top.iloc[0] > 1:
+            top = top.head(top_k)
+            entry["Top Values"] = {str(value): int(count) for value, count in top.items()}
+            entry["Sample"] = ', '.join(map(str, top.index))
+        else:
+            values = sample[col].dropna().unique()[:top_k or 1]
+            entry["Sample"] = ', '.join(_format_value(value) for value in values)
+        metadata.append(entry)
+    return metadata
+
+
+def build_metadata(df, profile, top_k=METADATA_TOP_K, char_budget=METADATA_CHAR_BUDGET):
+    """Column metadata for the AI Assistant, built from the full-data profile
+
+    Types, null ratios, cardinalities, ranges and top values describe every
+    row; only dtype inference and numeric samples use an evenly spaced sample.
+    To fit the serialized metadata in char_budget, top values are trimmed
+    first, then the TRIMMABLE_FIELDS are dropped field by field from the
+    last column backwards. Every column keeps its name, type and range, which
+    the app needs, so frames too wide for even those stay over the budget.
+    """
+    sample = _spread_sample(df, METADATA_SAMPLE_ROWS)
+    while True:
+        metadata = _column_metadata(profile, sample, top_k)
+        if top_k <= 1 or len(json.dumps(metadata, default=str)) <= char_budget:
+            break
+        top_k -= 1
+
+    # Serialized size as json.dumps(metadata) lays it out: "[" + entries joined by ", " + "]"
+    sizes = [len(json.dumps(entry, default=str)) for entry in metadata]
+    total = sum(sizes) + 2 * max(len(sizes) - 1, 0) + 2
+    for field in TRIMMABLE_FIELDS:
+        for position in reversed(range(len(metadata))):
+            if total <= char_budget:
+                return metadata
+            if metadata[position].pop(field, None) is not None:
+                size = len(json.dumps(metadata[position], default=str))
+                total += size - sizes[position]
+                sizes[position] = size
+    return metadata
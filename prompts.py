@@ -0,0 +1,224 @@
+import hashlib
+import json
+import math
+import re
+
+from config import SCHEMA_TOKEN_BUDGET
+
+# 🚀 BULLETPROOF PROMPT TEMPLATE for the AI Assistant
+CODE_PROMPT_TEMPLATE = """
+You are an expert Python data analyst. Your ONLY job is to return ONE LINE of valid Python Pandas code.
+
+You will be given:
+- METADATA: a description of the DataFrame `df` (column names, data types, sample values)
+- QUESTION: a natural language question from the user
+
+IMPORTANT RULE:
+✅ ALWAYS access columns with square brackets: df["reading score"]
+❌ NEVER use dot-style like df.reading_score – it breaks if column has spaces
+
+STRICT RULES:
+1. Use ONLY column names from metadata.
+2. Always access columns using square brackets: df["column name"]
+3. NEVER use dot-access like df.reading_score – it breaks if column has spaces.
+4. Return ONLY one valid Python Pandas code line – no explanation, no markdown.
+5. Always use the DataFrame name: df
+6. Use double quotes for string values: "value"
+7. Use df.query("...") or df.loc[...] for filters.
+8. For group comparisons like "Which group has the highest average X?", use:
+   df.groupby("group_column")["numeric_column"].mean().idxmax()
+9. When using groupby, apply .mean() only to numeric columns (e.g., scores).
+10. NEVER use .loc[...] with .argmax()/argmin(). Use groupby().mean().idxmax() instead.
+11. NEVER make up Python-style variable names like test_preparation_course.
+    Always use the exact column name from metadata with quotes: df["test preparation course"]
+12. To count a specific value like "Male", use:
+    df["column"].value_counts()["Value"]
+13. For filtered group comparison, like “Which gender has highest score among X?”, use:
+    df[df["filter_column"] == "value"].groupby("group_column")["numeric_column"].mean().idxmax()
+14.To get the most common value in a column (like "What is the most common value in gender?"), use:
+df["column"].value_counts().idxmax()
+
+GOOD EXAMPLES:
+df.shape[0]  
+df["math score"].mean()  
+df[df["gender"] == "Female"].shape[0]  
+df.query("lunch == 'Standard'")["reading score"].mean()  
+df.groupby("lunch")["reading score"].mean().idxmax()  
+df[df["test preparation course"] == "Completed"].shape[0]  
+df["gender"].value_counts()["Male"]  
+df[df["test preparation course"] == "Completed"].groupby("gender")["writing score"].mean().idxmax()  
+df[df["lunch"] == "standard"].groupby("gender")["reading score"].mean().idxmax()  
+df[df["parental level of education"] == "Bachelor's degree"]["math score"].mean()  # For specific filtering
+df["gender"].value_counts().idxmax()
+
+BAD EXAMPLES:
+df.reading_score.mean() ❌  
+df.gender.value_counts() ❌  
+df["gender"].loc[df["math score"].argmax()] ❌  
+df[test_preparation_course] ❌  
+df[test_preparation_course == "Completed"] ❌  
+df.query("lunch == 'Standard'")["reading score"].idxmax() ❌  
+
+METADATA:
+{metadata_text}
+
+QUESTION:
+{question}
+
+Respond with ONLY one line of valid Python Pandas code.
+"""
+
+CODE_PROMPT_VARIABLES = ["metadata_text", "question"]
+
+# Bumped whenever serialize_schema's output format changes
+SCHEMA_FORMAT = "compact-1"
+
+# Changes whenever the template, the schema format or its budget changes, so
+# cached generations from an older prompt are never reused
+PROMPT_VERSION = hashlib.blake2b(
+    f"{CODE_PROMPT_TEMPLATE}\x1f{SCHEMA_FORMAT}\x1f{SCHEMA_TOKEN_BUDGET}".encode("utf-8"), digest_size=6
+).hexdigest()
+
+# Rough characters per token for Mistral-style tokenizers on schema text
+CHARS_PER_TOKEN = 4
+
+# Tokens reserved for the line counting columns left out
+FOOTER_TOKENS = 6
+
+# Example values shown per text column, and characters kept of each
+MAX_EXAMPLE_VALUES = 5
+MAX_VALUE_CHARS = 40
+
+# Question words that point at a column whose name contains the key word
+COLUMN_SYNONYMS = {
+    "gender": {"sex", "male", "female", "men", "women", "boys", "girls"},
+    "age": {"old", "older", "oldest", "young", "younger", "youngest", "years"},
+    "price": {"cost", "costs", "expensive", "cheap", "cheapest"},
+    "salary": {"pay", "paid", "income", "earn", "earns", "wage", "wages"},
+    "date": {"when", "day", "month", "year", "time"},
+    "time": {"when", "duration", "hour", "hours"},
+    "score": {"grade", "grades", "mark", "marks", "result", "results"},
+    "city": {"where", "location", "town"},
+    "country": {"where", "location", "nation"},
+    "quantity": {"count", "amount", "number"},
+    "name": {"who", "called"},
+}
+
+STOPWORDS = frozenset(
+    "a an the of in on for to is are was were be what which who how many much show me give tell "
+    "value values column columns data rows row with by and or has have do does than".split()
+)
+
+
+def estimate_tokens(text):
+    """Approximate token count of a piece of prompt text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _words(text):
+    # Crude singularization so "scores" matches a "score" column
+    return {word[:-1] if len(word) > 3 and word.endswith("s") else word
+            for word in re.findall(r"[a-z0-9]+", str(text).lower())} - STOPWORDS
+
+
+def _column_values(entry):
+    if "Top Values" in entry:
+        return list(entry["Top Values"])
+    if "Range" in entry:
+        return []
+    return [value.strip() for value in str(entry.get("Sample", "")).split(",") if value.strip()]
+
+
+def column_relevance(entry, question):
+    """Relevance of one metadata column to a question (0 when nothing matches)
+
+    Full name match > dataset value mentioned > shared word > synonym.
+    """
+    text = " " + " ".join(re.findall(r"[a-z0-9]+", question.lower())) + " "
+    name = " ".join(re.findall(r"[a-z0-9]+", str(entry["Column"]).lower()))
+    question_words = _words(question)
+    name_words = _words(entry["Column"])
+
+    score = 0.0
+    if name and f" {name} " in text:
+        score += 10
+    score += 3 * len(question_words & name_words)
+    for word in name_words:
+        if COLUMN_SYNONYMS.get(word, set()) & question_words:
+            score += 2
+    for value in _column_values(entry):
+        value = " ".join(re.findall(r"[a-z0-9]+", value.lower()))
+        if value and f" {value} " in text:
+            score += 5
+            break
+    return score
+
+
+def describe_column(entry):
+    """One compact line per column: quoted name, type, range or example values, missing share"""
+    parts = [entry.get("Inferred Type") or entry.get("Type", "")]
+    if "Range" in entry:
+        low, high = entry["Range"]
+        parts.append(f"range {low:g} to {high:g}")
+    else:
+        if "Distinct" in entry:
+            parts.append(f"{entry['Distinct']} distinct")
+        values = _column_values(entry)[:MAX_EXAMPLE_VALUES]
+        if values:
+            parts.append("e.g. " + ", ".join(json.dumps(value[:MAX_VALUE_CHARS]) for value in values))
+    if entry.get("Null Ratio"):
+        parts.append(f"{entry['Null Ratio']:.1%} missing")
+    return f"- {json.dumps(str(entry['Column']))}: " + "; ".join(part for part in parts if part)
+
+
+def serialize_schema(metadata, question, token_budget=SCHEMA_TOKEN_BUDGET):
+    """Compact schema text for the prompt, most relevant columns first, within token_budget
+
+    Columns that match the question (column_relevance > 0) are described in
+    rank order while they fit. Every other column is at least named; leftover
+    budget upgrades those names to full descriptions in dataset order, and
+    names that don't fit are counted. A budget of 0 or less falls back to
+    the full JSON metadata.
+    """
+    if token_budget <= 0:
+        return json.dumps(metadata)
+
+    header = f"DataFrame df with {len(metadata)} columns (name: type; details):"
+    # Room is kept for the "+N more" footer
+    used = estimate_tokens(header) + FOOTER_TOKENS
+    scores = [column_relevance(entry, question) for entry in metadata]
+    line_cost = [estimate_tokens(describe_column(entry)) + 1 for entry in metadata]
+    name_cost = [estimate_tokens(json.dumps(str(entry["Column"]))) + 1 for entry in metadata]
+
+    described = set()
+    for position in sorted(range(len(metadata)), key=lambda i: -scores[i]):
+        if scores[position] <= 0:
+            break
+        # The best match is always described, even over budget
+        if used + line_cost[position] <= token_budget or not described:
+            described.add(position)
+            used += line_cost[position]
+
+    rest = [position for position in range(len(metadata)) if position not in described]
+    named = []
+    for position in rest:
+        if used + name_cost[position] > token_budget:
+            break
+        named.append(position)
+        used += name_cost[position]
+    if len(named) == len(rest):
+        for position in rest:
+            extra = line_cost[position] - name_cost[position]
+            if used + extra <= token_budget:
+                described.add(position)
+                named.remove(position)
+                used += extra
+
+    lines = [header] + [describe_column(metadata[position]) for position in sorted(described)]
+    if named:
+        lines.append("Other columns: " + ", ".join(json.dumps(str(metadata[position]["Column"]))
+                                                   for position in named))
+    omitted = len(metadata) - len(described) - len(named)
+    if omitted:
+        lines.append(f"(+{omitted} more not shown)")
+    return "\n".join(lines)
@@ -0,0 +1,513 @@
+"""Out-of-process evaluation of AI Assistant queries.
+
+Worker processes are started with the pool and evaluate validated
+expressions against datasets written once per fingerprint to a spool
+directory (shared memory under /dev/shm when available) as Arrow IPC files,
+which workers memory-map instead of receiving a pickled copy per query.
+Large frame results come back the same way. Each process's spool directory
+is named after its PID, so one left behind by a killed process is removed
+when the next executor starts. A query that runs past the
+wall-clock limit gets its worker killed and replaced; one that allocates
+past the memory limit fails with a MemoryError inside the worker, which
+survives.
+"""
+import json
+import multiprocessing
+import os
+import pickle
+import queue
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+import weakref
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; datasets and results are then pickled
+    pa = None
+
+try:
+    import resource
+except ImportError:  # no per-process memory limits on Windows
+    resource = None
+
+from compaction import widen_integers
+
+# Frame results at least this large (shallow memory usage) come back as Arrow
+# files; smaller ones are pickled over the worker's pipe
+ARROW_RESULT_MIN_BYTES = 256 * 1024
+
+# Column holding a Series result while it travels as a one-column table
+SERIES_COLUMN = "__result__"
+
+# Schema metadata key listing the Arrow-backed columns of a written frame
+ARROW_COLUMNS_KEY = b"cogniview.arrow_columns"
+
+# Spool directories are named SPOOL_PREFIX + "<owner pid>-" + a random suffix
+SPOOL_PREFIX = "cogniview-queries-"
+
+# How often a queued query with a cancelled() callback checks it
+CANCEL_POLL_SECONDS = 0.05
+
+# Queries kept for the queue wait / run time percentiles
+LATENCY_WINDOW = 500
+
+
+class QueryTimeoutError(RuntimeError):
+    """The query ran past the executor's wall-clock limit and its worker was killed"""
+
+
+class DatasetLoadTimeoutError(RuntimeError):
+    """A worker took longer than the executor's load limit to read the dataset, and was killed"""
+
+
+class QueryMemoryError(RuntimeError):
+    """The query tried to allocate more than the executor's per-query memory limit"""
+
+
+class QueryCancelledError(RuntimeError):
+    """The query was cancelled while waiting for a worker and never ran"""
+
+
+def _default_spool_dir():
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by another user
+    return True
+
+
+def remove_orphaned_dirs(parent, prefix):
+    """Remove the directories in parent named prefix + "<pid>-..." whose process has exited
+
+    Directories starting with prefix but without a PID predate the scheme
+    and are removed too.
+    """
+    try:
+        names = os.listdir(parent)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        match = re.match(r"(\d+)-", name[len(prefix):])
+        if match is None or not _pid_alive(int(match.group(1))):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _arrow_kind(dtype):
+    """How an Arrow-backed column is rebuilt on read: "arrow" (ArrowDtype), "string" or None"""
+    if isinstance(dtype, pd.ArrowDtype):
+        return "arrow"
+    if isinstance(dtype, pd.StringDtype) and dtype.storage.startswith("pyarrow"):
+        return "string"
+    return None
+
+
+def _write_arrow(frame, path):
+    table = pa.Table.from_pandas(frame)
+    # to_pandas() turns these back into copies (string[python], or "string"
+    # for ArrowDtype strings), so note them for _read_arrow to rewrap
+    arrow_columns = {name: kind for name, kind in ((name, _arrow_kind(dtype)) for name, dtype in frame.dtypes.items())
+                     if kind is not None}
+    if arrow_columns:
+        table = table.replace_schema_metadata({**table.schema.metadata, ARROW_COLUMNS_KEY: json.dumps(arrow_columns)})
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(path, split_blocks=False):
+    # Buffers of the table point into the mapping; numeric columns without
+    # nulls stay views of it with split_blocks, and Arrow-backed columns are
+    # wrapped around it as they are, keeping the dtypes they were written with
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    arrow_columns = json.loads((table.schema.metadata or {}).get(ARROW_COLUMNS_KEY, b"{}"))
+    if not arrow_columns:
+        return table.to_pandas(split_blocks=split_blocks)
+    frame = table.drop_columns(list(arrow_columns)).to_pandas(split_blocks=split_blocks)
+    order = [name for name in table.column_names if name in arrow_columns or name in frame.columns]
+    for name in order:
+        if name in arrow_columns:
+            chunks = table.column(name)
+            array = (pd.arrays.ArrowExtensionArray(chunks) if arrow_columns[name] == "arrow"
+                     else pd.arrays.ArrowStringArray(chunks))
+            frame.insert(order.index(name), name, array)
+    return frame
+
+
+def _write_dataset(df, path):
+    """Write df for the workers; returns the format used ("arrow" or "pickle")"""
+    if pa is not None and all(isinstance(column, str) for column in df.columns):
+        try:
+            _write_arrow(df, path)
+            return "arrow"
+        except (pa.ArrowException, TypeError, ValueError):
+            pass  # e.g. object columns mixing strings and numbers
+    df.to_pickle(path)
+    return "pickle"
+
+
+def _shallow_bytes(result):
+    usage = result.memory_usage(index=True, deep=False)
+    return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+
+
+def _pack_result(result, spool_dir):
+    if (pa is not None and isinstance(result, (pd.DataFrame, pd.Series))
+            and _shallow_bytes(result) >= ARROW_RESULT_MIN_BYTES):
+        is_series = isinstance(result, pd.Series)
+        frame = result.to_frame(SERIES_COLUMN) if is_series else result
+        if all(isinstance(column, str) for column in frame.columns):
+            path = os.path.join(spool_dir, f"result-{uuid.uuid4().hex}.arrow")
+            try:
+                _write_arrow(frame, path)
+                return ("arrow", path, is_series, result.name if is_series else None)
+            except (pa.ArrowException, TypeError, ValueError):
+                if os.path.exists(path):
+                    os.remove(path)
+    return ("pickle", result)
+
+
+def _unpack_result(payload):
+    if payload[0] == "pickle":
+        return payload[1]
+    _, path, is_series, name = payload
+    try:
+        frame = _read_arrow(path)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return frame[SERIES_COLUMN].rename(name) if is_series else frame
+
+
+def _picklable(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _data_usage():
+    """Private (heap and anonymous mapping) bytes of this process, or None without /proc"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmData:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+@contextmanager
+def _memory_limit(memory_bytes):
+    """Cap new private allocations at memory_bytes above current usage (Linux RLIMIT_DATA)"""
+    usage = _data_usage() if resource is not None and memory_bytes else None
+    if usage is None:
+        yield
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    limit = usage + memory_bytes
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_DATA, (soft, hard))
+
+
+def _worker_main(conn, spool_dir, memory_bytes, max_datasets):
+    """Worker process loop: load the dataset, acknowledge, evaluate, reply"""
+    frames = OrderedDict()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        fingerprint, path, dataset_format, source = message
+        try:
+            df = frames.get(fingerprint)
+            if df is None:
+                df = _read_arrow(path, split_blocks=True) if dataset_format == "arrow" else pd.read_pickle(path)
+                df = frames[fingerprint] = widen_integers(df)
+                while len(frames) > max_datasets:
+                    frames.popitem(last=False)
+            frames.move_to_end(fingerprint)
+        except Exception as e:
+            conn.send(("error", _picklable(e)))
+            continue
+        # The wall-clock limit starts now that the dataset is loaded
+        conn.send(("started",))
+        try:
+            with _memory_limit(memory_bytes):
+                result = eval(compile(source, "<query>", "eval"), {"df": df, "pd": pd, "__builtins__": {}})
+            conn.send(("ok", _pack_result(result, spool_dir)))
+        except MemoryError:
+            conn.send(("memory",))
+        except Exception as e:
+            conn.send(("error", _picklable(e)))
+
+
+# Serializes the __main__ swap in _Worker
+_START_LOCK = threading.Lock()
+
+
+class _Worker:
+    def __init__(self, context, spool_dir, memory_bytes, max_datasets):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, spool_dir, memory_bytes, max_datasets),
+                                       name="query-worker", daemon=True)
+        # Streamlit installs the running page script as __main__, and spawned
+        # children re-import __main__; hide it so workers don't run the app
+        with _START_LOCK:
+            main = sys.modules["__main__"]
+            placeholder = sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                self.process.start()
+            finally:
+                if sys.modules["__main__"] is placeholder:
+                    sys.modules["__main__"] = main
+        child_conn.close()
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+def _shutdown(workers, spool_dir):
+    for worker in list(workers):
+        worker.stop(kill=True)
+    shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class QueryExecutor:
+    """Pool of worker processes evaluating validated query expressions
+
+    Created once per process and shared by every session. run() blocks
+    until a worker is free (the wait is the queue latency reported by
+    stats()), then evaluates the expression with timeout_seconds of wall
+    clock and memory_bytes of new allocations. Each worker keeps the
+    max_datasets most recently queried datasets loaded. The spool directory
+    is removed by close(), at interpreter exit, or by the next executor to
+    start after this process was killed.
+    """
+
+    def __init__(self, workers=2, timeout_seconds=30, memory_bytes=2 * 1024 * 1024 * 1024, spool_dir=None,
+                 max_datasets=4, load_timeout_seconds=300):
+        self.timeout_seconds = timeout_seconds
+        self.memory_bytes = memory_bytes
+        self.max_datasets = max_datasets
+        self.load_timeout_seconds = load_timeout_seconds
+        parent = spool_dir or _default_spool_dir() or tempfile.gettempdir()
+        remove_orphaned_dirs(parent, SPOOL_PREFIX)
+        self.spool_dir = tempfile.mkdtemp(prefix=f"{SPOOL_PREFIX}{os.getpid()}-", dir=parent)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.load_timeouts = 0
+        self.memory_errors = 0
+        self.crashes = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._datasets = OrderedDict()
+        # Queries holding each spool file, and evicted files waiting for theirs to finish
+        self._pins = Counter()
+        self._evicted = set()
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [self._spawn() for _ in range(workers)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers, self.spool_dir)
+
+    def _spawn(self):
+        return _Worker(self._context, self.spool_dir, self.memory_bytes, self.max_datasets)
+
+    def _replace(self, worker):
+        worker.stop(kill=True)
+        replacement = self._spawn()
+        with self._lock:
+            self._workers[self._workers.index(worker)] = replacement
+        return replacement
+
+    def _dataset(self, fingerprint, df):
+        """(path, format) of fingerprint's spool file, writing df the first time
+
+        The file is pinned until _release(path): evicting it while another
+        session's query is about to hand it to a worker only unlinks it once
+        that query is done.
+        """
+        with self._lock:
+            dataset = self._datasets.get(fingerprint)
+            if dataset is not None:
+                self._datasets.move_to_end(fingerprint)
+                self._pins[dataset[0]] += 1
+                return dataset
+
+        # Written outside the lock so other sessions' queries aren't held up
+        path = os.path.join(self.spool_dir, f"dataset-{uuid.uuid4().hex}")
+        written = (path, _write_dataset(df, path))
+
+        with self._lock:
+            dataset = self._datasets.setdefault(fingerprint, written)
+            self._datasets.move_to_end(fingerprint)
+            self._pins[dataset[0]] += 1
+            evicted = [written[0]] if dataset is not written else []
+            while len(self._datasets) > self.max_datasets:
+                evicted.append(self._datasets.popitem(last=False)[1][0])
+            pinned = {old_path for old_path in evicted if self._pins[old_path]}
+            self._evicted |= pinned
+        for old_path in evicted:
+            if old_path not in pinned:
+                _remove(old_path)
+        return dataset
+
+    def _release(self, path):
+        """Unpin a spool file taken by _dataset, deleting it if it was evicted meanwhile"""
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] > 0:
+                return
+            del self._pins[path]
+            if path not in self._evicted:
+                return
+            self._evicted.discard(path)
+        _remove(path)
+
+    def run(self, fingerprint, df, source, cancelled=None):
+        """Evaluate source (a validated expression over df) in a worker and return its result
+
+        Exceptions raised by the expression are re-raised here; QueryTimeoutError
+        and QueryMemoryError report the limits, DatasetLoadTimeoutError a
+        worker that couldn't load the dataset in time. A query whose
+        cancelled() turns true before it gets a worker raises QueryCancelledError.
+        """
+        path, dataset_format = self._dataset(fingerprint, df)
+        try:
+            return self._evaluate(fingerprint, path, dataset_format, source, cancelled)
+        finally:
+            self._release(path)
+
+    def _evaluate(self, fingerprint, path, dataset_format, source, cancelled):
+        with self._lock:
+            self.queued += 1
+        enqueued = time.perf_counter()
+        worker = None
+        try:
+            while worker is None:
+                if cancelled is not None and cancelled():
+                    raise QueryCancelledError("Query was cancelled before it started")
+                try:
+                    worker = self._idle.get(timeout=CANCEL_POLL_SECONDS if cancelled is not None else None)
+                except queue.Empty:
+                    pass
+            if cancelled is not None and cancelled():
+                self._idle.put(worker)
+                raise QueryCancelledError("Query was cancelled before it started")
+        finally:
+            with self._lock:
+                self.queued -= 1
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+
+        try:
+            try:
+                worker.conn.send((fingerprint, path, dataset_format, source))
+                reply = self._receive(worker, self.load_timeout_seconds)
+                if reply is None:
+                    worker = self._replace(worker)
+                    with self._lock:
+                        self.load_timeouts += 1
+                    raise DatasetLoadTimeoutError(
+                        f"Loading the dataset into a query worker took longer than {self.load_timeout_seconds:g}s")
+                if reply[0] == "started":
+                    reply = self._receive(worker, self.timeout_seconds)
+            except (EOFError, OSError):
+                exitcode = worker.process.exitcode
+                worker = self._replace(worker)
+                with self._lock:
+                    self.crashes += 1
+                raise RuntimeError(f"Query worker crashed (exit code {exitcode})") from None
+            if reply is None:
+                worker = self._replace(worker)
+                with self._lock:
+                    self.timeouts += 1
+                raise QueryTimeoutError(f"Query took longer than {self.timeout_seconds:g}s and was stopped")
+            if reply[0] == "memory":
+                with self._lock:
+                    self.memory_errors += 1
+                raise QueryMemoryError(f"Query needed more than {self.memory_bytes / 2 ** 20:,.0f} MB and was stopped")
+            if reply[0] == "error":
+                raise reply[1]
+            return _unpack_result(reply[1])
+        finally:
+            self._idle.put(worker)
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self._latencies.append((started - enqueued, finished - started))
+
+    @staticmethod
+    def _receive(worker, timeout):
+        """Next reply from worker, or None when none arrives within timeout"""
+        if not worker.conn.poll(timeout):
+            return None
+        return worker.conn.recv()
+
+    def stats(self):
+        with self._lock:
+            waits = [wait for wait, _ in self._latencies]
+            runs = [run for _, run in self._latencies]
+            return {"workers": len(self._workers), "queued": self.queued, "running": self.running,
+                    "completed": self.completed, "timeouts": self.timeouts, "load_timeouts": self.load_timeouts,
+                    "memory_errors": self.memory_errors, "crashes": self.crashes,
+                    "wait_p50": _percentile(waits, 0.5), "wait_p95": _percentile(waits, 0.95),
+                    "run_p50": _percentile(runs, 0.5), "run_p95": _percentile(runs, 0.95)}
+
+    def close(self):
+        self._finalizer()
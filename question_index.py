@@ -0,0 +1,187 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from llm_cache import normalize_question
+
+# Character n-gram length used for the TF-IDF vectors
+NGRAM = 3
+
+# Words that change the generated code even when the rest of a question is the
+# same; questions only match when they use the same operations. Longer phrases
+# come first so "most common" isn't read as "most".
+OPERATION_WORDS = [
+    ("mode", r"most common|most frequent|mode"),
+    ("mean", r"average|avg|mean"),
+    ("median", r"median"),
+    ("std", r"standard deviation|std|variance"),
+    ("max", r"maximum|max|highest|largest|biggest|most|top"),
+    ("min", r"minimum|min|lowest|smallest|least|bottom"),
+    ("sum", r"sum|total"),
+    ("count", r"how many|count|number of"),
+    ("unique", r"unique|distinct"),
+    ("greater", r"greater than|more than|above|over|exceeds?|>"),
+    ("less", r"less than|fewer than|below|under|<"),
+    ("missing", r"missing|null|nan|empty"),
+    ("first", r"first|head"),
+    ("last", r"last|tail"),
+    ("which", r"which|who"),
+    ("not", r"not|without|except|excluding"),
+    ("group", r"by|per|each|every|across"),
+]
+
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Filler words dropped before vectorizing, so "avg math score" and "what is
+# the average of the math score?" end up with the same n-grams
+STOPWORDS = frozenset(
+    "a an the of in on for to is are was were be there what whats show me tell give "
+    "please value values column columns data dataset rows row students do does".split()
+)
+
+
+def _phrase_pattern(phrase):
+    return re.compile(r"(?<![\w])" + re.escape(phrase) + r"(?![\w])")
+
+
+class QuestionIndex:
+    """Char n-gram TF-IDF index over past questions on one dataset schema
+
+    A lookup only considers questions with the same signature (columns,
+    dataset values, numbers and operation words mentioned) and returns the
+    closest one when its cosine similarity reaches the threshold, so
+    "avg math score" can reuse the code of "What is the average of math score?"
+    while "max math score" or "math score above 60" cannot.
+    """
+
+    def __init__(self, metadata, threshold=0.8):
+        self.threshold = threshold
+        # Longest names first so "math score" wins over a column called "score"
+        columns = sorted((str(entry["Column"]) for entry in metadata), key=len, reverse=True)
+        self._columns = [(column, _phrase_pattern(column.lower())) for column in columns]
+        values = {str(value) for entry in metadata for value in entry.get("Top Values", {})}
+        values = sorted((value for value in values if value.strip()), key=len, reverse=True)
+        self._values = [(value, _phrase_pattern(value.lower())) for value in values]
+        self._operations = [(name, re.compile(r"(?<![\w])(?:" + words + r")(?![\w])"))
+                            for name, words in OPERATION_WORDS]
+        self._documents = {}
+        self._document_frequency = Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(documents) for documents in self._documents.values())
+
+    def signature(self, question):
+        """(columns, values, numbers, operations) a question refers to"""
+        text = normalize_question(question)
+        found = []
+        for names in (self._columns, self._values):
+            matched = []
+            for name, pattern in names:
+                if pattern.search(text):
+                    matched.append(name)
+                    # Blank the match out so shorter names inside it don't match too
+                    text = pattern.sub(" ", text)
+            found.append(frozenset(matched))
+        numbers = frozenset(float(number) for number in NUMBER_PATTERN.findall(text))
+        operations = []
+        for name, pattern in self._operations:
+            if pattern.search(text):
+                operations.append(name)
+                text = pattern.sub(" ", text)
+        operations = frozenset(operations)
+        return found[0], found[1], numbers, operations
+
+    def _ngrams(self, question):
+        text = normalize_question(question)
+        # Synonyms become one word per operation, then filler words go
+        for name, pattern in self._operations:
+            text = pattern.sub(name, text)
+        text = " ".join(word for word in re.findall(r"[\w<>./-]+", text) if word not in STOPWORDS)
+        text = f" {text} "
+        return Counter(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1))
+
+    def _vector(self, counts, documents):
+        vector = {}
+        for gram, count in counts.items():
+            idf = math.log((1 + documents) / (1 + self._document_frequency[gram])) + 1
+            vector[gram] = count * idf
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def add(self, question, code):
+        signature = self.signature(question)
+        counts = self._ngrams(question)
+        with self._lock:
+            documents = self._documents.setdefault(signature, {})
+            key = normalize_question(question)
+            if key in documents:
+                documents[key] = (documents[key][0], code)
+                return
+            documents[key] = (counts, code)
+            self._document_frequency.update(counts.keys())
+
+    def lookup(self, question):
+        """Return (code, similarity, matched question) for the closest match, or None"""
+        signature = self.signature(question)
+        with self._lock:
+            candidates = list(self._documents.get(signature, {}).items())
+            if not candidates:
+                return None
+            total = len(self)
+            query = self._vector(self._ngrams(question), total)
+            best = None
+            for matched, (counts, code) in candidates:
+                vector = self._vector(counts, total)
+                similarity = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+                if best is None or similarity > best[1]:
+                    best = (code, similarity, matched)
+        if best[1] < self.threshold:
+            return None
+        return best
+
+
+class SimilarQuestionCache:
+    """Process-wide question indexes, one per (model, prompt version, schema)"""
+
+    def __init__(self, threshold=0.8, max_indexes=16):
+        self.threshold = threshold
+        self.max_indexes = max_indexes
+        self.lookups = 0
+        self.reuses = 0
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index_for(self, scope, metadata, load_entries):
+        """Index for scope, seeded from load_entries() [(question, code), ...] on first use"""
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None:
+                self._indexes.move_to_end(scope)
+                return index
+
+        index = QuestionIndex(metadata, self.threshold)
+        for question, code in load_entries():
+            index.add(question, code)
+
+        with self._lock:
+            index = self._indexes.setdefault(scope, index)
+            self._indexes.move_to_end(scope)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def lookup(self, index, question):
+        match = index.lookup(question)
+        with self._lock:
+            self.lookups += 1
+            if match is not None:
+                self.reuses += 1
+        return match
+
+    def stats(self):
+        with self._lock:
+            return {"lookups": self.lookups, "reuses": self.reuses,
+                    "reuse_rate": self.reuses / self.lookups if self.lookups else 0.0,
+                    "indexes": len(self._indexes)}
@@ -0,0 +1,80 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_bytes(result):
+    """Approximate memory held by a query result"""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        usage = result.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(result, pd.Index):
+        return int(result.memory_usage(deep=True))
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    if isinstance(result, (list, tuple, set, dict)):
+        items = result.items() if isinstance(result, dict) else ((item,) for item in result)
+        return sys.getsizeof(result) + sum(sys.getsizeof(part) for item in items for part in item)
+    return sys.getsizeof(result)
+
+
+class ResultCache:
+    """Process-wide LRU cache of query results, bounded by their estimated size
+
+    Keys start with (dataset fingerprint, canonical AST of the expression), so
+    every session on the same dataset shares results, and equivalent
+    spellings of one expression share an entry. Results are returned as
+    stored: callers must not modify them.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        # key -> (result, size in bytes, seconds it took to compute)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, result, seconds=0.0):
+        size = estimate_bytes(result)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (result, size, seconds)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted[1]
+
+    def get_or_compute(self, key, compute):
+        """Return (result, seconds it took to compute, cached), calling compute() on a miss
+
+        Exceptions from compute() propagate and nothing is stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[2]
+                return entry[0], entry[2], True
+            self.misses += 1
+        start = time.perf_counter()
+        result = compute()
+        seconds = time.perf_counter() - start
+        self.put(key, result, seconds)
+        return result, seconds, False
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "bytes": self.total_bytes, "saved_seconds": self.saved_seconds}
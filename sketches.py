@@ -0,0 +1,184 @@
+"""Mergeable streaming sketches used by the approximate profiling mode.
+
+Every sketch consumes NumPy arrays a batch at a time (no per-value Python
+loops) and can be merged with another sketch of the same kind, so a column
+can be profiled chunk by chunk and the partial results combined.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ReservoirSample:
+    """Uniform fixed-size sample of a stream (Algorithm R, vectorized per batch)"""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.values = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values)
+        if values.size == 0:
+            return
+        if self.values is None:
+            self.values = values[:0].copy()
+
+        # Fill the reservoir first
+        room = self.size - len(self.values)
+        if room > 0:
+            self.values = np.concatenate([self.values, values[:room]])
+            self.seen += min(room, len(values))
+            values = values[room:]
+            if values.size == 0:
+                return
+
+        # Item number n (1-based) replaces a random slot with probability size/n;
+        # fancy assignment keeps the last write for repeated slots, as the
+        # sequential algorithm would
+        positions = self.seen + np.arange(1, len(values) + 1)
+        slots = (self._rng.random(len(values)) * positions).astype(np.int64)
+        keep = slots < self.size
+        self.values[slots[keep]] = values[keep]
+        self.seen += len(values)
+
+
+class QuantileSketch:
+    """KLL-style compactor hierarchy giving mergeable approximate quantiles
+
+    Level h holds items of weight 2**h; a full level is sorted and every other
+    item (random offset) is promoted, halving its size.
+    """
+
+    def __init__(self, capacity=2048, seed=0):
+        self.capacity = capacity
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for height, items in enumerate(other.levels):
+            self.levels[height] = np.concatenate([self.levels[height], items])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self):
+        height = 0
+        while height < len(self.levels):
+            items = self.levels[height]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                if len(items) % 2:
+                    # Keep one item back so the promoted half is exact
+                    self.levels[height] = items[-1:]
+                    items = items[:-1]
+                else:
+                    self.levels[height] = np.empty(0)
+                promoted = items[self._rng.integers(0, 2)::2]
+                if height + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[height + 1] = np.concatenate([self.levels[height + 1], promoted])
+            height += 1
+
+    def quantiles(self, qs):
+        items = np.concatenate(self.levels)
+        if items.size == 0:
+            return np.full(len(qs), np.nan)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        targets = np.asarray(qs) * cumulative[-1]
+        positions = np.searchsorted(cumulative, targets, side="left")
+        return items[np.minimum(positions, len(items) - 1)]
+
+    @property
+    def rank_error(self):
+        """Worst-case normalised rank error for the quantiles returned"""
+        if self.count <= self.capacity:
+            return 0.0
+        return np.log2(self.count / self.capacity) / self.capacity
+
+
+def _bit_length(values):
+    """Exact bit length of uint64 values, vectorized"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class HyperLogLog:
+    """Distinct-count estimator with 2**precision registers"""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(np.asarray(values))
+        remainder_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remainder_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << remainder_bits) - 1)
+        rank = (remainder_bits - _bit_length(remainder) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+
+class HeavyHitters:
+    """Misra-Gries top-k counter; counts are underestimated by at most error_bound"""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error_bound = 0
+        self.total = 0
+
+    def update(self, values):
+        batch = pd.Series(values).value_counts(dropna=True)
+        batch = batch[batch > 0]
+        self.total += int(batch.sum())
+        self._absorb(batch)
+
+    def merge(self, other):
+        self.total += other.total
+        self.error_bound += other.error_bound
+        self._absorb(other.counts)
+
+    def _absorb(self, batch):
+        counts = self.counts.add(batch, fill_value=0).astype(np.int64)
+        if len(counts) > self.capacity:
+            # Subtracting the (capacity+1)-th largest count keeps at most `capacity` keys
+            cutoff = int(counts.nlargest(self.capacity + 1).iloc[-1])
+            counts = counts[counts > cutoff] - cutoff
+            self.error_bound += cutoff
+        self.counts = counts
+
+    def top(self, k):
+        return self.counts.sort_values(ascending=False).head(k)
@@ -0,0 +1,113 @@
+"""Known sandbox-escape payloads must fail CodeNormalizer.check() before anything runs"""
+import inspect
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.core.groupby import DataFrameGroupBy, SeriesGroupBy
+
+from code_normalizer import ALLOWED_ATTRIBUTES, CodeNormalizer
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"gender": ["female", "male", "female"], "math score": [72, 69, 90],
+                         "lunch": ["standard", "free/reduced", "standard"]})
+
+
+@pytest.fixture
+def normalizer(df):
+    return CodeNormalizer(df.columns)
+
+
+def run(checked, df):
+    # The namespace the query executor and the inline path evaluate with
+    return eval(checked.code, {"df": df, "pd": pd, "__builtins__": {}})
+
+
+ESCAPES = [
+    # query() strings are evaluated by pandas, where @name reaches the caller's variables
+    "df.query(\"gender == 'x' or @pd.io.common.os.system('touch {marker}') == 0\")",
+    "df.query(\"`math score` > @pd.io.common.os.system('touch {marker}')\")",
+    "df.query(\"gender.str.len() > 0\")",
+    "df.query(\"gender == gender\", local_dict={{}})",
+    "df.query(\"lunch == 'standard'\", engine='python')",
+    # Writers, including the buf= of to_string and info
+    "df.to_string(buf='{marker}')",
+    "df.to_string('{marker}')",
+    "df.info(buf=open('{marker}', 'w'))",
+    "df['gender'].to_string('{marker}')",
+    "df.to_csv('{marker}')",
+    "df.values.tofile('{marker}')",
+    "pd.DataFrame.to_csv(df, '{marker}')",
+    "pd.Series(['{marker}']).apply(df.to_string)",
+    "df.describe().to_json(path_or_buf='{marker}')",
+    # Method names looked up from strings
+    "df['gender'].apply('to_csv', '{marker}')",
+    "df.agg('to_string', '{marker}')",
+    "df.agg('query', \"@pd.io.common.os.system('touch {marker}') == 0\")",
+    "df.groupby('gender')['math score'].agg(['mean', 'to_pickle'])",
+    # Other ways out of the expression
+    "df.eval(\"@pd.io.common.os.system('touch {marker}')\")",
+    "pd.eval(\"1\")",
+    "pd.read_csv('{marker}')",
+    "pd.io.common.os.system('touch {marker}')",
+    "df.__class__.__init__.__globals__",
+    "().__class__.__bases__[0].__subclasses__()",
+    "__import__('os').system('touch {marker}')",
+    "(lambda: open('{marker}', 'w'))()",
+    "[x for x in df]",
+    # In-place changes to the cached dataset
+    "df.pop('gender')",
+    "df.dropna(inplace=True)",
+    "df['math score'].values.fill(0)",
+    "df.values.sort()",
+]
+
+
+@pytest.mark.parametrize("payload", ESCAPES)
+def test_escape_payloads_are_rejected(payload, normalizer, df, tmp_path):
+    marker = tmp_path / "pwned"
+    checked = normalizer.check(payload.format(marker=marker))
+    assert not checked.valid, checked.source
+    assert not marker.exists()
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("df.query(\"lunch == 'standard'\")['math score'].mean()", 81.0),
+    ("df.query('Math_Score > 70 and gender == \"female\"').shape[0]", 2),
+    ("df.query(\"lunch == '@pd'\").shape[0]", 0),
+    ("df.groupby('gender')['math score'].agg(['mean', 'max']).loc['male', 'max']", 69),
+    ("df.groupby('gender').agg(best=('math score', 'max'))['best'].max()", 90),
+    ("df['math score'].apply(lambda x: x * 2).sum()", 462),
+])
+def test_safe_code_still_runs(code, expected, normalizer, df):
+    checked = normalizer.check(code)
+    assert checked.valid, checked.message
+    assert run(checked, df) == expected
+
+
+def test_query_columns_are_resolved(normalizer):
+    checked = normalizer.check("df.query('Math_Score > 70')")
+    assert checked.source == "df.query('`math score` > 70')"
+
+
+TYPES = (pd.DataFrame, pd.Series, pd.Index, DataFrameGroupBy, SeriesGroupBy, np.ndarray,
+         pd.Series.str, pd.Series.dt, pd.Series.cat, pd.Timestamp, pd.Timedelta)
+
+
+def test_no_allowed_method_takes_a_file_argument():
+    writers = set()
+    for owner in TYPES:
+        for name in ALLOWED_ATTRIBUTES:
+            method = getattr(owner, name, None)
+            if not callable(method):
+                continue
+            try:
+                parameters = inspect.signature(method).parameters
+            except (TypeError, ValueError):
+                continue
+            if any(word in parameter.lower() for parameter in parameters
+                   for word in ("buf", "path", "file", "writer", "fname")):
+                writers.add(f"{owner.__name__}.{name}")
+    assert not writers
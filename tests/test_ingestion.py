@@ -0,0 +1,40 @@
+"""The Arrow readers must hand analysis code the same columns pd.read_csv would"""
+import io
+
+import pandas as pd
+import pytest
+
+from ingestion import read_csv_fast, spool_csv_to_parquet, stream_csv
+
+CSV = (b"day,time,stamp,mixed,score\n"
+       b"2020-01-01,12:30:00,2020-01-01 10:00:00,2020-01-01,1\n"
+       b"2021-02-03,13:00:00,2021-02-03 11:00:00,2021-02,2\n"
+       b"2021-02-04,13:05:00,2021-02-04 11:30:00,2021-02-04T09:00:00,3\n")
+
+
+def upload():
+    file = io.BytesIO(CSV)
+    file.name = "dates.csv"
+    return file
+
+
+@pytest.mark.parametrize("dtype_backend", ["numpy", "pyarrow"])
+def test_read_csv_fast_matches_pandas(dtype_backend):
+    df, engine = read_csv_fast(upload(), dtype_backend)
+    assert engine == "pyarrow"
+    expected = pd.read_csv(upload(), **({"dtype_backend": "pyarrow"} if dtype_backend == "pyarrow" else {}))
+    pd.testing.assert_frame_equal(df, expected, check_dtype=dtype_backend == "numpy")
+    assert df["day"].str.startswith("2021").sum() == 2
+
+
+def test_stream_csv_keeps_dates_as_text():
+    df, engine = stream_csv(upload(), lambda chunk: None, lambda read, total: None, "numpy")
+    assert engine == "pyarrow (streaming)"
+    pd.testing.assert_frame_equal(df, pd.read_csv(upload()))
+
+
+def test_spool_keeps_dates_as_text(tmp_path):
+    sample, rows = spool_csv_to_parquet(upload(), str(tmp_path / "dates.parquet"), dtype_backend="numpy")
+    assert rows == 3
+    pd.testing.assert_frame_equal(sample, pd.read_csv(upload()))
+    assert pd.read_parquet(tmp_path / "dates.parquet")["stamp"].tolist() == pd.read_csv(upload())["stamp"].tolist()